@@ -1,16 +1,61 @@
 import os
 import sys
 import psycopg2
-from flask import Flask, request, jsonify, render_template
+from psycopg2.extras import execute_values
+from flask import Flask, Response, g, has_request_context, request, jsonify, render_template
 from flask_cors import CORS
-from datetime import datetime
+from datetime import datetime, timezone
+import hashlib
 import urllib.parse
 import logging
-from logging.handlers import RotatingFileHandler
 import json
+import base64
+from functools import lru_cache
+import click
+from db import database_dialect, get_pool, sqlalchemy_url, to_datetime
+from audit import build_logs_query, create_logs_table, create_writer, log_to_dict, tail_lines
+from cache import create_note_cache, pack_response, unpack_response
+from search import ensure_sqlite_fts, parse_terms, render_highlight, search_notes
+from events import TooManySubscribers, create_events, format_sse
+from log_maintenance import STATS_GROUPS, create_log_stats_table, create_maintenance, read_log_stats
+from app_logging import create_logging
+import metrics
+import profiling
+from models import NOTE_FIELDS, NOTE_INDEX, db, note_row
+import fastjson
+import queries
 
 app = Flask(__name__)
 CORS(app)
+# jsonify и request.json через orjson (если установлен); обёртку профилировщика ставит profiler.init_app
+app.json = fastjson.FastJSONProvider(app)
+
+DEFAULT_PAGE_SIZE = int(os.environ.get('NOTES_PAGE_SIZE', 100))
+MAX_PAGE_SIZE = int(os.environ.get('NOTES_MAX_PAGE_SIZE', 500))
+EXPORT_ITERSIZE = int(os.environ.get('NOTES_EXPORT_ITERSIZE', 2000))
+STREAM_CHUNK_BYTES = 64 * 1024
+BOARD_STATUSES = ('todo', 'doing', 'complete')
+# Явный список колонок из модели Note: служебные (например, search_vector) клиенту не нужны
+NOTE_COLUMNS = ', '.join(NOTE_FIELDS)
+NOTE_COLUMNS_N = ', '.join(f'n.{column}' for column in NOTE_COLUMNS.split(', '))
+CHANGES_PAGE_SIZE = 1000
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+LOGS_PAGE_SIZE = 100
+LOGS_MAX_PAGE_SIZE = 1000
+BATCH_MAX_OPERATIONS = int(os.environ.get('NOTES_BATCH_MAX', 5000))
+BATCH_OPERATIONS = ('create', 'update', 'status', 'delete')
+# Разобранные User-Agent: несколько тысяч строк покрывают почти весь трафик
+USER_AGENT_CACHE_SIZE = int(os.environ.get('USER_AGENT_CACHE_SIZE', 4096))
+# Пустой комментарий в SSE-потоке, чтобы прокси не закрыли соединение
+EVENTS_HEARTBEAT = float(os.environ.get('EVENTS_HEARTBEAT', 15))
+EVENTS_RETRY_AFTER = int(os.environ.get('EVENTS_RETRY_AFTER', 30))  # секунд до повтора после 503
+
+# Готовые JSON-ответы (заметки, страницы списка, сводка). Запись в этом воркере
+# сбрасывает их сразу; с кэшем в памяти остальные воркеры увидят изменения не
+# позже чем через NOTES_CACHE_TTL секунд, с NOTES_CACHE=redis — тоже сразу
+note_cache = create_note_cache()
+SUMMARY_TTL = float(os.environ.get('NOTES_SUMMARY_TTL', 5))
 
 @app.route('/')
 def index():
@@ -24,47 +69,44 @@ if TESTING:
 
 # Настройка логирования
 def setup_logging():
-    # Создаем папку для логов если ее нет
-    if not os.path.exists('logs'):
-        os.makedirs('logs')
-    
-    # Настраиваем формат логов
-    formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - [%(ip)s] - %(message)s'
-    )
-    
-    file_handler = RotatingFileHandler(
-        'logs/app.log', 
-        maxBytes=5*1024*1024, 
-        backupCount=5,
-        encoding='utf-8'
-    )
-    file_handler.setFormatter(formatter)
-    file_handler.setLevel(logging.INFO)
-    
-    app.logger.addHandler(file_handler)
-    app.logger.setLevel(logging.INFO)
+    """app.logger пишет в очередь, файл и stdout — фоновый поток (app_logging.py)"""
+    return create_logging(app.logger)
 
 # Кастомный фильтр для добавления IP в логи
 class IPLogFilter(logging.Filter):
     def filter(self, record):
-        record.ip = get_client_ip()
+        # Вне запроса (фоновые потоки, CLI, старт воркера) IP нет
+        record.ip = get_client_ip() if has_request_context() else '-'
         return True
 
 app.logger.addFilter(IPLogFilter())
 
 def get_client_ip():
-    """Получаем реальный IP клиента"""
-    if request.headers.get('X-Forwarded-For'):
-        return request.headers.get('X-Forwarded-For').split(',')[0]
-    elif request.headers.get('X-Real-IP'):
-        return request.headers.get('X-Real-IP')
-    else:
-        return request.remote_addr
+    """Получаем реальный IP клиента (один раз за запрос, дальше из g)"""
+    ip = g.get('client_ip')
+    if ip is None:
+        if request.headers.get('X-Forwarded-For'):
+            ip = request.headers.get('X-Forwarded-For').split(',')[0]
+        elif request.headers.get('X-Real-IP'):
+            ip = request.headers.get('X-Real-IP')
+        else:
+            ip = request.remote_addr
+        g.client_ip = ip
+    return ip
 
 def get_user_agent_info():
-    """Получаем информацию о устройстве и браузере"""
-    user_agent = request.headers.get('User-Agent', '')
+    """Получаем информацию о устройстве и браузере (один раз за запрос, дальше из g)"""
+    info = g.get('user_agent_info')
+    if info is None:
+        info = g.user_agent_info = parse_user_agent(request.headers.get('User-Agent', ''))
+    return info
+
+@lru_cache(maxsize=USER_AGENT_CACHE_SIZE)
+def parse_user_agent(user_agent):
+    """Устройство и браузер по строке User-Agent
+
+    Результат кэшируется и общий для всех запросов с той же строкой — не изменять.
+    """
     # Простой парсинг User-Agent
     if 'Mobile' in user_agent:
         device = 'Mobile'
@@ -90,8 +132,11 @@ def get_user_agent_info():
         'user_agent': user_agent[:100]  # ограничиваем длину
     }
 
+@profiling.timed('log_action')
 def log_action(action, note_id=None, details=None):
     """Логируем действие и сохраняем в базу данных"""
+    if action == 'ERROR':
+        metrics.app_errors.inc(request.endpoint or 'unmatched')
     ip = get_client_ip()
     user_agent_info = get_user_agent_info()
     
@@ -111,104 +156,104 @@ def log_action(action, note_id=None, details=None):
     log_message = f"{action} | IP: {ip} | Device: {user_agent_info['device']}"
     if note_id:
         log_message += f" | Note: {note_id}"
-    app.logger.info(log_message)
+    app.logger.info(log_message, extra={'event': log_data})
     
-    # 2. Сохраняем в базу данных (для постоянного хранения)
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS logs (
-                id SERIAL PRIMARY KEY,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                ip VARCHAR(45),
-                action VARCHAR(100),
-                note_id INTEGER,
-                device VARCHAR(50),
-                browser VARCHAR(50),
-                details JSONB,
-                endpoint VARCHAR(100),
-                method VARCHAR(10)
-            )
-        ''')
-        
-        cur.execute('''
-            INSERT INTO logs (ip, action, note_id, device, browser, details, endpoint, method)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        ''', (
-            ip, action, note_id, 
-            user_agent_info['device'], 
-            user_agent_info['browser'],
-            json.dumps(details) if details else None,
-            request.endpoint,
-            request.method
-        ))
-        
-        conn.commit()
-        cur.close()
-        conn.close()
-        
-    except Exception as e:
-        print(f"❌ Ошибка сохранения лога в БД: {e}")
+    # 2. Ставим в очередь на запись в базу (пишет фоновый поток пачками)
+    audit_writer.enqueue((
+        datetime.now(),
+        ip, action, note_id,
+        user_agent_info['device'],
+        user_agent_info['browser'],
+        fastjson.dumps(details) if details else None,
+        request.endpoint,
+        request.method
+    ))
+
 # Функция для подключения к базе данных
+@profiling.timed('get_db_connection')
 def get_db_connection():
-    # Для Render и продакшена
-    if 'DATABASE_URL' in os.environ:
-        import urllib.parse
-        urllib.parse.uses_netloc.append('postgres')
-        url = urllib.parse.urlparse(os.environ['DATABASE_URL'])
-        
-        conn = psycopg2.connect(
-            database=url.path[1:],
-            user=url.username,
-            password=url.password,
-            host=url.hostname,
-            port=url.port
-        )
-        return conn
-    
-    # Для локальной разработки
-    try:
-        conn = psycopg2.connect(
-            host='localhost',
-            database='notes_app',
-            user='postgres',
-            password='',  # замените на ваш пароль
-            port=5433
-        )
-        return conn
-    except Exception as e:
-        print(f"Ошибка подключения к локальной БД: {e}")
-        # Fallback: создаем SQLite базу
-        import sqlite3
-        conn = sqlite3.connect('notes.db')
-        conn.row_factory = sqlite3.Row
-        return conn
+    """Берём соединение из пула процесса; conn.close() возвращает его в пул"""
+    return metrics.instrument_connection(get_pool().acquire())
+
+audit_writer = create_writer(get_db_connection)
+# Разделы, срок хранения и сводка журнала; поток запускает gunicorn.conf.py (post_worker_init)
+log_maintenance = create_maintenance(get_db_connection)
+
+def fetch_note_for_event(cur, note_id):
+    """Заметка для урезанного события NOTIFY (длинный content не влез в payload)"""
+    cur.execute(*queries.note_by_id('postgres')(id=note_id))
+    row = cur.fetchone()
+    return note_to_dict(row) if row else None
+
+# Пул создаётся при первом соединении, а не при импорте
+note_events = create_events(database_dialect(), lambda: get_pool().factory(), fetch_note_for_event)
+
+def publish_note_event(kind, note_id, note=None):
+    """Событие для /notes/stream — вызывать после commit"""
+    event = {'type': kind, 'id': note_id}
+    if note is not None:
+        event['note'] = note
+    note_events.publish(event)
 
 # Инициализация базы данных
 def init_db():
+    """Таблицы без миграций (CREATE IF NOT EXISTS) — для локальной базы и тестов
+
+    Продакшен создаёт схему миграциями: flask --app app db upgrade.
+    """
     if TESTING:
         return  # В режиме тестирования таблица уже создана в get_db_connection
     
     try:
         conn = get_db_connection()
-        cur = conn.cursor()
+        try:
+            cur = conn.cursor()
         
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS notes (
-                id SERIAL PRIMARY KEY,
-                title VARCHAR(255) NOT NULL,
-                content TEXT,
-                status VARCHAR(50) DEFAULT 'todo',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+            id_column = 'SERIAL PRIMARY KEY' if conn.dialect == 'postgres' else 'INTEGER PRIMARY KEY AUTOINCREMENT'
+            cur.execute(f'''
+                CREATE TABLE IF NOT EXISTS notes (
+                    id {id_column},
+                    title VARCHAR(255) NOT NULL,
+                    content TEXT,
+                    status VARCHAR(50) DEFAULT 'todo',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP,
+                    revision BIGINT NOT NULL DEFAULT 0
+                )
+            ''')
+            create_logs_table(cur, conn.dialect)
+            create_log_stats_table(cur)
+            if conn.dialect == 'sqlite':
+                # Локальная база обычно живёт без миграций — поисковый индекс создаём сразу
+                ensure_sqlite_fts(cur)
+
+            # Версия доски для ETag: одна строка, увеличивается при каждой записи
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS board_state (
+                    id INTEGER PRIMARY KEY,
+                    revision BIGINT NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP
+                )
+            ''')
+            cur.execute('''
+                INSERT INTO board_state (id, revision, updated_at) VALUES (1, 0, %s)
+                ON CONFLICT (id) DO NOTHING
+            ''', (datetime.utcnow(),))
+
+            # Следы удалённых заметок для /notes/changes
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS note_tombstones (
+                    id INTEGER PRIMARY KEY,
+                    revision BIGINT NOT NULL,
+                    deleted_at TIMESTAMP
+                )
+            ''')
         
-        conn.commit()
-        cur.close()
-        conn.close()
-        print("✅ Таблица 'notes' создана/проверена")
+            conn.commit()
+            cur.close()
+        finally:
+            conn.close()
+        print("✅ Таблицы 'notes', 'logs', 'log_stats', 'board_state' и 'note_tombstones' созданы/проверены")
         
     except Exception as e:
         print(f"❌ Ошибка инициализации базы: {e}")
@@ -223,69 +268,609 @@ def home():
         "logging": "enabled"
     })
 
+def parse_timestamp(value):
+    """Дата из JSON -> datetime без часового пояса (как хранит колонка TIMESTAMP)"""
+    if not value:
+        return datetime.now()
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+
+def encode_cursor(created_at, note_id):
+    """Непрозрачный курсор страницы: позиция последней заметки (created_at, id)"""
+    raw = json.dumps([created_at.isoformat() if created_at else None, note_id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, note_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(created_at), int(note_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def parse_page_size(args):
+    """Размер страницы из ?limit= (или старого ?per_page=), не больше MAX_PAGE_SIZE"""
+    raw = args.get('limit', args.get('per_page'))
+    if raw is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+def bump_board_revision(cur):
+    """Новая версия доски — вызывается в той же транзакции, что и запись в notes"""
+    cur.execute(BUMP_REVISION_SQL, (datetime.utcnow(),))
+
+BUMP_REVISION_SQL = 'UPDATE board_state SET revision = revision + 1, updated_at = %s WHERE id = 1'
+
+# Ревизия, которую получит запись. FOR UPDATE блокирует строку board_state до
+# commit: пишущие транзакции получают ревизии по очереди и фиксируются в том же
+# порядке, поэтому /notes/changes?since=N не пропустит медленную транзакцию
+NEXT_REVISION_SQL = {
+    'postgres': '(SELECT revision + 1 FROM board_state WHERE id = 1 FOR UPDATE)',
+    'sqlite': '(SELECT revision + 1 FROM board_state WHERE id = 1)',
+}
+
+def next_revision(cur, dialect):
+    """Ревизия для пакетной записи (строка board_state блокируется до commit)"""
+    cur.execute(NEXT_REVISION_SQL[dialect][1:-1])  # тот же подзапрос без скобок
+    return int(cur.fetchone()[0])
+
+def execute_write(cur, dialect, query, params=(), tombstones=False):
+    """Изменение notes + новая версия доски; возвращает строки RETURNING
+
+    :revision в запросе заменяется ревизией этой записи (колонка notes.revision).
+    В Postgres это один запрос: изменение становится CTE changed, а ревизия
+    увеличивается соседним CTE, только если changed что-то вернул. SQLite
+    локальный, сетевых обращений там нет — выполняем операторы по очереди.
+    tombstones=True — запрос удаляет заметки и возвращает колонки id и revision,
+    по ним пишутся следы в note_tombstones.
+    """
+    if dialect == 'postgres':
+        cur.execute(*postgres_write(query, params, tombstones))
+        return cur.fetchall()
+    query = query.replace(':revision', NEXT_REVISION_SQL[dialect])
+    now = datetime.utcnow()
+    cur.execute(query, params)
+    rows = cur.fetchall()
+    if rows:
+        if tombstones:
+            columns = [column[0] for column in cur.description]
+            id_index, revision_index = columns.index('id'), columns.index('revision')
+            insert_tombstones(cur, dialect, [(row[id_index], row[revision_index]) for row in rows], now)
+        bump_board_revision(cur)
+    return rows
+
+def postgres_write(query, params=(), tombstones=False):
+    """Один оператор Postgres для execute_write: (sql, параметры)"""
+    query = query.replace(':revision', NEXT_REVISION_SQL['postgres'])
+    now = datetime.utcnow()
+    tomb = ''
+    tomb_params = []
+    if tombstones:
+        tomb = ('tomb AS (INSERT INTO note_tombstones (id, revision, deleted_at) '
+                'SELECT id, revision, %s FROM changed ON CONFLICT (id) DO NOTHING), ')
+        tomb_params = [now]
+    return (
+        f'WITH changed AS ({query}), {tomb}'
+        f'bump AS ({BUMP_REVISION_SQL} AND EXISTS (SELECT 1 FROM changed)) '
+        f'SELECT * FROM changed',
+        [*params, *tomb_params, now]
+    )
+
+def insert_tombstones(cur, dialect, deleted, deleted_at):
+    """Следы удалённых заметок: [(id, revision), ...]"""
+    rows = [(note_id, revision, deleted_at) for note_id, revision in deleted]
+    if dialect == 'postgres':
+        execute_values(cur, 'INSERT INTO note_tombstones (id, revision, deleted_at) VALUES %s '
+                            'ON CONFLICT (id) DO NOTHING', rows, page_size=len(rows))
+    else:
+        cur.executemany('INSERT INTO note_tombstones (id, revision, deleted_at) VALUES (%s, %s, %s) '
+                        'ON CONFLICT (id) DO NOTHING', rows)
+
+def read_board_version():
+    """(revision, updated_at в UTC) — одна строка board_state, таблицу notes не трогаем"""
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute('SELECT revision, updated_at FROM board_state WHERE id = 1')
+        row = cur.fetchone()
+        cur.close()
+    finally:
+        conn.close()
+    if not row:
+        return 0, None
+    updated_at = to_datetime(row[1])
+    if updated_at is not None:
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    return int(row[0]), updated_at
+
+def board_etag(revision, variant):
+    """Сильный ETag: версия доски + вариант ответа (путь и параметры запроса)"""
+    digest = hashlib.sha1(variant.encode('utf-8')).hexdigest()[:12]
+    return f'r{revision}-{digest}'
+
+def request_variant():
+    args = '&'.join(f'{key}={value}' for key, value in sorted(request.args.items(multi=True)))
+    return f'{request.path}?{args}'
+
+def is_not_modified(etag, last_modified):
+    """Проверка If-None-Match / If-Modified-Since (первый важнее, как в RFC 9110)"""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if last_modified and request.if_modified_since:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+def set_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # Браузер хранит ответ, но перепроверяет его при каждом запросе
+    response.cache_control.no_cache = True
+    return response
+
+def not_modified_response(etag, last_modified):
+    return set_validators(Response(status=304), etag, last_modified)
+
+# Строка таблицы notes -> словарь заметки для JSON-ответа (даты кодирует app.json / fastjson)
+note_to_dict = note_row
+
+def page_cursor(row):
+    """next_cursor по последней строке страницы"""
+    return encode_cursor(row[NOTE_INDEX['created_at']], row[NOTE_INDEX['id']])
+
+def build_notes_query(dialect, statuses=None, after=None, limit=None):
+    """SELECT заметок в порядке (created_at, id) по убыванию — скомпилированный queries.notes_page"""
+    values = {f'status_{index}': status for index, status in enumerate(statuses or ())}
+    if after:
+        values['after_created_at'], values['after_id'] = after
+    if limit is not None:
+        values['limit'] = limit
+    query = queries.notes_page(dialect, len(statuses or ()), bool(after), limit is not None)
+    return query(**values)
+
+def parse_statuses(args):
+    return [s for s in args.get('status', '').split(',') if s]
+
+def iter_note_rows(conn, statuses=None):
+    """Заметки по одной строке, без загрузки всей таблицы в память"""
+    if conn.dialect == 'postgres':
+        # Серверный (именованный) курсор: строки приходят пачками по itersize
+        cur = conn.cursor(name='notes_export')
+        cur.itersize = EXPORT_ITERSIZE
+    else:
+        cur = conn.cursor()
+    try:
+        cur.execute(*build_notes_query(conn.dialect, statuses))
+        for row in cur:
+            yield row
+    finally:
+        cur.close()
+
+def stream_notes(statuses, fmt='json'):
+    """Потоковый ответ со всеми заметками: JSON-массив или NDJSON
+
+    Строки кодируются по мере чтения курсора и отдаются кусками по
+    STREAM_CHUNK_BYTES, поэтому память не зависит от размера таблицы.
+    """
+    def generate():
+        conn = get_db_connection()
+        try:
+            if fmt == 'json':
+                yield '['
+            buffer = []
+            size = 0
+            first = True
+            for row in iter_note_rows(conn, statuses):
+                item = fastjson.dumps(note_to_dict(row))
+                if fmt == 'json':
+                    item = item if first else ',' + item
+                    first = False
+                else:
+                    item += '\n'
+                buffer.append(item)
+                size += len(item)
+                if size >= STREAM_CHUNK_BYTES:
+                    yield ''.join(buffer)
+                    buffer = []
+                    size = 0
+            if buffer:
+                yield ''.join(buffer)
+            if fmt == 'json':
+                yield ']'
+        except Exception as e:
+            # Заголовки уже отправлены — статус не поменять, сообщаем в потоке
+            print(f"❌ Ошибка потоковой выгрузки заметок: {e}")
+            if fmt == 'ndjson':
+                yield fastjson.dumps({'error': str(e)}) + '\n'
+        finally:
+            conn.close()
+
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+    return Response(generate(), mimetype=mimetype)
+
 @app.route('/notes', methods=['GET'])
 def get_notes():
+    """Страница заметок по ключу (created_at, id), новые сверху
+
+    Параметры: limit, cursor (next_cursor предыдущей страницы), status (можно через запятую).
+    С ?stream=1 отдаёт все заметки потоком одним JSON-массивом.
+    """
+    try:
+        limit = parse_page_size(request.args)
+        cursor = request.args.get('cursor')
+        after = decode_cursor(cursor) if cursor else None
+        statuses = parse_statuses(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    stream = request.args.get('stream') in ('1', 'true')
+    try:
+        cache_key = None if stream else note_cache.list_key(request_variant())
+        revision, last_modified = read_board_version()
+        etag = board_etag(revision, request_variant())
+        cached = cached_for_revision(cache_key, etag)
+        if cached is not None:
+            log_action('GET_ALL_NOTES', details={'cached': True})
+            return cached_json(cached)
+
+        if is_not_modified(etag, last_modified):
+            return not_modified_response(etag, last_modified)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    if stream:
+        log_action('GET_ALL_NOTES', details={'stream': True})
+        return set_validators(stream_notes(statuses), etag, last_modified)
+
     try:
         log_action('GET_ALL_NOTES')
         conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute('SELECT * FROM notes ORDER BY created_at DESC')
-        notes = cur.fetchall()
+        try:
+            cur = conn.cursor()
+
+            # Берём на одну запись больше, чтобы узнать, есть ли следующая страница
+            cur.execute(*build_notes_query(conn.dialect, statuses, after, limit + 1))
+            notes = cur.fetchall()
+            has_more = len(notes) > limit
+            notes = notes[:limit]
         
-        notes_list = []
-        for note in notes:
-            notes_list.append({
-                'id': note[0],
-                'title': note[1],
-                'content': note[2],
-                'status': note[3],
-                'created_at': note[4].isoformat() if note[4] else None
-            })
+            notes_list = [note_to_dict(note) for note in notes]
         
-        cur.close()
-        conn.close()
-        return jsonify(notes_list)
+            cur.close()
+        finally:
+            conn.close()
+
+        next_cursor = page_cursor(notes[-1]) if has_more else None
+        response = jsonify({
+            'notes': notes_list,
+            'next_cursor': next_cursor,
+            'limit': limit,
+            # Отсюда клиент продолжает через /notes/changes?since=revision
+            'revision': revision
+        })
+        note_cache.set(cache_key, pack_response(etag, last_modified, response.get_data(as_text=True)))
+        return set_validators(response, etag, last_modified)
     except Exception as e:
         log_action('ERROR', details=f"Get notes failed: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/notes/export', methods=['GET'])
+def export_notes():
+    """Выгрузка всех заметок потоком: ?format=ndjson (по умолчанию) или json"""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('json', 'ndjson'):
+        return jsonify({'error': 'format must be json or ndjson'}), 400
+
+    log_action('EXPORT_NOTES', details={'format': fmt})
+    response = stream_notes(parse_statuses(request.args), fmt)
+    response.headers['Content-Disposition'] = f'attachment; filename=notes.{fmt}'
+    return response
+
+_has_counter_table = None
+
+def read_changes(cur, dialect, since, limit):
+    """Изменения с ревизии since: (строки заметок, [(id, revision)] удалений, ревизия, есть ли ещё)
+
+    Верхняя граница — текущая ревизия доски: всё, что не новее её, уже
+    зафиксировано. Страница не разрывает ревизию посередине (пакет из
+    /notes/batch приходит целиком), поэтому может быть длиннее limit.
+    """
+    cur.execute('SELECT revision FROM board_state WHERE id = 1')
+    current = int(cur.fetchone()[0])
+
+    revision_index = NOTE_INDEX['revision']
+
+    def fetch(upto, page_limit=None):
+        values = {'since': since, 'until': upto, 'limit': page_limit}
+        cur.execute(*queries.notes_changed(dialect, bool(page_limit))(**values))
+        notes = cur.fetchall()
+        cur.execute(*queries.tombstones_changed(dialect, bool(page_limit))(**values))
+        return notes, cur.fetchall()
+
+    notes, deleted = fetch(current, limit + 1)
+    revisions = sorted([row[revision_index] for row in notes] + [row[1] for row in deleted])
+    if len(revisions) <= limit:
+        return notes, deleted, current, False
+
+    # Первая ревизия, которая не помещается на страницу, уходит на следующую целиком
+    boundary = revisions[limit]
+    if boundary == revisions[0]:
+        # Одна ревизия больше страницы — отдаём её полностью
+        notes, deleted = fetch(boundary)
+        return notes, deleted, boundary, boundary < current
+    notes = [row for row in notes if row[revision_index] < boundary]
+    deleted = [row for row in deleted if row[1] < boundary]
+    return notes, deleted, boundary - 1, True
+
+@app.route('/notes/changes', methods=['GET'])
+def get_note_changes():
+    """Что изменилось после ревизии: ?since=<revision>&limit=1000
+
+    Ответ: {"notes": [...изменённые и новые...], "deleted": [id, ...],
+    "revision": N, "has_more": false}. Следующий запрос — с since=N.
+    Начальную ревизию клиент берёт из ответа GET /notes.
+    """
+    try:
+        since = int(request.args.get('since', ''))
+        limit = min(int(request.args.get('limit', CHANGES_PAGE_SIZE)), CHANGES_PAGE_SIZE)
+        if since < 0 or limit < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'since and limit must be non-negative integers'}), 400
+
+    try:
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute('SELECT revision FROM board_state WHERE id = 1')
+            current = int(cur.fetchone()[0])
+            if since > current:
+                # Клиент видел ревизию, которой в базе нет (база пересоздана) — нужна полная загрузка
+                cur.close()
+                return jsonify({'notes': [], 'deleted': [], 'revision': current, 'has_more': False, 'reset': True})
+
+            notes, deleted, revision, has_more = read_changes(cur, conn.dialect, since, limit)
+            cur.close()
+        finally:
+            conn.close()
+
+        return jsonify({
+            'notes': [note_to_dict(row) for row in notes],
+            'deleted': [row[0] for row in deleted],
+            'revision': revision,
+            'has_more': has_more
+        })
+    except Exception as e:
+        log_action('ERROR', details=f"Get changes failed: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def has_counter_table(cur, dialect):
+    """Есть ли таблица note_status_counts (миграция 0003) — проверяем один раз"""
+    global _has_counter_table
+    if _has_counter_table is None:
+        if dialect == 'postgres':
+            cur.execute("SELECT to_regclass('note_status_counts')")
+        else:
+            cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'note_status_counts'")
+        row = cur.fetchone()
+        _has_counter_table = bool(row and row[0])
+    return _has_counter_table
+
+def invalidate_cache(note_ids=(), summary=False):
+    """Сброс кэша ответов после commit: изменённые заметки, страницы списка, сводка"""
+    note_cache.invalidate_notes(note_ids, summary=summary)
+
+def cached_for_revision(cache_key, etag):
+    """Ответ из кэша, только если он собран на текущей ревизии доски
+
+    Поколения ключей сбрасывает лишь тот воркер, который писал; запись через
+    другой воркер видна здесь только по ревизии в board_state.
+    """
+    cached = note_cache.get(cache_key)
+    if cached is None:
+        return None
+    if unpack_response(cached)[0] != etag:
+        note_cache.delete(cache_key)
+        return None
+    return cached
+
+def cached_json(value):
+    """Ответ из кэша: (etag, last_modified, тело) -> Response с валидаторами или 304"""
+    etag, last_modified, body = unpack_response(value)
+    if is_not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    return set_validators(Response(body, mimetype='application/json'), etag, last_modified)
+
+@app.route('/notes/summary', methods=['GET'])
+def get_notes_summary():
+    """Количество заметок по статусам и дата последней — для шапки доски"""
+    try:
+        revision, last_modified = read_board_version()
+        etag = board_etag(revision, request.path)
+        cached = cached_for_revision('summary', etag)
+        if cached is not None:
+            return cached_json(cached)
+        if is_not_modified(etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+
+            # Счётчики поддерживают триггеры, иначе — COUNT(*) по таблице
+            if has_counter_table(cur, conn.dialect):
+                cur.execute('SELECT status, count FROM note_status_counts')
+            else:
+                cur.execute('SELECT status, COUNT(*) FROM notes GROUP BY status')
+            counts = {status: 0 for status in BOARD_STATUSES}
+            for status, count in cur.fetchall():
+                if status:
+                    counts[status] = int(count)
+
+            # max() берётся из индекса по created_at
+            cur.execute('SELECT MAX(created_at) FROM notes')
+            latest = to_datetime(cur.fetchone()[0])
+
+            cur.close()
+        finally:
+            conn.close()
+
+        summary = {
+            'counts': counts,
+            'total': sum(counts.values()),
+            'latest_created_at': latest.isoformat() if latest else None
+        }
+        response = jsonify(summary)
+        note_cache.set('summary', pack_response(etag, last_modified, response.get_data(as_text=True)),
+                       ttl=SUMMARY_TTL)
+        return set_validators(response, etag, last_modified)
+    except Exception as e:
+        log_action('ERROR', details=f"Get summary failed: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/notes/stream', methods=['GET'])
+def stream_note_events():
+    """Server-Sent Events: изменения заметок по одной, без перезагрузки доски
+
+    event: note, data: {"type": "create|update|move|delete", "id": ..., "note": {...}}.
+    event: resync — часть событий потеряна, клиенту нужно перечитать /notes.
+    Клиент SSE занимает поток воркера, пока открыт; сверх EVENTS_MAX_SUBSCRIBERS — 503.
+    """
+    # Место занимаем до ответа: иначе лимит проверялся бы уже после 200
+    try:
+        subscription = note_events.subscribe()
+    except TooManySubscribers as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = str(EVENTS_RETRY_AFTER)
+        return response, 503
+
+    def generate():
+        try:
+            # Браузер переподключится через 3 секунды после обрыва
+            yield 'retry: 3000\n\n'
+            while True:
+                event = subscription.get(timeout=EVENTS_HEARTBEAT)
+                if event is None:
+                    yield ': ping\n\n'
+                elif event['type'] == 'resync':
+                    yield format_sse({}, 'resync')
+                else:
+                    yield format_sse(event)
+        finally:
+            note_events.unsubscribe(subscription)
+
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # nginx не должен буферизовать поток
+    })
+    # Поток могут закрыть, не начав читать — тогда finally в generate не выполнится
+    response.call_on_close(lambda: note_events.unsubscribe(subscription))
+    return response
+
+@app.route('/notes/search', methods=['GET'])
+def search_notes_route():
+    """Поиск по заголовку и тексту: ?q=слова&limit=20&offset=0&status=todo
+
+    Результаты отсортированы по релевантности, в highlight — экранированный
+    текст с найденными словами в <mark>.
+    """
+    terms = parse_terms(request.args.get('q'))
+    if not terms:
+        return jsonify({'error': 'q must contain at least one word'}), 400
+    try:
+        limit = min(int(request.args.get('limit', SEARCH_PAGE_SIZE)), SEARCH_MAX_PAGE_SIZE)
+        offset = int(request.args.get('offset', 0))
+        if limit < 1 or offset < 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be non-negative integers'}), 400
+
+    try:
+        log_action('SEARCH_NOTES', details={'terms': len(terms)})
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+            rows = search_notes(cur, conn.dialect, terms, limit + 1, offset, parse_statuses(request.args))
+            cur.close()
+        finally:
+            conn.close()
+
+        has_more = len(rows) > limit
+        results = []
+        for row in rows[:limit]:
+            item = note_to_dict(row)
+            item['rank'] = round(float(row[-3]), 6)
+            item['highlight'] = {
+                'title': render_highlight(row[-2], escape_html),
+                'content': render_highlight(row[-1], escape_html)
+            }
+            results.append(item)
+
+        return jsonify({
+            'results': results,
+            'next_offset': offset + limit if has_more else None,
+            'limit': limit
+        })
+    except Exception as e:
+        log_action('ERROR', details=f"Search failed: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def create_note_params(data):
+    """Параметры queries.insert_note из тела POST /notes"""
+    return {
+        'title': data.get('title', ''),
+        'content': data.get('content', ''),
+        'status': data.get('status', 'todo'),
+        'created_at': parse_timestamp(data.get('created_at')),
+        'updated_at': datetime.utcnow()
+    }
+
+def build_note_update(dialect, data, note_id):
+    """UPDATE заметки по полям из PATCH: (запрос или None, изменения для журнала)"""
+    values = {}
+    changes = {}
+
+    if 'title' in data:
+        values['title'] = data['title']
+        changes['title'] = data['title']
+
+    if 'content' in data:
+        values['content'] = data['content']
+        changes['content'] = 'updated'  # не логируем сам контент для краткости
+
+    if not values:
+        return None, changes
+    query = queries.update_note(dialect, tuple(values))
+    return query(**values, updated_at=datetime.utcnow(), note_id=note_id), changes
+
 @app.route('/notes', methods=['POST'])
 def create_note():
     try:
         data = request.json
         conn = get_db_connection()
-        cur = conn.cursor()
-        
-        cur.execute('''
-            INSERT INTO notes (title, content, status, created_at)
-            VALUES (%s, %s, %s, %s)
-            RETURNING id
-        ''', (
-            data.get('title', ''), 
-            data.get('content', ''), 
-            data.get('status', 'todo'),
-            data.get('created_at', datetime.now().isoformat())
-        ))
-        
-        note_id = cur.fetchone()[0]
-        conn.commit()
+        try:
+            cur = conn.cursor()
         
-        cur.execute('SELECT * FROM notes WHERE id = %s', (note_id,))
-        new_note = cur.fetchone()
+            rows = execute_write(cur, conn.dialect, *queries.insert_note(conn.dialect)(**create_note_params(data)))
+            conn.commit()
+            invalidate_cache(summary=True)
         
-        note_dict = {
-            'id': new_note[0],
-            'title': new_note[1],
-            'content': new_note[2],
-            'status': new_note[3],
-            'created_at': new_note[4].isoformat() if new_note[4] else None
-        }
+            note_dict = note_to_dict(rows[0])
+            publish_note_event('create', note_dict['id'], note_dict)
         
-        cur.close()
-        conn.close()
+            cur.close()
+        finally:
+            conn.close()
         
         # Логируем создание заметки
-        log_action('CREATE_NOTE', note_id, {
+        log_action('CREATE_NOTE', note_dict['id'], {
             'title': data.get('title', ''),
             'status': data.get('status', 'todo')
         })
@@ -295,46 +880,59 @@ def create_note():
         log_action('ERROR', details=f"Create note failed: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/notes/<int:note_id>', methods=['GET'])
+def get_note(note_id):
+    try:
+        # Ключ берём до чтения из базы: запись, случившаяся после, сменит поколение
+        cache_key = note_cache.note_key(note_id)
+        revision, last_modified = read_board_version()
+        etag = board_etag(revision, request_variant())
+        cached = cached_for_revision(cache_key, etag)
+        if cached is not None:
+            return cached_json(cached)
+
+        if is_not_modified(etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute(*queries.note_by_id(conn.dialect)(id=note_id))
+            note = cur.fetchone()
+            cur.close()
+        finally:
+            conn.close()
+
+        if not note:
+            return jsonify({'error': 'Note not found'}), 404
+        body = app.json.dumps(note_to_dict(note))
+        note_cache.set(cache_key, pack_response(etag, last_modified, body))
+        return set_validators(Response(body, mimetype='application/json'), etag, last_modified)
+    except Exception as e:
+        log_action('ERROR', note_id, f"Get note failed: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/notes/<int:note_id>', methods=['PATCH'])
 def update_note(note_id):
     try:
         data = request.json
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        update_fields = []
-        values = []
-        changes = {}
-        
-        if 'title' in data:
-            update_fields.append("title = %s")
-            values.append(data['title'])
-            changes['title'] = data['title']
-        
-        if 'content' in data:
-            update_fields.append("content = %s")
-            values.append(data['content'])
-            changes['content'] = 'updated'  # не логируем сам контент для краткости
+        update, changes = build_note_update(get_pool().dialect, data, note_id)
         
-        values.append(note_id)
-        
-        if update_fields:
-            query = f"UPDATE notes SET {', '.join(update_fields)} WHERE id = %s RETURNING *"
-            cur.execute(query, values)
-            updated_note = cur.fetchone()
-            conn.commit()
-            
-            if updated_note:
-                note_dict = {
-                    'id': updated_note[0],
-                    'title': updated_note[1],
-                    'content': updated_note[2],
-                    'status': updated_note[3],
-                    'created_at': updated_note[4].isoformat() if updated_note[4] else None
-                }
+        if update:
+            conn = get_db_connection()
+            try:
+                cur = conn.cursor()
+                rows = execute_write(cur, conn.dialect, *update)
+                conn.commit()
                 cur.close()
+            finally:
                 conn.close()
-                
+            
+            if rows:
+                invalidate_cache([note_id])
+                note_dict = note_to_dict(rows[0])
+                publish_note_event('update', note_id, note_dict)
+
                 # Логируем обновление заметки
                 log_action('UPDATE_NOTE', note_id, {
                     'changes': list(changes.keys()),
@@ -343,8 +941,6 @@ def update_note(note_id):
                 
                 return jsonify(note_dict)
         
-        cur.close()
-        conn.close()
         return jsonify({'error': 'Note not found'}), 404
     except Exception as e:
         log_action('ERROR', note_id, f"Update note failed: {str(e)}")
@@ -357,38 +953,37 @@ def update_note_status(note_id):
         new_status = data.get('status', 'todo')
         
         conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Получаем старый статус для логирования
-        cur.execute('SELECT status FROM notes WHERE id = %s', (note_id,))
-        old_note = cur.fetchone()
-        old_status = old_note[0] if old_note else None
+        try:
+            cur = conn.cursor()
         
-        cur.execute('UPDATE notes SET status = %s WHERE id = %s RETURNING *', (new_status, note_id))
-        updated_note = cur.fetchone()
-        conn.commit()
-        
-        if updated_note:
-            note_dict = {
-                'id': updated_note[0],
-                'title': updated_note[1],
-                'content': updated_note[2],
-                'status': updated_note[3],
-                'created_at': updated_note[4].isoformat() if updated_note[4] else None
-            }
+            # Старый статус для журнала возвращается тем же запросом, последней колонкой
+            values = {'status': new_status, 'updated_at': datetime.utcnow(), 'note_id': note_id}
+            if conn.dialect == 'sqlite':
+                # SQLite не разрешает ссылаться на FROM в RETURNING — читаем старый статус отдельно
+                cur.execute('SELECT status FROM notes WHERE id = %s', (note_id,))
+                old_note = cur.fetchone()
+                values['old_status'] = old_note[0] if old_note else None
+            rows = execute_write(cur, conn.dialect, *queries.update_status(conn.dialect)(**values))
+            conn.commit()
             cur.close()
+        finally:
             conn.close()
+        
+        if rows:
+            invalidate_cache([note_id], summary=True)
+            updated_note = rows[0]
+            note_dict = note_to_dict(updated_note)
+            kind = 'move' if updated_note[-1] != new_status else 'update'
+            publish_note_event(kind, note_id, note_dict)
             
             # Логируем изменение статуса
             log_action('CHANGE_STATUS', note_id, {
-                'old_status': old_status,
+                'old_status': updated_note[-1],
                 'new_status': new_status
             })
             
             return jsonify(note_dict)
         
-        cur.close()
-        conn.close()
         return jsonify({'error': 'Note not found'}), 404
     except Exception as e:
         log_action('ERROR', note_id, f"Status update failed: {str(e)}")
@@ -398,22 +993,24 @@ def update_note_status(note_id):
 def delete_note(note_id):
     try:
         conn = get_db_connection()
-        cur = conn.cursor()
+        try:
+            cur = conn.cursor()
         
-        # Получаем информацию о заметке перед удалением для логирования
-        cur.execute('SELECT title, status FROM notes WHERE id = %s', (note_id,))
-        note_info = cur.fetchone()
-        
-        cur.execute('DELETE FROM notes WHERE id = %s', (note_id,))
-        conn.commit()
-        cur.close()
-        conn.close()
+            rows = execute_write(cur, conn.dialect, *queries.delete_note(conn.dialect)(note_id=note_id),
+                                 tombstones=True)
+            conn.commit()
+            cur.close()
+        finally:
+            conn.close()
         
-        if note_info:
+        if rows:
+            invalidate_cache([note_id], summary=True)
+            publish_note_event('delete', note_id)
+
             # Логируем удаление заметки
             log_action('DELETE_NOTE', note_id, {
-                'title': note_info[0],
-                'status': note_info[1]
+                'title': rows[0][0],
+                'status': rows[0][1]
             })
         
         return '', 204
@@ -421,28 +1018,433 @@ def delete_note(note_id):
         log_action('ERROR', note_id, f"Delete note failed: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def validate_batch_operation(op):
+    """Проверяем одну операцию пакета; ValueError с причиной, если она некорректна"""
+    if not isinstance(op, dict):
+        raise ValueError('operation must be an object')
+    kind = op.get('op')
+    if kind not in BATCH_OPERATIONS:
+        raise ValueError(f"op must be one of: {', '.join(BATCH_OPERATIONS)}")
+
+    if kind == 'create':
+        return {
+            'op': kind,
+            'title': op.get('title', ''),
+            'content': op.get('content', ''),
+            'status': op.get('status', 'todo'),
+            'created_at': parse_timestamp(op.get('created_at'))
+        }
+
+    note_id = op.get('id')
+    if not isinstance(note_id, int) or isinstance(note_id, bool):
+        raise ValueError('id must be an integer')
+    if kind == 'update':
+        fields = {name: op[name] for name in ('title', 'content') if name in op}
+        if not fields:
+            raise ValueError('update needs title or content')
+        return {'op': kind, 'id': note_id, **fields}
+    if kind == 'status':
+        if not op.get('status'):
+            raise ValueError('status is required')
+        return {'op': kind, 'id': note_id, 'status': op['status']}
+    return {'op': kind, 'id': note_id}
+
+def batch_create(cur, dialect, items, revision):
+    """INSERT пачки заметок; строки возвращаются в порядке items"""
+    now = datetime.utcnow()
+    rows = [(item['title'], item['content'], item['status'], item['created_at'], now, revision) for item in items]
+    columns = 'title, content, status, created_at, updated_at, revision'
+    if dialect == 'postgres':
+        return execute_values(
+            cur,
+            f'INSERT INTO notes ({columns}) VALUES %s RETURNING {NOTE_COLUMNS}',
+            rows, page_size=len(rows), fetch=True
+        )
+    created = []
+    for row in rows:
+        cur.execute(f'INSERT INTO notes ({columns}) VALUES (%s, %s, %s, %s, %s, %s) RETURNING {NOTE_COLUMNS}', row)
+        created.append(cur.fetchone())
+    return created
+
+def batch_update(cur, dialect, items, revision):
+    """UPDATE title/content пачкой; возвращает {id: строка} обновлённых заметок"""
+    # Несколько операций над одной заметкой сливаем, последняя побеждает
+    merged = {}
+    for item in items:
+        merged.setdefault(item['id'], {}).update(
+            {name: item[name] for name in ('title', 'content') if name in item}
+        )
+    now = datetime.utcnow()
+
+    if dialect == 'postgres':
+        rows = [
+            (note_id, 'title' in fields, fields.get('title'), 'content' in fields, fields.get('content'),
+             now, revision)
+            for note_id, fields in merged.items()
+        ]
+        updated = execute_values(cur, f"""
+            UPDATE notes AS n SET
+                title = CASE WHEN v.set_title THEN v.title ELSE n.title END,
+                content = CASE WHEN v.set_content THEN v.content ELSE n.content END,
+                updated_at = v.updated_at,
+                revision = v.revision
+            FROM (VALUES %s) AS v(id, set_title, title, set_content, content, updated_at, revision)
+            WHERE n.id = v.id
+            RETURNING {NOTE_COLUMNS_N}
+        """, rows, template='(%s::integer, %s::boolean, %s::varchar, %s::boolean, %s::text, %s::timestamp, %s::bigint)',
+            page_size=len(rows), fetch=True)
+    else:
+        updated = []
+        for note_id, fields in merged.items():
+            assignments = ', '.join(f'{name} = %s' for name in fields)
+            cur.execute(f'UPDATE notes SET {assignments}, updated_at = %s, revision = %s WHERE id = %s RETURNING {NOTE_COLUMNS}',
+                        [*fields.values(), now, revision, note_id])
+            row = cur.fetchone()
+            if row:
+                updated.append(row)
+    return {row[0]: row for row in updated}
+
+def batch_status(cur, dialect, items, revision):
+    """Смена статусов пачкой; возвращает {id: строка}"""
+    merged = {item['id']: item['status'] for item in items}
+    now = datetime.utcnow()
+    if dialect == 'postgres':
+        updated = execute_values(cur, f"""
+            UPDATE notes AS n SET status = v.status, updated_at = v.updated_at, revision = v.revision
+            FROM (VALUES %s) AS v(id, status, updated_at, revision)
+            WHERE n.id = v.id
+            RETURNING {NOTE_COLUMNS_N}
+        """, [(note_id, status, now, revision) for note_id, status in merged.items()],
+            template='(%s::integer, %s::varchar, %s::timestamp, %s::bigint)',
+            page_size=len(merged), fetch=True)
+    else:
+        updated = []
+        for note_id, status in merged.items():
+            cur.execute(f'UPDATE notes SET status = %s, updated_at = %s, revision = %s WHERE id = %s RETURNING {NOTE_COLUMNS}',
+                        (status, now, revision, note_id))
+            row = cur.fetchone()
+            if row:
+                updated.append(row)
+    return {row[0]: row for row in updated}
+
+def batch_delete(cur, dialect, items, revision):
+    """DELETE пачкой со следами в note_tombstones; возвращает множество удалённых id"""
+    ids = list({item['id'] for item in items})
+    if dialect == 'postgres':
+        cur.execute('DELETE FROM notes WHERE id = ANY(%s) RETURNING id', (ids,))
+    else:
+        cur.execute(f"DELETE FROM notes WHERE id IN ({', '.join(['%s'] * len(ids))}) RETURNING id", ids)
+    deleted = {row[0] for row in cur.fetchall()}
+    if deleted:
+        insert_tombstones(cur, dialect, [(note_id, revision) for note_id in deleted], datetime.utcnow())
+    return deleted
+
+@app.route('/notes/batch', methods=['POST'])
+def batch_notes():
+    """Пакет операций над заметками в одной транзакции
+
+    Тело: {"operations": [{"op": "create", "title": ...}, {"op": "status", "id": 1, "status": "doing"},
+    {"op": "update", "id": 2, "title": ...}, {"op": "delete", "id": 3}]}.
+    Некорректные операции получают ошибку в results и пропускаются, остальные
+    выполняются вместе (create, update, status, delete) и фиксируются одним commit.
+    """
+    data = request.get_json(silent=True)
+    operations = data.get('operations') if isinstance(data, dict) else data
+    if not isinstance(operations, list):
+        return jsonify({'error': 'operations must be a list'}), 400
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        return jsonify({'error': f'too many operations (max {BATCH_MAX_OPERATIONS})'}), 413
+
+    results = [None] * len(operations)
+    valid = {kind: [] for kind in BATCH_OPERATIONS}
+    for index, op in enumerate(operations):
+        try:
+            item = validate_batch_operation(op)
+            valid[item['op']].append((index, item))
+        except ValueError as e:
+            kind = op.get('op') if isinstance(op, dict) else None
+            results[index] = {'index': index, 'op': kind, 'status': 'error', 'error': str(e)}
+
+    def item_result(index, item, row):
+        if row is None:
+            return {'index': index, 'op': item['op'], 'id': item.get('id'), 'status': 'not_found'}
+        return {'index': index, 'op': item['op'], 'id': row[0], 'status': 'ok', 'note': note_to_dict(row)}
+
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            # Все изменения пакета получают одну ревизию
+            revision = next_revision(cur, conn.dialect) if any(valid.values()) else None
+            if valid['create']:
+                rows = batch_create(cur, conn.dialect, [item for _, item in valid['create']], revision)
+                for (index, item), row in zip(valid['create'], rows):
+                    results[index] = item_result(index, item, row)
+
+            # Результат update/status — итоговое состояние заметки после обеих фаз
+            changed = {}
+            for kind, run in (('update', batch_update), ('status', batch_status)):
+                if valid[kind]:
+                    changed.update(run(cur, conn.dialect, [item for _, item in valid[kind]], revision))
+            for index, item in valid['update'] + valid['status']:
+                results[index] = item_result(index, item, changed.get(item['id']))
+
+            if valid['delete']:
+                deleted = batch_delete(cur, conn.dialect, [item for _, item in valid['delete']], revision)
+                for index, item in valid['delete']:
+                    found = item['id'] in deleted
+                    results[index] = {'index': index, 'op': 'delete', 'id': item['id'],
+                                      'status': 'ok' if found else 'not_found'}
+
+            applied = sum(1 for result in results if result['status'] == 'ok')
+            if applied:
+                bump_board_revision(cur)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()
+    except Exception as e:
+        log_action('ERROR', details=f"Batch failed: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+    if applied:
+        invalidate_cache({result['id'] for result in results if result['status'] == 'ok'}, summary=True)
+        kinds = {'create': 'create', 'update': 'update', 'status': 'move', 'delete': 'delete'}
+        for result in results:
+            if result['status'] == 'ok':
+                publish_note_event(kinds[result['op']], result['id'], result.get('note'))
+
+    # Одна запись в журнале на весь пакет
+    failed = len(results) - applied
+    log_action('BATCH_NOTES', details={
+        **{kind: len(valid[kind]) for kind in BATCH_OPERATIONS},
+        'applied': applied,
+        'failed': failed
+    })
+
+    return jsonify({'results': results, 'applied': applied, 'failed': failed})
+
 @app.route('/logs', methods=['GET'])
 def get_logs():
+    """Журнал действий из таблицы logs, новые сверху, по ключу (timestamp, id)
+
+    Фильтры: action (можно через запятую), note_id, ip, since, until (ISO-дата).
+    Страницы: limit, cursor (next_cursor предыдущей страницы).
+    ?source=file&lines=100 — последние строки файла лога (LOG_FILE, по умолчанию logs/app.log).
+    """
+    password = request.args.get('password')
+    if password != 'admin123':  # простой пароль для демо
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    if request.args.get('source') == 'file':
+        return get_log_file_tail()
+
     try:
-        password = request.args.get('password')
-        if password != 'admin123':  # простой пароль для демо
-            return jsonify({'error': 'Unauthorized'}), 401
-            
-        log_lines = []
-        log_file = 'logs/app.log'
-        
-        if os.path.exists(log_file):
-            with open(log_file, 'r', encoding='utf-8') as f:
-                log_lines = f.readlines()[-100:]  # последние 100 строк
-        
+        limit = min(int(request.args.get('limit', LOGS_PAGE_SIZE)), LOGS_MAX_PAGE_SIZE)
+        if limit < 1:
+            raise ValueError('limit must be positive')
+        cursor = request.args.get('cursor')
+        note_id = request.args.get('note_id')
+        filters = {
+            'actions': [a for a in request.args.get('action', '').split(',') if a],
+            'note_id': int(note_id) if note_id else None,
+            'ip': request.args.get('ip'),
+            'since': parse_timestamp(request.args['since']) if request.args.get('since') else None,
+            'until': parse_timestamp(request.args['until']) if request.args.get('until') else None,
+            'after': decode_cursor(cursor) if cursor else None,
+        }
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+            # Берём на одну запись больше, чтобы узнать, есть ли следующая страница
+            cur.execute(*build_logs_query(**filters, limit=limit + 1))
+            rows = cur.fetchall()
+            cur.close()
+        finally:
+            conn.close()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return jsonify({
+            'logs': [log_to_dict(row) for row in rows],
+            'total': len(rows),
+            'next_cursor': encode_cursor(rows[-1][1], rows[-1][0]) if has_more else None,
+            'limit': limit
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/logs/stats', methods=['GET'])
+def get_log_stats():
+    """Число событий журнала из почасовой сводки log_stats
+
+    Параметры: group (action, device, browser или hour), since, until (ISO-дата).
+    """
+    password = request.args.get('password')
+    if password != 'admin123':  # простой пароль для демо
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    group = request.args.get('group', 'action')
+    if group not in STATS_GROUPS:
+        return jsonify({'error': f"group must be one of: {', '.join(STATS_GROUPS)}"}), 400
+    try:
+        since = parse_timestamp(request.args['since']) if request.args.get('since') else None
+        until = parse_timestamp(request.args['until']) if request.args.get('until') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+            rows = read_log_stats(cur, group, since, until)
+            cur.close()
+        finally:
+            conn.close()
+        return jsonify({
+            'group': group,
+            'stats': [{group: key.isoformat() if group == 'hour' else key, 'count': int(count)}
+                      for key, count in rows],
+            'maintenance': log_maintenance.stats()
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Создать таблицы без миграций (локальная SQLite, тесты)"""
+    init_db()
+
+@app.cli.command('logs-maintenance')
+def logs_maintenance_command():
+    """Один проход обслуживания журнала (для cron вместо фонового потока)"""
+    print(log_maintenance.run_once())
+
+def get_log_file_tail():
+    """Последние строки файла лога — читаем с конца, не весь файл"""
+    try:
+        count = min(int(request.args.get('lines', 100)), LOGS_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'lines must be an integer'}), 400
+    try:
+        log_file = app_logging.path
+        log_lines = tail_lines(log_file, count) if os.path.exists(log_file) else []
         return jsonify({
             'logs': log_lines,
-            'total': len(log_lines)
+            'total': len(log_lines),
+            'source': 'file'
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# Инициализируем базу и логирование при запуске
+@app.route('/db/stats', methods=['GET'])
+def get_db_stats():
+    """Состояние пула соединений текущего воркера и кэша скомпилированных запросов"""
+    stats = get_pool().stats()
+    stats['compiled_queries'] = queries.stats()
+    return jsonify(stats)
+
+@app.route('/audit/stats', methods=['GET'])
+def get_audit_stats():
+    """Счётчики очереди записи журнала в базу, очереди файлового лога и кэша разбора User-Agent"""
+    info = parse_user_agent.cache_info()
+    return jsonify({
+        **audit_writer.stats(),
+        'user_agents': {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize},
+        'log_queue': app_logging.stats()
+    })
+
+@app.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Попадания, промахи и вытеснения кэша ответов в текущем воркере"""
+    return jsonify(note_cache.stats())
+
+@app.route('/events/stats', methods=['GET'])
+def get_events_stats():
+    """Подписчики /notes/stream и состояние LISTEN в текущем воркере"""
+    return jsonify(note_events.stats())
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Метрики текущего воркера в формате Prometheus"""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/profile/stats', methods=['GET'])
+def get_profile_stats():
+    """Настройки профилирования и число сохранённых медленных запросов"""
+    return jsonify(profiler.stats())
+
+@metrics.registry.collector
+def service_metrics():
+    """Очередь журнала, пул, кэш и подписчики — читаем при каждом опросе"""
+    audit = audit_writer.stats()
+    pool = get_pool().stats()
+    cache = note_cache.stats()
+    events = note_events.stats()
+    return [
+        ('audit_queue_depth', 'gauge', 'Audit log records waiting to be written.',
+         [({}, audit['depth'])]),
+        ('audit_records_total', 'counter', 'Audit log records by outcome.',
+         [({'result': result}, audit[result]) for result in ('queued', 'flushed', 'dropped', 'failed')]),
+        ('db_pool_connections', 'gauge', 'Pooled database connections by state.',
+         [({'state': 'in_use'}, pool['in_use']), ({'state': 'idle'}, pool['idle'])]),
+        ('db_pool_checkouts_total', 'counter', 'Connections taken from the pool.',
+         [({}, pool['checkouts'])]),
+        ('db_pool_timeouts_total', 'counter', 'Pool checkouts that timed out.',
+         [({}, pool['timeouts'])]),
+        ('db_pool_wait_seconds_total', 'counter', 'Time spent waiting for a pooled connection.',
+         [({}, pool['wait_time_total'])]),
+        ('cache_lookups_total', 'counter', 'Response cache lookups by result.',
+         [({'result': 'hit'}, cache['hits']), ({'result': 'miss'}, cache['misses'])]),
+        ('cache_evictions_total', 'counter', 'Response cache entries evicted to stay within limits.',
+         [({}, cache.get('evictions', 0))]),
+        ('events_subscribers', 'gauge', 'Open /notes/stream connections.',
+         [({}, events['subscribers'])]),
+    ]
+
+profiler = profiling.create_profiler()
+app_logging = None
+
+class MigrateCommands(click.Command):
+    """flask db ...: Flask-Migrate и Alembic импортируются только при вызове команды"""
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as group
+        if 'migrate' not in app.extensions:
+            Migrate(app, db)
+        # Дальше click разбирает аргументы и выполняет настоящую группу команд
+        return group.make_context(info_name, args, parent=parent, **extra)
+
+def create_app():
+    """Настраиваем приложение: конфиг, расширения, логирование
+
+    Не подключается к базе и не выполняет DDL — пул откроет соединение на
+    первом запросе, схему создают миграции (flask db upgrade) или flask init-db.
+    Настройки берутся только из окружения: пул, диалект и фоновые потоки
+    (db.py, audit.py, events.py) читают DATABASE_URL и DB_* из os.environ,
+    а приложение одно на процесс. Повторный вызов ничего не меняет.
+    """
+    global app_logging
+    if 'sqlalchemy' not in app.extensions:
+        # Alembic (flask db upgrade) работает с той же базой, что и пул
+        app.config.from_object('config')
+        app.config['SQLALCHEMY_DATABASE_URI'] = sqlalchemy_url(database_dialect())
+        db.init_app(app)
+        app.cli.add_command(MigrateCommands('db', help='Миграции базы (Flask-Migrate).'))
+        # Профилировщик подключается первым: его after_request выполняется последним
+        profiler.init_app(app)
+        metrics.init_app(app)
+        app_logging = setup_logging()
+    return app
+
 def escape_html(s=''):
     """Экранирует HTML символы для безопасности"""
     if s is None:
@@ -450,14 +1452,15 @@ def escape_html(s=''):
     s = str(s)
     return s.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;').replace("'", '&#39;')
 
-init_db()
-setup_logging()
+create_app()
 
 if __name__ == '__main__':
+    init_db()
     port = int(os.environ.get('PORT', 5000))
     print(f"🚀 Server running on http://localhost:{port}")
     print(f"🗄️  PostgreSQL connected on port 5433")
     print(f"📝 Logging enabled - check logs/app.log")
+    log_maintenance.start()
     app.run(host='0.0.0.0', port=port)
     
 if __name__ != '__main__':
@@ -0,0 +1,218 @@
+"""Логирование приложения через очередь: запрос не ждёт диска.
+
+На app.logger висит только QueueHandler — запись кладётся в ограниченную
+очередь в памяти. Файл и stdout пишет один поток QueueListener на процесс,
+поэтому запись на диск, проверка размера и ротация не попадают во время
+ответа. Если очередь переполнена (диск завис), новые записи отбрасываются
+и считаются в dropped, а не тормозят запросы.
+
+Формат — JSON-строки: одна запись на строку. У событий log_action в строке
+те же поля, что и в таблице logs (timestamp, ip, action, note_id, device,
+browser, details, endpoint, method), у остальных записей — timestamp, level,
+ip и message, а у logger.exception ещё и exception с трассой.
+
+Несколько воркеров gunicorn пишут в один файл. При LOG_ROTATION=size файл
+ротирует тот воркер, который первым упёрся в LOG_MAX_BYTES, под блокировкой
+(fcntl.flock на <файл>.lock); остальные замечают новый файл по inode и
+переоткрывают его. LOG_ROTATION=external — ротацией занимается logrotate,
+процессы только переоткрывают файл (как WatchedFileHandler).
+
+Переменные окружения:
+    LOG_FILE         — путь к файлу (logs/app.log)
+    LOG_ROTATION     — size (по умолчанию) | external
+    LOG_MAX_BYTES    — размер файла для ротации (5 МБ)
+    LOG_BACKUP_COUNT — сколько старых файлов хранить (5)
+    LOG_QUEUE_SIZE   — ёмкость очереди записей (10000)
+    LOG_STDOUT       — on (по умолчанию) | off — дублировать записи в stdout
+"""
+import atexit
+import copy
+import logging
+import os
+import queue
+import sys
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+import fastjson
+
+try:
+    import fcntl
+except ImportError:  # Windows: ротация без межпроцессной блокировки
+    fcntl = None
+
+ROTATION_MODES = ('size', 'external')
+
+
+class JSONLineFormatter(logging.Formatter):
+    """Запись лога -> одна строка JSON"""
+
+    def format(self, record):
+        event = getattr(record, 'event', None)
+        if event is not None:
+            line = {**event, 'level': record.levelname}
+        else:
+            line = {
+                'timestamp': datetime.fromtimestamp(record.created).isoformat(),
+                'level': record.levelname,
+                'ip': getattr(record, 'ip', '-'),
+                'message': record.getMessage(),
+            }
+            if record.exc_info and not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+            if record.exc_text:
+                line['exception'] = record.exc_text
+        return fastjson.dumps(line)
+
+
+class SharedFileHandler(RotatingFileHandler):
+    """Файл, в который пишут несколько процессов
+
+    Перед записью сверяет inode открытого файла с файлом на диске и
+    переоткрывает его, если файл ротировал другой процесс или logrotate.
+    При max_bytes=0 сам не ротирует (LOG_ROTATION=external).
+    """
+
+    def __init__(self, filename, max_bytes=0, backup_count=0):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count,
+                         encoding='utf-8', delay=True)
+        self.lock_path = self.baseFilename + '.lock'
+        self.inode = None
+
+    def _open(self):
+        stream = super()._open()
+        self.inode = os.fstat(stream.fileno()).st_ino
+        return stream
+
+    def reopen_if_moved(self):
+        if self.stream is None:
+            return
+        try:
+            moved = os.stat(self.baseFilename).st_ino != self.inode
+        except FileNotFoundError:
+            moved = True
+        if moved:
+            self.stream.close()
+            self.stream = None  # откроется заново при записи
+
+    def emit(self, record):
+        self.reopen_if_moved()
+        super().emit(record)
+
+    def doRollover(self):
+        if fcntl is None:
+            return super().doRollover()
+        with open(self.lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # Пока ждали блокировку, файл мог ротировать другой воркер
+                self.reopen_if_moved()
+                if self.stream is not None and os.path.getsize(self.baseFilename) >= self.maxBytes:
+                    super().doRollover()
+                elif self.stream is None:
+                    self.stream = self._open()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler, который при полной очереди отбрасывает запись, а не ждёт"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.exception_formatter = JSONLineFormatter()
+        self._lock = threading.Lock()
+
+    def prepare(self, record):
+        # QueueHandler.prepare стирает exc_info и exc_text (и дописал бы трассу
+        # в message) — форматируем исключение здесь, поток-писатель получит
+        # его текстом в exc_text
+        record = copy.copy(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.exception_formatter.formatException(record.exc_info)
+        exc_text = record.exc_text
+        record.exc_info = None
+        record.exc_text = None
+        record = super().prepare(record)
+        record.exc_text = exc_text
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+
+class AppLogging:
+    """QueueHandler на логгере и один поток-писатель на процесс"""
+
+    def __init__(self, handlers, queue_size=10000, path=None):
+        self.path = path  # файл лога — для /logs?source=file
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.handlers = handlers
+        self.listener = QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self.started = False
+
+    def install(self, logger):
+        # Обработчики, которые писали прямо из запроса (в том числе
+        # default_handler Flask в stderr), заменяем очередью
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(self.handler)
+        logger.setLevel(logging.INFO)
+        # Записи уже попали в нужные обработчики — корневому логгеру не передаём
+        logger.propagate = False
+
+    def start(self):
+        if not self.started:
+            self.listener.start()
+            self.started = True
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Дописываем очередь и закрываем файлы"""
+        if self.started:
+            self.listener.stop()
+            self.started = False
+        for handler in self.handlers:
+            handler.close()
+
+    def stats(self):
+        return {
+            'queued': self.queue.qsize(),
+            'max_size': self.queue.maxsize,
+            'dropped': self.handler.dropped,
+            'running': self.started,
+        }
+
+
+def create_logging(logger):
+    """Логирование по переменным окружения; поток-писатель уже запущен"""
+    path = os.environ.get('LOG_FILE', 'logs/app.log')
+    rotation = os.environ.get('LOG_ROTATION', 'size')
+    if rotation not in ROTATION_MODES:
+        print(f"⚠️ Неизвестный LOG_ROTATION={rotation}, используем size")
+        rotation = 'size'
+    max_bytes = int(os.environ.get('LOG_MAX_BYTES', 5 * 1024 * 1024)) if rotation == 'size' else 0
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    formatter = JSONLineFormatter()
+    handlers = [SharedFileHandler(path, max_bytes, int(os.environ.get('LOG_BACKUP_COUNT', 5)))]
+    if os.environ.get('LOG_STDOUT', 'on') != 'off':
+        handlers.append(logging.StreamHandler(sys.stdout))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        handler.setLevel(logging.INFO)
+
+    app_logging = AppLogging(handlers, int(os.environ.get('LOG_QUEUE_SIZE', 10000)), path)
+    app_logging.install(logger)
+    app_logging.start()
+    return app_logging
@@ -0,0 +1,382 @@
+"""ASGI-вход: маршруты /notes на asyncio с неблокирующим пулом Postgres.
+
+Запуск (любой ASGI-сервер, например uvicorn):
+    uvicorn asgi:app --workers 2
+
+Синхронный воркер gunicorn занят целиком, пока ждёт базу. Здесь ожидание
+базы — это await, и один процесс держит столько запросов одновременно,
+сколько соединений в пуле (ASYNC_DB_POOL_MAX), а не сколько у него потоков.
+
+Обслуживаются GET/POST /notes, GET/PATCH/DELETE /notes/<id>,
+PATCH /notes/<id>/status и /db/stats. Ответы те же, что у app.py:
+те же поля, курсоры, ETag и коды ошибок — запросы, SQL записи и
+сериализация заметок берутся оттуда. Остальные маршруты (поиск, SSE,
+журнал, пакетная запись) по-прежнему обслуживает gunicorn app:app.
+
+Журнал действий пишет тот же AuditLogWriter: enqueue только кладёт строку
+в очередь, в базу её вставляет фоновый поток. События для /notes/stream
+отправляет триггер notes_notify (миграция 0005) — их получат воркеры
+app.py, где бы они ни работали.
+"""
+import asyncio
+import re
+import urllib.parse
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+import fastjson
+import queries
+from app import (
+    app as flask_app, audit_writer, board_etag, build_note_update, build_notes_query,
+    create_note_params, decode_cursor, invalidate_cache, note_to_dict, page_cursor,
+    parse_page_size, parse_statuses, parse_user_agent, postgres_write,
+)
+from async_db import create_async_pool
+
+
+class Request:
+    """Разобранный HTTP-запрос из scope ASGI"""
+
+    def __init__(self, scope, body):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.query_string = scope.get('query_string', b'').decode('latin-1')
+        self.args = dict(urllib.parse.parse_qsl(self.query_string, keep_blank_values=True))
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                        for name, value in scope.get('headers', [])}
+        self.client = scope.get('client')
+        self.body = body
+
+    def json(self):
+        try:
+            data = flask_app.json.loads(self.body or b'null')
+        except ValueError:
+            raise BadRequest('Invalid JSON body')
+        if not isinstance(data, dict):
+            raise BadRequest('JSON object expected')
+        return data
+
+    @property
+    def variant(self):
+        """Как request_variant в app.py — ETag совпадает у обоих серверов"""
+        args = urllib.parse.parse_qsl(self.query_string, keep_blank_values=True)
+        return f"{self.path}?{'&'.join(f'{key}={value}' for key, value in sorted(args))}"
+
+    @property
+    def client_ip(self):
+        if self.headers.get('x-forwarded-for'):
+            return self.headers['x-forwarded-for'].split(',')[0]
+        if self.headers.get('x-real-ip'):
+            return self.headers['x-real-ip']
+        return self.client[0] if self.client else None
+
+
+class BadRequest(Exception):
+    """Ошибка разбора запроса — ответ 400"""
+
+
+class Response:
+    def __init__(self, body=b'', status=200, headers=None, content_type='application/json'):
+        self.body = body.encode('utf-8') if isinstance(body, str) else body
+        self.status = status
+        # Как CORS(app) во Flask: API открыто для любого источника
+        self.headers = {'Access-Control-Allow-Origin': '*', **(headers or {})}
+        if self.body:
+            self.headers['Content-Type'] = content_type
+
+    async def send(self, send):
+        headers = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                   for name, value in self.headers.items()]
+        headers.append((b'content-length', str(len(self.body)).encode('ascii')))
+        await send({'type': 'http.response.start', 'status': self.status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': self.body})
+
+
+def json_response(value, status=200, headers=None):
+    # Тот же JSON-провайдер, что у Flask: ключи и формат совпадают
+    return Response(flask_app.json.dumps(value), status, headers)
+
+
+def error_response(message, status=500):
+    return json_response({'error': message}, status)
+
+
+def log_action(request, endpoint, action, note_id=None, details=None):
+    """Строка журнала в очередь AuditLogWriter — как log_action в app.py"""
+    user_agent_info = parse_user_agent(request.headers.get('user-agent', ''))
+    audit_writer.enqueue((
+        datetime.now(),
+        request.client_ip, action, note_id,
+        user_agent_info['device'],
+        user_agent_info['browser'],
+        fastjson.dumps(details) if details else None,
+        endpoint,
+        request.method
+    ))
+
+
+# ---------- Условные запросы ----------
+
+def validators(etag, last_modified):
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+    if last_modified:
+        headers['Last-Modified'] = format_datetime(last_modified, usegmt=True)
+    return headers
+
+
+def is_not_modified(request, etag, last_modified):
+    """If-None-Match / If-Modified-Since, первый важнее — как в app.py"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match:
+        tags = [tag.strip().removeprefix('W/').strip('"') for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags
+    if_modified_since = request.headers.get('if-modified-since')
+    if last_modified and if_modified_since:
+        try:
+            return last_modified.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+async def read_board_version(conn):
+    row = await conn.fetchrow('SELECT revision, updated_at FROM board_state WHERE id = 1')
+    if not row:
+        return 0, None
+    updated_at = row[1].replace(tzinfo=timezone.utc) if row[1] else None
+    return int(row[0]), updated_at
+
+
+# ---------- Маршруты ----------
+
+async def get_notes(request, pool):
+    try:
+        limit = parse_page_size(request.args)
+        cursor = request.args.get('cursor')
+        after = decode_cursor(cursor) if cursor else None
+        statuses = parse_statuses(request.args)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    if request.args.get('stream') in ('1', 'true'):
+        return error_response('stream=1 is served by the WSGI app; use /notes/export', 400)
+
+    try:
+        async with pool.connection() as conn:
+            revision, last_modified = await read_board_version(conn)
+            etag = board_etag(revision, request.variant)
+            if is_not_modified(request, etag, last_modified):
+                return Response(status=304, headers=validators(etag, last_modified))
+
+            log_action(request, 'get_notes', 'GET_ALL_NOTES', details={'async': True})
+            # Берём на одну запись больше, чтобы узнать, есть ли следующая страница
+            notes = await conn.fetch(*build_notes_query('postgres', statuses, after, limit + 1))
+        has_more = len(notes) > limit
+        notes = notes[:limit]
+        return json_response({
+            'notes': [note_to_dict(note) for note in notes],
+            'next_cursor': page_cursor(notes[-1]) if has_more else None,
+            'limit': limit,
+            'revision': revision
+        }, headers=validators(etag, last_modified))
+    except Exception as e:
+        log_action(request, 'get_notes', 'ERROR', details=f"Get notes failed: {str(e)}")
+        return error_response(str(e))
+
+
+async def create_note(request, pool):
+    try:
+        data = request.json()
+        async with pool.connection() as conn:
+            rows = await conn.fetch(*postgres_write(*queries.insert_note('postgres')(**create_note_params(data))))
+        invalidate_cache(summary=True)
+        note_dict = note_to_dict(rows[0])
+        log_action(request, 'create_note', 'CREATE_NOTE', note_dict['id'], {
+            'title': data.get('title', ''),
+            'status': data.get('status', 'todo')
+        })
+        return json_response(note_dict, 201)
+    except BadRequest as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        log_action(request, 'create_note', 'ERROR', details=f"Create note failed: {str(e)}")
+        return error_response(str(e))
+
+
+async def get_note(request, pool, note_id):
+    try:
+        async with pool.connection() as conn:
+            revision, last_modified = await read_board_version(conn)
+            etag = board_etag(revision, request.variant)
+            if is_not_modified(request, etag, last_modified):
+                return Response(status=304, headers=validators(etag, last_modified))
+            note = await conn.fetchrow(*queries.note_by_id('postgres')(id=note_id))
+        if not note:
+            return error_response('Note not found', 404)
+        return json_response(note_to_dict(note), headers=validators(etag, last_modified))
+    except Exception as e:
+        log_action(request, 'get_note', 'ERROR', note_id, f"Get note failed: {str(e)}")
+        return error_response(str(e))
+
+
+async def update_note(request, pool, note_id):
+    try:
+        update, changes = build_note_update('postgres', request.json(), note_id)
+        if update:
+            async with pool.connection() as conn:
+                rows = await conn.fetch(*postgres_write(*update))
+            if rows:
+                invalidate_cache([note_id])
+                log_action(request, 'update_note', 'UPDATE_NOTE', note_id, {
+                    'changes': list(changes.keys()),
+                    'new_title': changes.get('title')
+                })
+                return json_response(note_to_dict(rows[0]))
+        return error_response('Note not found', 404)
+    except BadRequest as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        log_action(request, 'update_note', 'ERROR', note_id, f"Update note failed: {str(e)}")
+        return error_response(str(e))
+
+
+async def update_note_status(request, pool, note_id):
+    try:
+        new_status = request.json().get('status', 'todo')
+        async with pool.connection() as conn:
+            rows = await conn.fetch(*postgres_write(*queries.update_status('postgres')(
+                status=new_status, updated_at=datetime.utcnow(), note_id=note_id)))
+        if rows:
+            invalidate_cache([note_id], summary=True)
+            log_action(request, 'update_note_status', 'CHANGE_STATUS', note_id, {
+                'old_status': rows[0][-1],
+                'new_status': new_status
+            })
+            return json_response(note_to_dict(rows[0]))
+        return error_response('Note not found', 404)
+    except BadRequest as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        log_action(request, 'update_note_status', 'ERROR', note_id, f"Status update failed: {str(e)}")
+        return error_response(str(e))
+
+
+async def delete_note(request, pool, note_id):
+    try:
+        async with pool.connection() as conn:
+            rows = await conn.fetch(*postgres_write(*queries.delete_note('postgres')(note_id=note_id),
+                                                    tombstones=True))
+        if rows:
+            invalidate_cache([note_id], summary=True)
+            log_action(request, 'delete_note', 'DELETE_NOTE', note_id, {
+                'title': rows[0][0],
+                'status': rows[0][1]
+            })
+        return Response(status=204)
+    except Exception as e:
+        log_action(request, 'delete_note', 'ERROR', note_id, f"Delete note failed: {str(e)}")
+        return error_response(str(e))
+
+
+async def get_db_stats(request, pool):
+    return json_response(pool.stats())
+
+
+ROUTES = [
+    (re.compile(r'/notes'), {'GET': get_notes, 'POST': create_note}),
+    (re.compile(r'/notes/(\d+)'), {'GET': get_note, 'PATCH': update_note, 'DELETE': delete_note}),
+    (re.compile(r'/notes/(\d+)/status'), {'PATCH': update_note_status}),
+    (re.compile(r'/db/stats'), {'GET': get_db_stats}),
+]
+
+
+def resolve(method, path):
+    """(обработчик, аргументы пути) или Response с 404/405 и ответом на preflight CORS"""
+    for pattern, handlers in ROUTES:
+        match = pattern.fullmatch(path)
+        if not match:
+            continue
+        if method == 'OPTIONS':
+            return Response(status=200, headers={
+                'Allow': ', '.join([*handlers, 'OPTIONS']),
+                'Access-Control-Allow-Methods': ', '.join(handlers),
+                'Access-Control-Allow-Headers': 'Content-Type, If-None-Match, If-Modified-Since',
+            }), ()
+        handler = handlers.get(method)
+        if handler is None:
+            return error_response('Method not allowed', 405), ()
+        return handler, tuple(int(value) for value in match.groups())
+    return error_response('Not found', 404), ()
+
+
+class NotesASGI:
+    """ASGI-приложение: пул открывается при старте (lifespan) или при первом запросе"""
+
+    def __init__(self, create_pool=create_async_pool):
+        self.create_pool = create_pool
+        self.pool = None
+        self._opening = asyncio.Lock()
+
+    async def _get_pool(self):
+        if self.pool is None:
+            # Первые запросы без lifespan приходят разом — пул открывает один
+            async with self._opening:
+                if self.pool is None:
+                    pool = self.create_pool()
+                    await pool.open()
+                    self.pool = pool
+        return self.pool
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        else:
+            raise RuntimeError(f"unsupported ASGI scope: {scope['type']}")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self._get_pool()
+                except Exception as e:
+                    print(f"❌ Не удалось открыть пул Postgres: {e}")
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                print(f"🚀 ASGI-режим: пул до {self.pool.max_size} соединений")
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.pool is not None:
+                    await self.pool.close()
+                    self.pool = None
+                # flush ждёт фоновый поток журнала — не блокируем цикл событий
+                await asyncio.get_running_loop().run_in_executor(None, audit_writer.flush)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        body = b''
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        request = Request(scope, body)
+        handler, args = resolve(request.method, request.path)
+        if isinstance(handler, Response):
+            response = handler
+        else:
+            try:
+                pool = await self._get_pool()
+            except Exception as e:
+                response = error_response(str(e))
+            else:
+                response = await handler(request, pool, *args)
+        await response.send(send)
+
+
+app = NotesASGI()
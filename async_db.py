@@ -0,0 +1,229 @@
+"""Асинхронный пул соединений с Postgres для ASGI-режима (asgi.py).
+
+Соединения psycopg2 открываются в неблокирующем режиме (async_=1): запрос
+уходит в базу сразу, а о готовности ответа сообщает сокет, за которым
+следит цикл asyncio (add_reader/add_writer). Пока одна корутина ждёт базу,
+процесс обслуживает остальные запросы.
+
+Неблокирующие соединения psycopg2 работают только в autocommit: каждый
+оператор фиксируется сам. Поэтому запись заметки — один оператор
+(postgres_write в app.py), как и в синхронном режиме.
+
+Переменные окружения:
+    ASYNC_DB_POOL_MIN  — сколько соединений открыть при старте (по умолчанию 2)
+    ASYNC_DB_POOL_MAX  — максимум соединений на процесс (20)
+    DB_POOL_TIMEOUT    — сколько секунд ждать свободное соединение (10)
+    DB_CONNECT_TIMEOUT — таймаут установки соединения (5)
+"""
+import asyncio
+import contextlib
+import os
+from collections import deque
+
+import psycopg2
+import psycopg2.extensions
+
+from db import PoolTimeout, postgres_params
+
+
+async def wait_ready(raw):
+    """Ждём, пока неблокирующее соединение закончит текущую операцию"""
+    loop = asyncio.get_running_loop()
+    fd = raw.fileno()
+    while True:
+        state = raw.poll()
+        if state == psycopg2.extensions.POLL_OK:
+            return
+        if state == psycopg2.extensions.POLL_READ:
+            add, remove = loop.add_reader, loop.remove_reader
+        elif state == psycopg2.extensions.POLL_WRITE:
+            add, remove = loop.add_writer, loop.remove_writer
+        else:
+            raise psycopg2.OperationalError(f'poll() returned {state}')
+        ready = loop.create_future()
+        # Сокет может сработать ещё раз до того, как корутина проснётся
+        add(fd, lambda: ready.done() or ready.set_result(None))
+        try:
+            await ready
+        finally:
+            remove(fd)
+
+
+class AsyncConnection:
+    """Неблокирующее соединение: execute/fetch/fetchrow — корутины"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.dialect = 'postgres'
+
+    async def _run(self, query, params):
+        cur = self.raw.cursor()
+        try:
+            cur.execute(query, params)
+            await wait_ready(self.raw)
+        except BaseException:
+            cur.close()
+            raise
+        return cur
+
+    async def execute(self, query, params=None):
+        """Выполняем оператор; возвращает rowcount"""
+        cur = await self._run(query, params)
+        count = cur.rowcount
+        cur.close()
+        return count
+
+    async def fetch(self, query, params=None):
+        cur = await self._run(query, params)
+        rows = cur.fetchall()
+        cur.close()
+        return rows
+
+    async def fetchrow(self, query, params=None):
+        cur = await self._run(query, params)
+        row = cur.fetchone()
+        cur.close()
+        return row
+
+    @property
+    def reusable(self):
+        """Можно вернуть в пул: соединение живо и не занято запросом"""
+        return (not self.raw.closed
+                and self.raw.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE)
+
+    def close(self):
+        if not self.raw.closed:
+            self.raw.close()
+
+
+class AsyncPool:
+    """Пул неблокирующих соединений одного цикла событий"""
+
+    def __init__(self, connect_params, min_size=2, max_size=20, timeout=10.0):
+        self.connect_params = connect_params
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+
+        self._idle = deque()
+        self._slots = None
+        self._size = 0
+        self._closed = False
+
+        # Счётчики
+        self._created = 0
+        self._discarded = 0
+        self._acquired = 0
+        self._waits = 0
+        self._timeouts = 0
+
+    async def _connect(self):
+        raw = psycopg2.connect(async_=1, **self.connect_params)
+        try:
+            # libpq не применяет connect_timeout к неблокирующему подключению
+            await asyncio.wait_for(wait_ready(raw), self.connect_params.get('connect_timeout') or None)
+        except BaseException:
+            raw.close()
+            raise
+        self._created += 1
+        return AsyncConnection(raw)
+
+    async def open(self):
+        """Открываем min_size соединений заранее — вызывается при старте ASGI-приложения"""
+        self._closed = False
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_size)
+        while self._size < self.min_size:
+            self._size += 1
+            try:
+                self._idle.append(await self._connect())
+            except BaseException:
+                self._size -= 1
+                raise
+
+    async def acquire(self):
+        if self._closed:
+            raise psycopg2.InterfaceError('pool is closed')
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_size)
+        if self._slots.locked():
+            self._waits += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise PoolTimeout(f'no free async connection within {self.timeout}s '
+                              f'(max {self.max_size})')
+
+        while self._idle:
+            conn = self._idle.pop()
+            if conn.reusable:
+                self._acquired += 1
+                return conn
+            self._discard(conn)
+
+        self._size += 1
+        try:
+            conn = await self._connect()
+        except BaseException:
+            self._size -= 1
+            self._slots.release()
+            raise
+        self._acquired += 1
+        return conn
+
+    def release(self, conn):
+        # Запрос прервали на середине (отмена, обрыв) — соединение не переиспользуем
+        if self._closed or not conn.reusable:
+            self._discard(conn)
+        else:
+            self._idle.append(conn)
+        self._slots.release()
+
+    def _discard(self, conn):
+        conn.close()
+        self._size -= 1
+        self._discarded += 1
+
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        conn = await self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    async def close(self):
+        """Закрываем свободные соединения; занятые закроются при возврате"""
+        self._closed = True
+        while self._idle:
+            self._discard(self._idle.pop())
+
+    def stats(self):
+        return {
+            'dialect': 'postgres',
+            'mode': 'async',
+            'size': self._size,
+            'idle': len(self._idle),
+            'in_use': self._size - len(self._idle),
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            'created': self._created,
+            'discarded': self._discarded,
+            'acquired': self._acquired,
+            'waits': self._waits,
+            'timeouts': self._timeouts,
+        }
+
+
+def create_async_pool():
+    """Асинхронный пул по настройкам окружения; только для Postgres"""
+    database_url = os.environ.get('DATABASE_URL')
+    if database_url and database_url.startswith('sqlite'):
+        raise RuntimeError('ASGI-режим работает только с Postgres (DATABASE_URL=postgresql://...)')
+    return AsyncPool(
+        postgres_params(database_url),
+        min_size=int(os.environ.get('ASYNC_DB_POOL_MIN', 2)),
+        max_size=int(os.environ.get('ASYNC_DB_POOL_MAX', 20)),
+        timeout=float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    )
@@ -0,0 +1,315 @@
+"""Асинхронная запись журнала действий в таблицу logs.
+
+log_action только кладёт событие в ограниченную очередь в памяти,
+а фоновый поток пачками вставляет их в базу: многострочным INSERT
+(execute_values) для Postgres и executemany для SQLite. Пачка
+сбрасывается, когда набралось AUDIT_BATCH_SIZE событий или прошло
+AUDIT_FLUSH_INTERVAL секунд.
+
+Переменные окружения:
+    AUDIT_QUEUE_SIZE     — ёмкость очереди (по умолчанию 10000)
+    AUDIT_BATCH_SIZE     — максимальный размер пачки (500)
+    AUDIT_FLUSH_INTERVAL — как часто сбрасывать неполную пачку, секунды (1.0)
+    AUDIT_DROP_POLICY    — что делать при переполнении очереди:
+                           drop_newest (отбросить новое событие),
+                           drop_oldest (вытеснить самое старое),
+                           block (подождать AUDIT_BLOCK_TIMEOUT секунд)
+    AUDIT_BLOCK_TIMEOUT  — сколько ждать места в очереди при block (0.05)
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from psycopg2.extras import execute_values
+
+LOG_COLUMNS = ('timestamp', 'ip', 'action', 'note_id', 'device', 'browser',
+               'details', 'endpoint', 'method')
+
+DROP_POLICIES = ('drop_newest', 'drop_oldest', 'block')
+
+
+def create_logs_table(cur, dialect):
+    """DDL таблицы logs — выполняется один раз при старте"""
+    id_column = 'SERIAL PRIMARY KEY' if dialect == 'postgres' else 'INTEGER PRIMARY KEY AUTOINCREMENT'
+    cur.execute(f'''
+        CREATE TABLE IF NOT EXISTS logs (
+            id {id_column},
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            ip VARCHAR(45),
+            action VARCHAR(100),
+            note_id INTEGER,
+            device VARCHAR(50),
+            browser VARCHAR(50),
+            details JSONB,
+            endpoint VARCHAR(100),
+            method VARCHAR(10)
+        )
+    ''')
+
+
+def insert_log_rows(cur, dialect, rows):
+    """Вставляем пачку строк журнала одним запросом"""
+    columns = ', '.join(LOG_COLUMNS)
+    if dialect == 'postgres':
+        execute_values(cur, f'INSERT INTO logs ({columns}) VALUES %s', rows,
+                       page_size=len(rows))
+    else:
+        placeholders = ', '.join(['%s'] * len(LOG_COLUMNS))
+        cur.executemany(f'INSERT INTO logs ({columns}) VALUES ({placeholders})', rows)
+
+
+def build_logs_query(actions=None, note_id=None, ip=None, since=None, until=None,
+                     after=None, limit=None):
+    """SELECT журнала в порядке (timestamp, id) по убыванию — по нему построены индексы 0007"""
+    conditions = []
+    params = []
+    if actions:
+        conditions.append(f"action IN ({', '.join(['%s'] * len(actions))})")
+        params.extend(actions)
+    if note_id is not None:
+        conditions.append('note_id = %s')
+        params.append(note_id)
+    if ip:
+        conditions.append('ip = %s')
+        params.append(ip)
+    if since:
+        conditions.append('timestamp >= %s')
+        params.append(since)
+    if until:
+        conditions.append('timestamp < %s')
+        params.append(until)
+    if after:
+        conditions.append('(timestamp, id) < (%s, %s)')
+        params.extend(after)
+
+    query = f"SELECT id, {', '.join(LOG_COLUMNS)} FROM logs"
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY timestamp DESC, id DESC'
+    if limit is not None:
+        query += ' LIMIT %s'
+        params.append(limit)
+    return query, params
+
+
+def log_to_dict(row):
+    """Строка таблицы logs -> JSON-словарь"""
+    entry = dict(zip(('id',) + LOG_COLUMNS, row))
+    if entry['timestamp'] is not None:
+        entry['timestamp'] = entry['timestamp'].isoformat()
+    # В SQLite колонка JSONB — просто текст
+    if isinstance(entry['details'], str):
+        try:
+            entry['details'] = json.loads(entry['details'])
+        except ValueError:
+            pass
+    return entry
+
+
+def tail_lines(path, count, block_size=64 * 1024):
+    """Последние count строк файла: читаем блоки с конца, а не весь файл"""
+    if count <= 0:
+        return []
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        # count + 1 перевод строки: первая строка блока может быть неполной
+        while position > 0 and data.count(b'\n') <= count:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    lines = data.decode('utf-8', 'replace').splitlines(keepends=True)
+    return lines[-count:]
+
+
+class AuditLogWriter:
+    """Ограниченная очередь событий и фоновый поток, пишущий их в базу"""
+
+    def __init__(self, connect, max_queue=10000, batch_size=500,
+                 flush_interval=1.0, drop_policy='drop_newest', block_timeout=0.05):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f'unknown drop policy: {drop_policy}')
+        self.connect = connect
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+        self.block_timeout = block_timeout
+
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._inflight = 0
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+        self._flush_requested = False
+
+        # Счётчики
+        self._queued = 0
+        self._flushed = 0
+        self._dropped = 0
+        self._failed = 0
+        self._batches = 0
+
+    def _ensure_thread(self):
+        # После fork поток родителя в воркере не существует — запускаем свой
+        if self._thread is None or self._pid != os.getpid():
+            self._queue.clear()
+            self._inflight = 0
+            self._stopping = False
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+            self._thread.start()
+
+    def enqueue(self, row):
+        """Кладём событие в очередь; возвращает False, если оно отброшено"""
+        with self._cond:
+            if self._stopping:
+                self._dropped += 1
+                return False
+            self._ensure_thread()
+
+            if len(self._queue) >= self.max_queue:
+                if self.drop_policy == 'drop_oldest':
+                    self._queue.popleft()
+                    self._dropped += 1
+                elif self.drop_policy == 'block':
+                    deadline = time.monotonic() + self.block_timeout
+                    while len(self._queue) >= self.max_queue:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._dropped += 1
+                            return False
+                        self._cond.wait(remaining)
+                else:
+                    self._dropped += 1
+                    return False
+
+            self._queue.append(row)
+            self._queued += 1
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+            return True
+
+    def _take_batch(self):
+        count = min(self.batch_size, len(self._queue))
+        batch = [self._queue.popleft() for _ in range(count)]
+        self._inflight += count
+        return batch
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            with self._cond:
+                while (not self._stopping and not self._flush_requested
+                       and len(self._queue) < self.batch_size):
+                    remaining = self.flush_interval - (time.monotonic() - last_flush)
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._take_batch()
+                if not self._queue:
+                    self._flush_requested = False
+                stopping = self._stopping
+                # Освобождаем место для ожидающих производителей
+                self._cond.notify_all()
+
+            if batch:
+                self._write(batch)
+            last_flush = time.monotonic()
+
+            with self._cond:
+                self._inflight -= len(batch)
+                self._cond.notify_all()
+                if stopping and not self._queue:
+                    return
+
+    def _write(self, batch):
+        conn = None
+        try:
+            conn = self.connect()
+            cur = conn.cursor()
+            insert_log_rows(cur, conn.dialect, batch)
+            conn.commit()
+            cur.close()
+            with self._cond:
+                self._flushed += len(batch)
+                self._batches += 1
+        except Exception as e:
+            print(f"❌ Ошибка сохранения лога в БД: {e}")
+            if conn is not None:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+            with self._cond:
+                self._failed += len(batch)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def flush(self, timeout=5.0):
+        """Ждём, пока всё из очереди будет записано; True, если успели"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if self._thread is None or self._pid != os.getpid():
+                return not self._queue
+            while self._queue or self._inflight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                # Будим писателя, чтобы не ждать flush_interval
+                self._flush_requested = True
+                self._cond.notify_all()
+                self._cond.wait(min(remaining, 0.05))
+            return True
+
+    def stop(self, timeout=5.0):
+        """Дописываем очередь и останавливаем поток (при завершении воркера)"""
+        with self._cond:
+            thread = self._thread
+            if thread is None or self._pid != os.getpid():
+                return
+            self._stopping = True
+            self._cond.notify_all()
+        thread.join(timeout)
+        with self._cond:
+            self._thread = None
+
+    def stats(self):
+        """Счётчики очереди"""
+        with self._cond:
+            return {
+                'queued': self._queued,
+                'flushed': self._flushed,
+                'dropped': self._dropped,
+                'failed': self._failed,
+                'batches': self._batches,
+                'depth': len(self._queue),
+                'in_flight': self._inflight,
+                'max_queue': self.max_queue,
+                'drop_policy': self.drop_policy,
+            }
+
+
+def create_writer(connect):
+    """Писатель журнала по настройкам окружения"""
+    policy = os.environ.get('AUDIT_DROP_POLICY', 'drop_newest')
+    if policy not in DROP_POLICIES:
+        print(f"⚠️  Неизвестная AUDIT_DROP_POLICY={policy}, используем drop_newest")
+        policy = 'drop_newest'
+    writer = AuditLogWriter(
+        connect,
+        max_queue=int(os.environ.get('AUDIT_QUEUE_SIZE', 10000)),
+        batch_size=int(os.environ.get('AUDIT_BATCH_SIZE', 500)),
+        flush_interval=float(os.environ.get('AUDIT_FLUSH_INTERVAL', 1.0)),
+        drop_policy=policy,
+        block_timeout=float(os.environ.get('AUDIT_BLOCK_TIMEOUT', 0.05)),
+    )
+    atexit.register(writer.stop)
+    return writer
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""Нагрузочный тест API заметок: задержки p50/p95/p99 и RPS по операциям в JSON.
+
+Запускает приложение в этом же процессе (threaded-сервер werkzeug) против
+DATABASE_URL — локального Postgres или SQLite, — дозаполняет таблицу до
+--notes заметок и гоняет смешанную нагрузку с фиксированным числом
+потоков-клиентов:
+    list   — GET /notes (первая страница, иногда с фильтром по статусу)
+    create — POST /notes
+    move   — PATCH /notes/<id>/status
+    delete — DELETE /notes/<id> (заметки, созданные этим же прогоном)
+    search — GET /notes/search
+С --url нагрузка идёт на уже запущенный сервер (например, gunicorn), а
+база не трогается: так сервер и клиент не делят один GIL.
+
+Примеры:
+    DATABASE_URL=postgresql://localhost/notes_bench python benchmark.py --notes 100000
+    python benchmark.py --notes 1000 --concurrency 16 --duration 30 --output bench.json
+    python benchmark.py --url http://localhost:8000 --mix list=80,create=20
+
+Сравнивать между собой имеет смысл прогоны с одинаковыми --notes, --mix,
+--concurrency и --seed на одной машине.
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+DEFAULT_MIX = 'list=50,create=15,move=15,delete=5,search=15'
+OPERATIONS = ('list', 'create', 'move', 'delete', 'search')
+STATUSES = ('todo', 'doing', 'complete')
+WORDS = ('канбан', 'отчёт', 'релиз', 'база', 'индекс', 'созвон', 'дизайн', 'тесты',
+         'кэш', 'миграция', 'журнал', 'поиск', 'оплата', 'клиент', 'сервер', 'очередь')
+SEED_CHUNK = 10000
+
+
+def parse_mix(value):
+    """'list=50,create=10' -> {'list': 50, 'create': 10}"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"unknown operation {name!r}, expected one of: {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise ValueError('mix has no operations with positive weight')
+    return mix
+
+
+def percentile(sorted_values, fraction):
+    """Перцентиль по ближайшему рангу из отсортированного списка"""
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    """Сводка по одной операции: число, ошибки, RPS и задержки в мс"""
+    values = sorted(latencies)
+    ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'rps': round(len(values) / elapsed, 2) if elapsed else None,
+        'mean_ms': ms(sum(values) / len(values)) if values else None,
+        'p50_ms': ms(percentile(values, 0.50)),
+        'p95_ms': ms(percentile(values, 0.95)),
+        'p99_ms': ms(percentile(values, 0.99)),
+        'max_ms': ms(values[-1]) if values else None,
+    }
+
+
+def random_text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+# ---------- Данные ----------
+
+def seed_notes(target, rng):
+    """Дозаполняем notes до target заметок пачками по SEED_CHUNK; возвращает их число"""
+    from app import BUMP_REVISION_SQL, get_db_connection, invalidate_cache
+    from psycopg2.extras import execute_values
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute('SELECT COUNT(*) FROM notes')
+    existing = cur.fetchone()[0]
+    missing = max(0, target - existing)
+    started = time.perf_counter()
+    base = datetime.now() - timedelta(days=365)
+    for offset in range(0, missing, SEED_CHUNK):
+        rows = [
+            (random_text(rng, 3), random_text(rng, 20), rng.choice(STATUSES),
+             base + timedelta(seconds=offset + n))
+            for n in range(min(SEED_CHUNK, missing - offset))
+        ]
+        query = 'INSERT INTO notes (title, content, status, created_at) VALUES '
+        if conn.dialect == 'postgres':
+            execute_values(cur, query + '%s', rows, page_size=len(rows))
+        else:
+            cur.executemany(query + '(%s, %s, %s, %s)', rows)
+        conn.commit()
+        print(f"   ... {offset + len(rows)} / {missing}", file=sys.stderr)
+    if missing:
+        cur.execute(BUMP_REVISION_SQL, (datetime.utcnow(),))
+        if conn.dialect == 'postgres':
+            cur.execute('ANALYZE notes')
+        conn.commit()
+        invalidate_cache(summary=True)
+    cur.close()
+    conn.close()
+    print(f"✅ Заметок в базе: {existing + missing} (добавлено {missing} "
+          f"за {time.perf_counter() - started:.1f} с)", file=sys.stderr)
+    return existing + missing
+
+
+def sample_note_ids(base_url, limit=500):
+    """Id существующих заметок для move — берём первую страницу списка"""
+    response = requests.get(f'{base_url}/notes', params={'limit': limit}, timeout=30)
+    response.raise_for_status()
+    return [note['id'] for note in response.json()['notes']]
+
+
+# ---------- Сервер ----------
+
+def start_server():
+    """Приложение на случайном порту в фоновом потоке; возвращает (url, server)"""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from app import app
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        # HTTP/1.1: клиенты переиспользуют соединение, как за прокси в проде
+        protocol_version = 'HTTP/1.1'
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, name='benchmark-server', daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server
+
+
+# ---------- Нагрузка ----------
+
+class Workload:
+    """Общее состояние клиентов: заметки для move/delete и измерения"""
+
+    def __init__(self, base_url, mix, note_ids, seed):
+        self.base_url = base_url
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.note_ids = note_ids
+        self.created = []
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.latencies = {name: [] for name in OPERATIONS}
+        self.errors = {name: 0 for name in OPERATIONS}
+
+    def request(self, session, rng, operation):
+        url = self.base_url
+        if operation == 'list':
+            params = {'limit': 100}
+            if rng.random() < 0.3:
+                params['status'] = rng.choice(STATUSES)
+            return session.get(f'{url}/notes', params=params, timeout=30)
+        if operation == 'create':
+            response = session.post(f'{url}/notes', timeout=30, json={
+                'title': random_text(rng, 3), 'content': random_text(rng, 20),
+                'status': rng.choice(STATUSES)})
+            if response.status_code == 201:
+                with self.lock:
+                    self.created.append(response.json()['id'])
+            return response
+        if operation == 'move':
+            with self.lock:
+                # Свои заметки параллельно удаляет delete — двигаем засеянные
+                pool = self.note_ids or self.created
+                note_id = rng.choice(pool) if pool else None
+            if note_id is None:
+                return None
+            return session.patch(f'{url}/notes/{note_id}/status', timeout=30,
+                                 json={'status': rng.choice(STATUSES)})
+        if operation == 'delete':
+            # Удаляем только свои заметки: размер таблицы между прогонами не плывёт
+            with self.lock:
+                note_id = self.created.pop(rng.randrange(len(self.created))) if self.created else None
+            if note_id is None:
+                return None
+            return session.delete(f'{url}/notes/{note_id}', timeout=30)
+        return session.get(f'{url}/notes/search', timeout=30,
+                           params={'q': ' '.join(rng.sample(WORDS, rng.choice((1, 2))))})
+
+    def client(self, index, deadline, record_after, max_requests):
+        rng = random.Random(self.seed * 1000 + index)
+        session = requests.Session()
+        sent = 0
+        while time.monotonic() < deadline and (max_requests is None or sent < max_requests):
+            operation = rng.choices(self.names, self.weights)[0]
+            started = time.perf_counter()
+            try:
+                response = self.request(session, rng, operation)
+                if response is None:
+                    continue  # нечего удалять или двигать — операция не считается
+                failed = response.status_code >= 400
+            except requests.RequestException:
+                failed = True
+            elapsed = time.perf_counter() - started
+            sent += 1
+            if time.monotonic() < record_after:
+                continue  # прогрев
+            with self.lock:
+                if failed:
+                    self.errors[operation] += 1
+                else:
+                    self.latencies[operation].append(elapsed)
+        session.close()
+
+    def cleanup(self):
+        """Удаляем заметки, оставшиеся от create"""
+        session = requests.Session()
+        for note_id in self.created:
+            session.delete(f'{self.base_url}/notes/{note_id}', timeout=30)
+        session.close()
+
+
+def run_benchmark(notes=1000, concurrency=8, duration=10.0, warmup=2.0, mix=DEFAULT_MIX,
+                  seed=42, url=None, requests_per_client=None):
+    """Прогон целиком; возвращает отчёт-словарь"""
+    mix = parse_mix(mix) if isinstance(mix, str) else mix
+    rng = random.Random(seed)
+    server = None
+    dialect = None
+    if url is None:
+        from app import init_db
+        from db import get_pool
+        dialect = get_pool().dialect
+        init_db()  # свежая база: импорт app таблицы не создаёт
+        seed_notes(notes, rng)
+        url, server = start_server()
+    try:
+        workload = Workload(url, mix, sample_note_ids(url), seed)
+        started = time.monotonic()
+        record_after = started + warmup
+        deadline = record_after + duration
+        threads = [
+            threading.Thread(target=workload.client, name=f'benchmark-client-{n}',
+                             args=(n, deadline, record_after, requests_per_client))
+            for n in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = max(time.monotonic() - record_after, 1e-9)
+        workload.cleanup()
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    all_latencies = [value for name in OPERATIONS for value in workload.latencies[name]]
+    return {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'target': url if server is None else 'in-process',
+        'dialect': dialect,
+        'notes': notes,
+        'concurrency': concurrency,
+        'duration_s': round(elapsed, 3),
+        'warmup_s': warmup,
+        'mix': mix,
+        'seed': seed,
+        'python': platform.python_version(),
+        'cache': os.environ.get('NOTES_CACHE', 'memory'),
+        'endpoints': {
+            name: summarize(workload.latencies[name], workload.errors[name], elapsed)
+            for name in OPERATIONS if name in mix
+        },
+        'total': summarize(all_latencies, sum(workload.errors.values()), elapsed),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Нагрузочный тест API заметок')
+    parser.add_argument('--notes', type=int, default=1000, help='сколько заметок должно быть в базе (1000)')
+    parser.add_argument('--concurrency', type=int, default=8, help='число параллельных клиентов (8)')
+    parser.add_argument('--duration', type=float, default=10.0, help='длительность замера, секунды (10)')
+    parser.add_argument('--warmup', type=float, default=2.0, help='прогрев без замера, секунды (2)')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'веса операций ({DEFAULT_MIX})')
+    parser.add_argument('--seed', type=int, default=42, help='seed генератора запросов и данных')
+    parser.add_argument('--url', help='адрес запущенного сервера вместо приложения в процессе')
+    parser.add_argument('--output', help='куда записать JSON-отчёт (по умолчанию stdout)')
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(f"🚀 Нагрузка: {args.concurrency} клиентов, {args.duration} с, {mix}", file=sys.stderr)
+    # print() приложения и сида — в stderr, чтобы в stdout был только отчёт
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run_benchmark(notes=args.notes, concurrency=args.concurrency, duration=args.duration,
+                               warmup=args.warmup, mix=mix, seed=args.seed, url=args.url)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        print(f"✅ Отчёт записан в {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    return 0 if report['total']['errors'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,343 @@
+"""Кэш ответов API заметок.
+
+Бэкенды с одинаковым интерфейсом (get / set / delete / counter / incr / clear / stats):
+    LRUCache   — в памяти процесса, LRU + время жизни записей (по умолчанию);
+    RedisCache — общий для всех воркеров, поверх клиента redis-py.
+
+NoteCache хранит готовый JSON (заметки, страницы списка, сводку) вместе с
+ETag, в котором записана ревизия доски. Ключи версионируются счётчиками
+поколений: запись увеличивает поколение заметки или списков, и старые ключи
+больше не читаются. Поэтому ответ, прочитанный из базы до записи, но
+положенный в кэш после неё, не будет отдан клиенту.
+
+Поколения в памяти (memory) сбрасывает только воркер, через который прошла
+запись. Другие воркеры узнают о ней по ревизии: перед отдачей из кэша app.py
+сверяет ETag записи с текущей ревизией в board_state и при расхождении идёт
+в базу. Попадание в кэш поэтому стоит одного запроса по первичному ключу,
+зато не отдаёт устаревший ответ. Общий кэш на несколько воркеров — redis.
+
+Переменные окружения:
+    NOTES_CACHE       — memory (по умолчанию), redis или off
+    NOTES_CACHE_TTL   — время жизни записи, секунды (5)
+    NOTES_CACHE_SIZE  — максимум записей в памяти процесса (2048)
+    NOTES_CACHE_MAX_BYTES — максимум байт строковых значений в памяти (64 МБ)
+    REDIS_URL         — адрес Redis для NOTES_CACHE=redis
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+
+class LRUCache:
+    """Потокобезопасный LRU-словарь, записи которого устаревают через ttl секунд"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries=2048, ttl=5.0, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._sets = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._misses += 1
+                return default
+            value, expires_at = item
+            if expires_at is not None and time.monotonic() >= expires_at:
+                self._remove(key)
+                self._expirations += 1
+                self._misses += 1
+                return default
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    @staticmethod
+    def _size(value):
+        return len(value) if isinstance(value, (str, bytes)) else 0
+
+    def _remove(self, key):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self._bytes -= self._size(item[0])
+        return item
+
+    def _store(self, key, value, ttl):
+        ttl = self.ttl if ttl is None else ttl
+        self._remove(key)
+        self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+        self._bytes += self._size(value)
+        # Вытесняем давно не читанные записи
+        while self._data and (
+            (self.max_entries is not None and len(self._data) > self.max_entries)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            self._remove(next(iter(self._data)))
+            self._evictions += 1
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._store(key, value, ttl)
+            self._sets += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                if self._remove(key) is not None:
+                    self._invalidations += 1
+
+    def counter(self, key):
+        """Значение счётчика incr (0, если его нет); в статистику не попадает"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or (item[1] is not None and time.monotonic() >= item[1]):
+                return 0
+            self._data.move_to_end(key)
+            return item[0]
+
+    def incr(self, key, ttl=None):
+        """Увеличиваем счётчик (поколение ключей) и продлеваем ему жизнь"""
+        with self._lock:
+            item = self._data.get(key)
+            expired = item is None or (item[1] is not None and time.monotonic() >= item[1])
+            value = 1 if expired else item[0] + 1
+            self._store(key, value, ttl)
+            self._invalidations += 1
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'backend': self.name,
+                'entries': len(self._data),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': round(self._hits / lookups, 4) if lookups else None,
+                'sets': self._sets,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations,
+            }
+
+
+class TTLCache(LRUCache):
+    """Кэш только со временем жизни, без ограничения размера"""
+
+    def __init__(self, ttl=5.0):
+        super().__init__(max_entries=None, ttl=ttl)
+
+
+class RedisCache:
+    """Общий кэш всех воркеров в Redis; client — redis.Redis или совместимый объект
+
+    Вытеснением занимается сам Redis (maxmemory-policy allkeys-lru),
+    его счётчик evicted_keys виден в INFO stats.
+    """
+
+    name = 'redis'
+
+    def __init__(self, client, prefix='notes-cache:', ttl=5.0):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._sets = 0
+        self._invalidations = 0
+        self._errors = 0
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def get(self, key, default=None):
+        try:
+            value = self.client.get(self.prefix + key)
+        except Exception as e:
+            # Кэш недоступен — работаем напрямую с базой
+            print(f"❌ Ошибка чтения из кэша Redis: {e}")
+            self._count('_errors')
+            return default
+        if value is None:
+            self._count('_misses')
+            return default
+        self._count('_hits')
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            self.client.set(self.prefix + key, value, px=int(ttl * 1000) if ttl else None)
+            self._count('_sets')
+        except Exception as e:
+            print(f"❌ Ошибка записи в кэш Redis: {e}")
+            self._count('_errors')
+
+    def delete(self, *keys):
+        if not keys:
+            return
+        try:
+            self.client.delete(*[self.prefix + key for key in keys])
+            self._count('_invalidations', len(keys))
+        except Exception as e:
+            print(f"❌ Ошибка удаления из кэша Redis: {e}")
+            self._count('_errors')
+
+    def counter(self, key):
+        try:
+            return int(self.client.get(self.prefix + key) or 0)
+        except Exception as e:
+            print(f"❌ Ошибка чтения из кэша Redis: {e}")
+            self._count('_errors')
+            return None
+
+    def incr(self, key, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            value = self.client.incr(self.prefix + key)
+            if ttl:
+                self.client.pexpire(self.prefix + key, int(ttl * 1000))
+        except Exception as e:
+            # Запись в базу уже зафиксирована — не роняем запрос, старые данные проживут не дольше ttl
+            print(f"❌ Ошибка сброса кэша Redis: {e}")
+            self._count('_errors')
+            return None
+        self._count('_invalidations')
+        return int(value)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'backend': self.name,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': round(self._hits / lookups, 4) if lookups else None,
+                'sets': self._sets,
+                'invalidations': self._invalidations,
+                'errors': self._errors,
+            }
+
+
+class NoteCache:
+    """Готовые JSON-ответы заметок с точной инвалидацией при записи
+
+    Ключи:
+        note:<id>:<поколение заметки>   — тело GET /notes/<id>
+        list:<поколение списков>:<вариант> — страница GET /notes (вариант — путь и параметры)
+        summary                          — тело GET /notes/summary
+    Значения — pack_response(etag, last_modified, тело).
+    Любая запись меняет состав или порядок страниц, поэтому сбрасывает все
+    страницы разом; заметку — только её собственная запись.
+    """
+
+    def __init__(self, backend, enabled=True):
+        self.backend = backend
+        self.enabled = enabled
+
+    def _generation(self, key):
+        return self.backend.counter(key)
+
+    def _bump(self, key):
+        # Поколение живёт не меньше самих записей, иначе после его сброса в 0
+        # снова стали бы видны старые ключи
+        self.backend.incr(key, self.backend.ttl * 2 if self.backend.ttl else None)
+
+    # ---------- Чтение ----------
+
+    def note_key(self, note_id):
+        """Ключ заметки; вычисляется ДО чтения из базы. None — кэш недоступен"""
+        generation = self._generation(f'note-gen:{note_id}')
+        return None if generation is None else f'note:{note_id}:{generation}'
+
+    def list_key(self, variant):
+        generation = self._generation('list-gen')
+        return None if generation is None else f'list:{generation}:{variant}'
+
+    def get(self, key):
+        if not self.enabled or key is None:
+            return None
+        return self.backend.get(key)
+
+    def set(self, key, value, ttl=None):
+        if self.enabled and key is not None:
+            self.backend.set(key, value, ttl)
+
+    def delete(self, key):
+        if self.enabled and key is not None:
+            self.backend.delete(key)
+
+    # ---------- Инвалидация ----------
+
+    def invalidate_notes(self, note_ids=(), summary=False):
+        """После commit: заметки note_ids изменились, страницы списка устарели"""
+        if not self.enabled:
+            return
+        for note_id in note_ids:
+            self._bump(f'note-gen:{note_id}')
+        self._bump('list-gen')
+        if summary:
+            self.backend.delete('summary')
+
+    def stats(self):
+        stats = self.backend.stats()
+        stats['enabled'] = self.enabled
+        return stats
+
+
+def pack_response(etag, last_modified, body):
+    """Тело ответа с валидаторами одной строкой (бэкенды хранят строки)"""
+    return f"{etag}\n{last_modified.isoformat() if last_modified else ''}\n{body}"
+
+
+def unpack_response(value):
+    etag, last_modified, body = value.split('\n', 2)
+    return etag, datetime.fromisoformat(last_modified) if last_modified else None, body
+
+
+def create_note_cache():
+    """Кэш ответов по настройкам окружения"""
+    kind = os.environ.get('NOTES_CACHE', 'memory')
+    ttl = float(os.environ.get('NOTES_CACHE_TTL', 5))
+    if kind == 'redis':
+        try:
+            import redis
+            client = redis.Redis.from_url(os.environ.get('REDIS_URL', 'redis://localhost:6379/0'))
+            return NoteCache(RedisCache(client, ttl=ttl))
+        except ImportError:
+            print("⚠️  NOTES_CACHE=redis, но пакет redis не установлен — используем кэш в памяти")
+    elif kind not in ('memory', 'off'):
+        print(f"⚠️  Неизвестный NOTES_CACHE={kind}, используем кэш в памяти")
+    backend = LRUCache(max_entries=int(os.environ.get('NOTES_CACHE_SIZE', 2048)), ttl=ttl,
+                       max_bytes=int(os.environ.get('NOTES_CACHE_MAX_BYTES', 64 * 1024 * 1024)))
+    return NoteCache(backend, enabled=kind != 'off')
@@ -0,0 +1,510 @@
+"""Пул соединений с базой данных.
+
+Каждый воркер gunicorn держит свой пул (размер задаётся переменными
+окружения), все маршруты и log_action берут соединения из него.
+Вызов close() у выданного соединения возвращает его в пул, поэтому
+код маршрутов остаётся прежним.
+
+Переменные окружения:
+    DB_POOL_MIN       — сколько соединений открыть заранее (по умолчанию 1)
+    DB_POOL_MAX       — максимум соединений на процесс (по умолчанию 5;
+                        gunicorn.conf.py ставит threads + 2)
+    DB_POOL_TIMEOUT   — сколько секунд ждать свободное соединение (10)
+    DB_POOL_RECYCLE   — максимальный возраст соединения в секундах (1800)
+    DB_POOL_PING_AFTER — проверять SELECT 1, если соединение простаивало
+                         дольше стольких секунд (30)
+    DB_CONNECT_TIMEOUT — таймаут установки соединения с Postgres (5)
+"""
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+from collections import deque
+from datetime import datetime
+
+import psycopg2
+import psycopg2.extensions
+
+SQLITE_PATH = 'notes.db'
+
+# Схема postgres:// (Heroku, Render) разбирается как URL с netloc; регистрируем один раз
+if 'postgres' not in urllib.parse.uses_netloc:
+    urllib.parse.uses_netloc.append('postgres')
+
+
+class PoolTimeout(Exception):
+    """Не дождались свободного соединения из пула"""
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def to_datetime(value):
+    """SQLite хранит даты строками — приводим их к datetime, как psycopg2
+
+    Нужна и для агрегатов вроде MAX(created_at): у них нет объявленного
+    типа, и конвертер колонки к ним не применяется.
+    """
+    if value is None or isinstance(value, datetime):
+        return value
+    text = value.decode('utf-8') if isinstance(value, bytes) else str(value)
+    try:
+        return datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except ValueError:
+        return text
+
+
+def _convert_timestamp(value):
+    return to_datetime(value)
+
+
+# init_db объявляет даты как TIMESTAMP, миграции (sa.DateTime) — как DATETIME
+sqlite3.register_converter('TIMESTAMP', _convert_timestamp)
+sqlite3.register_converter('DATETIME', _convert_timestamp)
+# Единый формат дат в SQLite, чтобы строки сортировались хронологически
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+
+
+class SQLiteCursor:
+    """Курсор SQLite с плейсхолдерами в стиле psycopg2 (%s вместо ?)"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    @staticmethod
+    def _translate(query):
+        return query.replace('%s', '?').replace('%%', '%')
+
+    def execute(self, query, params=()):
+        return self._cursor.execute(self._translate(query), params or ())
+
+    def executemany(self, query, seq_of_params):
+        return self._cursor.executemany(self._translate(query), seq_of_params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+# ---------- Фабрики соединений ----------
+
+def postgres_params(database_url=None):
+    """Параметры psycopg2.connect: из DATABASE_URL или локальный Postgres разработчика"""
+    if database_url:
+        url = urllib.parse.urlparse(database_url)
+        return dict(
+            database=url.path[1:],
+            user=url.username,
+            password=url.password,
+            host=url.hostname,
+            port=url.port,
+            connect_timeout=_env_int('DB_CONNECT_TIMEOUT', 5)
+        )
+    return dict(
+        host='localhost',
+        database='notes_app',
+        user='postgres',
+        password='',  # замените на ваш пароль
+        port=5433,
+        connect_timeout=_env_int('DB_CONNECT_TIMEOUT', 5)
+    )
+
+
+def _connect_postgres_url(database_url):
+    return psycopg2.connect(**postgres_params(database_url))
+
+
+def _connect_postgres_local():
+    return psycopg2.connect(**postgres_params())
+
+
+def _sqlite_factory(path):
+    memory = path in ('', ':memory:')
+    target = 'file:notes_memdb?mode=memory&cache=shared' if memory else path
+    keeper = []
+
+    def connect():
+        conn = sqlite3.connect(
+            target,
+            uri=memory,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        if memory and not keeper:
+            # База в памяти живёт, пока открыто хотя бы одно соединение
+            keeper.append(sqlite3.connect(target, uri=True, check_same_thread=False))
+        return conn
+
+    return connect
+
+
+def resolve_backend():
+    """Выбираем базу данных: (dialect, фабрика соединений)"""
+    database_url = os.environ.get('DATABASE_URL')
+
+    # Для тестов и локального запуска без Postgres
+    if database_url and database_url.startswith('sqlite'):
+        path = database_url.split(':///', 1)[1] if ':///' in database_url else ''
+        return 'sqlite', _sqlite_factory(path)
+
+    # Для Render и продакшена
+    if database_url:
+        return 'postgres', lambda: _connect_postgres_url(database_url)
+
+    # Для локальной разработки
+    try:
+        _connect_postgres_local().close()
+        return 'postgres', _connect_postgres_local
+    except Exception as e:
+        print(f"Ошибка подключения к локальной БД: {e}")
+        # Fallback: SQLite база
+        return 'sqlite', _sqlite_factory(SQLITE_PATH)
+
+
+def database_dialect():
+    """Диалект базы; если он ясен из DATABASE_URL — без подключения
+
+    Без DATABASE_URL выбор между локальным Postgres и SQLite требует пробного
+    подключения, поэтому тогда создаётся пул (resolve_backend).
+    """
+    database_url = os.environ.get('DATABASE_URL')
+    if database_url:
+        return 'sqlite' if database_url.startswith('sqlite') else 'postgres'
+    return get_pool().dialect
+
+
+def sqlalchemy_url(dialect):
+    """URL той же базы для SQLAlchemy/Alembic"""
+    database_url = os.environ.get('DATABASE_URL')
+    if dialect == 'postgres':
+        if database_url:
+            # SQLAlchemy не принимает устаревшую схему postgres://
+            if database_url.startswith('postgres://'):
+                database_url = 'postgresql://' + database_url[len('postgres://'):]
+            return database_url
+        return 'postgresql://postgres:@localhost:5433/notes_app'
+    if database_url and database_url.startswith('sqlite'):
+        return database_url
+    return 'sqlite:///' + os.path.abspath(SQLITE_PATH)
+
+
+# ---------- Пул ----------
+
+class _PoolEntry:
+    __slots__ = ('raw', 'created_at', 'last_used')
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class PooledConnection:
+    """Соединение, взятое из пула; close() возвращает его обратно"""
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+        self.dialect = pool.dialect
+
+    @property
+    def raw(self):
+        if self._entry is None:
+            raise psycopg2.InterfaceError('connection already returned to pool')
+        return self._entry.raw
+
+    def cursor(self, *args, **kwargs):
+        cur = self.raw.cursor(*args, **kwargs)
+        if self.dialect == 'sqlite':
+            return SQLiteCursor(cur)
+        return cur
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        if self._entry is not None:
+            entry, self._entry = self._entry, None
+            self._pool.release(entry)
+
+    @property
+    def closed(self):
+        return self._entry is None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._entry is not None:
+            if exc_type is None:
+                self.commit()
+            else:
+                self.rollback()
+        self.close()
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.raw, name)
+
+    def __del__(self):
+        # Забытое соединение не должно навсегда занимать слот пула
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Потокобезопасный пул с проверкой и переоткрытием соединений"""
+
+    def __init__(self, factory, dialect='postgres', minconn=1, maxconn=5,
+                 timeout=10.0, recycle=1800.0, ping_after=30.0):
+        if maxconn < 1:
+            raise ValueError('maxconn must be >= 1')
+        self.factory = factory
+        self.dialect = dialect
+        self.minconn = min(max(minconn, 0), maxconn)
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+
+        # Статистика
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recent_checkouts = deque()
+
+        for _ in range(self.minconn):
+            try:
+                self._idle.append(self._open())
+                self._size += 1
+            except Exception as e:
+                print(f"❌ Не удалось заранее открыть соединение: {e}")
+                break
+
+    def _open(self):
+        return _PoolEntry(self.factory())
+
+    def _close_entry(self, entry):
+        try:
+            entry.raw.close()
+        except Exception:
+            pass
+
+    def _is_broken(self, entry):
+        raw = entry.raw
+        if self.dialect == 'postgres':
+            if raw.closed:
+                return True
+            status = raw.get_transaction_status()
+            if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                return True
+            if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                # Незавершённая транзакция не должна попасть к следующему запросу
+                try:
+                    raw.rollback()
+                except Exception:
+                    return True
+            return False
+        try:
+            raw.rollback()
+        except Exception:
+            return True
+        return False
+
+    def _is_alive(self, entry):
+        try:
+            cur = entry.raw.cursor()
+            cur.execute('SELECT 1')
+            cur.fetchone()
+            cur.close()
+            if self.dialect == 'postgres':
+                entry.raw.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _is_expired(self, entry, now):
+        return self.recycle and now - entry.created_at > self.recycle
+
+    def _discard(self, entry):
+        self._close_entry(entry)
+        with self._cond:
+            self._size -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    def acquire(self, timeout=None):
+        """Берём соединение из пула, при необходимости ждём освобождения"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            entry = None
+            create = False
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolTimeout('pool is closed')
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+                    if self._size < self.maxconn:
+                        self._size += 1
+                        create = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            f'no free connection after {timeout:.1f}s '
+                            f'(pool size {self.maxconn})'
+                        )
+                    self._cond.wait(remaining)
+
+            if create:
+                try:
+                    entry = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            else:
+                now = time.monotonic()
+                if self._is_expired(entry, now):
+                    self._discard(entry)
+                    continue
+                if self.ping_after is not None and now - entry.last_used > self.ping_after:
+                    if not self._is_alive(entry):
+                        self._discard(entry)
+                        continue
+
+            waited = time.monotonic() - started
+            with self._cond:
+                self._in_use += 1
+                self._checkouts += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+                now = time.monotonic()
+                self._recent_checkouts.append(now)
+                while now - self._recent_checkouts[0] > 60:
+                    self._recent_checkouts.popleft()
+            return PooledConnection(self, entry)
+
+    def release(self, entry):
+        """Возвращаем соединение; сломанные и старые закрываем"""
+        with self._cond:
+            self._in_use -= 1
+
+        if self._closed or self._is_broken(entry) or self._is_expired(entry, time.monotonic()):
+            self._discard(entry)
+            return
+
+        entry.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    def close(self):
+        """Закрываем все простаивающие соединения"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for entry in idle:
+            self._close_entry(entry)
+
+    def stats(self):
+        """Текущее состояние пула"""
+        with self._cond:
+            now = time.monotonic()
+            while self._recent_checkouts and now - self._recent_checkouts[0] > 60:
+                self._recent_checkouts.popleft()
+            return {
+                'dialect': self.dialect,
+                'size': self._size,
+                'max_size': self.maxconn,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'checkouts': self._checkouts,
+                'checkouts_per_sec': round(len(self._recent_checkouts) / 60.0, 3),
+                'wait_time_total': round(self._wait_total, 6),
+                'wait_time_avg': round(self._wait_total / self._checkouts, 6) if self._checkouts else 0.0,
+                'wait_time_max': round(self._wait_max, 6),
+                'timeouts': self._timeouts,
+                'discarded': self._discarded,
+            }
+
+
+# ---------- Пул процесса ----------
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def create_pool():
+    """Создаём пул по настройкам окружения"""
+    dialect, factory = resolve_backend()
+    return ConnectionPool(
+        factory,
+        dialect=dialect,
+        minconn=_env_int('DB_POOL_MIN', 1),
+        maxconn=_env_int('DB_POOL_MAX', 5),
+        timeout=_env_float('DB_POOL_TIMEOUT', 10),
+        recycle=_env_float('DB_POOL_RECYCLE', 1800),
+        ping_after=_env_float('DB_POOL_PING_AFTER', 30),
+    )
+
+
+def get_pool():
+    """Пул текущего процесса (после fork у воркера будет свой)"""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = create_pool()
+                _pool_pid = pid
+    return _pool
+
+
+def reset_pool():
+    """Закрываем пул; следующий get_pool() создаст новый"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.close()
+        _pool = None
+        _pool_pid = None
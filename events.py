@@ -0,0 +1,274 @@
+"""События об изменениях заметок для живого обновления доски (SSE).
+
+Событие — словарь {"type": "create" | "update" | "move" | "delete",
+"id": ..., "note": {...}}; у delete поля note нет.
+
+Postgres: триггер notes_notify (миграция 0005) отправляет pg_notify в канал
+notes_events при каждом изменении notes. NOTIFY доставляется после COMMIT
+всем воркерам всех машин. В каждом процессе один поток держит отдельное
+соединение с LISTEN и раздаёт события подписчикам этого процесса. Поток
+запускается при первом подписчике.
+Если триггера нет (SQLite, база без миграций, Postgres недоступен),
+обработчики сами публикуют события после commit. Тогда их видят только
+клиенты того же процесса.
+
+Переменные окружения:
+    EVENTS_QUEUE_SIZE — очередь одного подписчика (по умолчанию 1000); если
+                        клиент не успевает читать, он получает resync
+    EVENTS_MAX_SUBSCRIBERS — сколько клиентов SSE держит один процесс
+                        (0 — без ограничения); лишним /notes/stream отвечает 503
+"""
+import json
+import os
+import queue
+import re
+import select
+import threading
+from datetime import datetime
+
+import fastjson
+
+CHANNEL = 'notes_events'
+# Запасное событие: «что-то пропущено, перечитайте доску целиком»
+RESYNC = {'type': 'resync'}
+
+
+class Subscription:
+    """Очередь событий одного клиента"""
+
+    def __init__(self, max_queue):
+        self._queue = queue.Queue(max_queue)
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout=None):
+        """Следующее событие или None, если за timeout ничего не пришло"""
+        if self.overflowed:
+            self.overflowed = False
+            with self._queue.mutex:
+                self._queue.queue.clear()
+            return RESYNC
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class TooManySubscribers(Exception):
+    """Все места для подписчиков процесса заняты"""
+
+
+class Broadcaster:
+    """Раздача событий всем подписчикам процесса"""
+
+    def __init__(self, max_queue=1000, max_subscribers=0):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._published = 0
+        self._rejected = 0
+
+    def subscribe(self):
+        subscription = Subscription(self.max_queue)
+        with self._lock:
+            if self.max_subscribers and len(self._subscribers) >= self.max_subscribers:
+                self._rejected += 1
+                raise TooManySubscribers(f'{self.max_subscribers} subscribers already connected')
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._published += 1
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'max_subscribers': self.max_subscribers,
+                'rejected': self._rejected,
+                'published': self._published,
+                'max_queue': self.max_queue,
+            }
+
+
+_FRACTION = re.compile(r'\.(\d{1,6})')
+
+
+def notify_timestamp(value):
+    """Дата из JSON триггера -> isoformat, как в ответах API
+
+    json в Postgres обрезает нули в микросекундах (.34159, .3), а
+    datetime.fromisoformat до Python 3.11 принимает только 3 или 6 цифр
+    дроби — дополняем её до 6.
+    """
+    value = _FRACTION.sub(lambda match: '.' + match.group(1).ljust(6, '0'), value, count=1)
+    return datetime.fromisoformat(value).isoformat()
+
+
+class PostgresListener:
+    """Фоновый поток LISTEN notes_events -> Broadcaster
+
+    connect — фабрика «сырых» соединений psycopg2 (не из пула: соединение
+    занято всё время жизни потока). fetch_note(cur, id) дочитывает заметку,
+    если триггер отправил урезанное событие (payload NOTIFY ограничен 8000 байт).
+    """
+
+    def __init__(self, connect, broadcaster, fetch_note, channel=CHANNEL,
+                 reconnect_delay=2.0, poll_interval=1.0):
+        self.connect = connect
+        self.broadcaster = broadcaster
+        self.fetch_note = fetch_note
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.poll_interval = poll_interval
+        # True, когда канал слушается и триггер в базе есть
+        self.active = False
+        # Первая попытка подключения завершена (active уже известен)
+        self.ready = threading.Event()
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+        self._received = 0
+        self._reconnects = 0
+
+    def start(self):
+        with self._lock:
+            # После fork поток родителя в воркере не существует — запускаем свой
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self.active = False
+            self.ready.clear()
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='notes-events-listener', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=2.0):
+        with self._lock:
+            thread = self._thread
+            if thread is None or self._pid != os.getpid():
+                return
+            self._stopping.set()
+        thread.join(timeout)
+        with self._lock:
+            self._thread = None
+            self.active = False
+
+    def _run(self):
+        first = True
+        while not self._stopping.is_set():
+            conn = None
+            try:
+                conn = self.connect()
+                conn.autocommit = True
+                cur = conn.cursor()
+                cur.execute(f'LISTEN {self.channel}')
+                cur.execute("SELECT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'notes_notify')")
+                self.active = cur.fetchone()[0]
+                self.ready.set()
+                if not self.active:
+                    # Миграция 0005 не применена — события публикуют обработчики
+                    return
+                if not first:
+                    # Пока соединения не было, события могли потеряться
+                    self.broadcaster.publish(RESYNC)
+                first = False
+                self._listen(conn, cur)
+            except Exception as e:
+                self.active = False
+                self.ready.set()
+                self._reconnects += 1
+                print(f"❌ Ошибка подписки на {self.channel}: {e}")
+                self._stopping.wait(self.reconnect_delay)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def _listen(self, conn, cur):
+        while not self._stopping.is_set():
+            if select.select([conn], [], [], self.poll_interval) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                event = json.loads(notify.payload)
+                if event.pop('truncated', False):
+                    event['note'] = self.fetch_note(cur, event['id'])
+                    if event['note'] is None:
+                        continue  # заметку уже удалили, delete придёт следом
+                elif event.get('note'):
+                    for field in ('created_at', 'updated_at'):
+                        if event['note'].get(field):
+                            event['note'][field] = notify_timestamp(event['note'][field])
+                self._received += 1
+                self.broadcaster.publish(event)
+
+    def stats(self):
+        return {
+            'active': self.active,
+            'received': self._received,
+            'reconnects': self._reconnects,
+        }
+
+
+class NoteEvents:
+    """Точка входа для приложения: publish после commit и subscribe для SSE"""
+
+    def __init__(self, dialect, connect, fetch_note, max_queue=1000, max_subscribers=0):
+        self.broadcaster = Broadcaster(max_queue, max_subscribers)
+        self.listener = None
+        if dialect == 'postgres':
+            self.listener = PostgresListener(connect, self.broadcaster, fetch_note)
+
+    def subscribe(self, timeout=2.0):
+        if self.listener is not None:
+            self.listener.start()
+            # Пока не ясно, слушаем ли канал, запись доставлялась бы дважды:
+            # и от обработчика, и через NOTIFY
+            self.listener.ready.wait(timeout)
+        return self.broadcaster.subscribe()
+
+    def unsubscribe(self, subscription):
+        self.broadcaster.unsubscribe(subscription)
+
+    def publish(self, event):
+        """Событие от обработчика; при работающем LISTEN его доставит триггер"""
+        if self.listener is not None and self.listener.active:
+            return
+        self.broadcaster.publish(event)
+
+    def stats(self):
+        stats = self.broadcaster.stats()
+        stats['listener'] = self.listener.stats() if self.listener else None
+        return stats
+
+
+def format_sse(event, name='note'):
+    """Кадр text/event-stream"""
+    return f'event: {name}\ndata: {fastjson.dumps(event)}\n\n'
+
+
+def create_events(dialect, connect, fetch_note):
+    """События заметок по настройкам окружения"""
+    return NoteEvents(dialect, connect, fetch_note,
+                      max_queue=int(os.environ.get('EVENTS_QUEUE_SIZE', 1000)),
+                      max_subscribers=int(os.environ.get('EVENTS_MAX_SUBSCRIBERS', 0)))
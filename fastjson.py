@@ -0,0 +1,71 @@
+"""Быстрая сериализация JSON: orjson, если он установлен, иначе стандартный json.
+
+orjson сам кодирует datetime (ISO 8601 — то же, что datetime.isoformat())
+и работает в C, поэтому заметки сериализуются прямо из строк курсора
+(models.note_row) без .isoformat() на каждую колонку. Без orjson тот же
+текст даёт json с default=isoformat — медленнее, но формат ответов один.
+
+FastJSONProvider подключается как app.json: через него идут jsonify,
+request.get_json и ответы asgi.py. dumps() — для журнала, SSE и выгрузки.
+
+Переменные окружения:
+    JSON_BACKEND — orjson (по умолчанию, если пакет установлен) | json
+"""
+import json
+import os
+from datetime import date, datetime, time
+
+from flask.json.provider import DefaultJSONProvider, _default as flask_default
+
+try:
+    import orjson
+except ImportError:  # необязательная зависимость — работаем на json
+    orjson = None
+
+
+def default_backend():
+    if os.environ.get('JSON_BACKEND', 'orjson') == 'orjson' and orjson is not None:
+        return 'orjson'
+    return 'json'
+
+
+BACKEND = default_backend()
+
+
+def _default(value):
+    """Типы, которых нет в JSON: даты — ISO 8601, остальное — как во Flask"""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return flask_default(value)
+
+
+def dumps(obj, backend=None):
+    """Компактный JSON-текст без экранирования не-ASCII"""
+    if (backend or BACKEND) == 'orjson':
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':'))
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON-провайдер Flask на orjson; необычные аргументы dumps уходят в json"""
+
+    default = staticmethod(_default)
+    backend = BACKEND
+
+    def dumps(self, obj, **kwargs):
+        # jsonify передаёт separators (компактный вывод) или indent=2 (debug)
+        if (self.backend == 'orjson' and set(kwargs) <= {'separators', 'indent'}
+                and kwargs.get('indent') in (None, 2)):
+            option = orjson.OPT_NON_STR_KEYS
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            if kwargs.get('indent'):
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=_default, option=option).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.backend == 'orjson' and not kwargs:
+            # orjson.JSONDecodeError — подкласс ValueError, Flask ответит 400
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
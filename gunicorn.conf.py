@@ -0,0 +1,40 @@
+# Настройки gunicorn (подхватываются автоматически из текущей папки)
+import os
+
+# /notes/stream держит соединение открытым: с sync-воркерами один клиент SSE
+# занимал бы целый процесс, поэтому запросы обслуживают потоки
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+
+# Каждый открытый /notes/stream (SSE) держит поток gthread всё время, пока
+# открыта вкладка. Чтобы вкладки не заняли все потоки и обычным запросам было
+# где выполняться, клиентов SSE на воркер не больше половины потоков, лишние
+# получают 503 с Retry-After и переподключаются позже. Больше живых клиентов —
+# больше воркеров или GUNICORN_THREADS (asgi.py поток SSE не обслуживает).
+os.environ.setdefault('EVENTS_MAX_SUBSCRIBERS', str(max(1, threads // 2)))
+
+# Пул соединений воркера (db.py) делят все потоки запросов и два фоновых
+# потока: запись журнала (audit.py) и обслуживание logs (log_maintenance.py).
+# Слушатель LISTEN/NOTIFY держит отдельное соединение вне пула. Если пул
+# меньше threads + 2, потоки ждут DB_POOL_TIMEOUT и отвечают ошибкой.
+# Соединений к базе всего: workers × DB_POOL_MAX (+1 на слушателя).
+os.environ.setdefault('DB_POOL_MAX', str(threads + 2))
+if int(os.environ['DB_POOL_MAX']) < threads + 2:
+    print(f"⚠️ DB_POOL_MAX={os.environ['DB_POOL_MAX']} меньше threads + 2 ({threads + 2}): "
+          f"потоки будут ждать свободное соединение")
+
+
+def post_worker_init(worker):
+    """Фоновое обслуживание журнала; из воркеров проход выполняет один"""
+    from app import log_maintenance
+    log_maintenance.start()
+
+
+def worker_exit(server, worker):
+    """Дописываем очередь журнала в базу и файловый лог перед остановкой воркера"""
+    from app import app_logging, audit_writer, log_maintenance, note_events
+    log_maintenance.stop()
+    audit_writer.stop()
+    app_logging.stop()
+    if note_events.listener is not None:
+        note_events.listener.stop()
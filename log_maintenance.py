@@ -0,0 +1,353 @@
+"""Обслуживание журнала действий: помесячные разделы, срок хранения, почасовая сводка.
+
+Postgres после миграции 0008: таблица logs секционирована по месяцам
+(RANGE по timestamp), разделы называются logs_YYYY_MM. Фоновая задача
+заранее создаёт разделы на LOGS_PARTITIONS_AHEAD месяцев вперёд и удаляет
+разделы старше LOGS_RETENTION_MONTHS целиком — DROP TABLE вместо DELETE,
+поэтому VACUUM после чистки не нужен. Раздел logs_default принимает строки,
+для которых раздела нет; устаревшие строки из него удаляются DELETE. Если
+проход пропустил начало месяца (не было воркеров) и строки месяца уже лежат
+в logs_default, раздел создаётся при отключённом logs_default и строки
+переносятся в него. Каждый раздел создаётся в своей точке сохранения:
+ошибка одного не отменяет срок хранения.
+SQLite и несекционированная logs: устаревшие строки удаляются DELETE.
+
+Сводка log_stats — число событий по часу × action × device × browser.
+Каждый проход пересчитывает часы начиная с последнего уже записанного минус
+ROLLUP_LOOKBACK: очередь журнала может дописать строки прошлого часа позже. Аналитика читает сводку, а не сам журнал.
+Из нескольких воркеров проход выполняет один (advisory lock в Postgres).
+
+Переменные окружения:
+    LOGS_MAINTENANCE          — off отключает фоновую задачу
+    LOGS_MAINTENANCE_INTERVAL — пауза между проходами, секунды (300)
+    LOGS_RETENTION_MONTHS     — сколько месяцев хранить журнал (6)
+    LOGS_PARTITIONS_AHEAD     — на сколько месяцев вперёд создавать разделы (3)
+"""
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+
+from db import to_datetime
+
+# Ключ pg_advisory_lock: один проход обслуживания на всю базу
+ADVISORY_LOCK_KEY = 0x6c6f6773
+# DDL над logs ждёт блокировку не дольше этого, иначе встанет в очередь перед вставками журнала
+LOCK_TIMEOUT = '2s'
+# Сколько часов до последнего записанного пересчитывать заново (опоздавшие строки)
+ROLLUP_LOOKBACK = timedelta(hours=2)
+
+HOUR_SQL = {
+    'postgres': "date_trunc('hour', timestamp)",
+    # %% — запросы пишутся в стиле psycopg2, SQLiteCursor превращает их в %
+    'sqlite': "strftime('%%Y-%%m-%%d %%H:00:00', timestamp)",
+}
+
+
+def create_log_stats_table(cur):
+    """DDL почасовой сводки журнала"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS log_stats (
+            hour TIMESTAMP NOT NULL,
+            action VARCHAR(100) NOT NULL,
+            device VARCHAR(50) NOT NULL,
+            browser VARCHAR(50) NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (hour, action, device, browser)
+        )
+    ''')
+
+
+def month_start(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value, months):
+    index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def partition_name(month):
+    return f'logs_{month:%Y_%m}'
+
+
+def is_partitioned(cur):
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('logs')")
+    row = cur.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def _bound(expr, keyword):
+    match = re.search(rf"{keyword} \('([^']+)'\)", expr)
+    return datetime.fromisoformat(match.group(1)) if match else None
+
+
+def list_partitions(cur):
+    """[(имя, нижняя граница, верхняя граница)]; None — MINVALUE или раздел по умолчанию"""
+    cur.execute('''
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits AS i
+        JOIN pg_class AS c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'logs'::regclass
+        ORDER BY c.relname
+    ''')
+    partitions = []
+    for name, expr in cur.fetchall():
+        if expr == 'DEFAULT':
+            continue
+        partitions.append((name, _bound(expr, 'FROM'), _bound(expr, 'TO')))
+    return partitions
+
+
+def ensure_partitions(cur, now, ahead):
+    """Разделы с текущего месяца на ahead месяцев вперёд; возвращает созданные"""
+    partitions = list_partitions(cur)
+    created = []
+    for offset in range(ahead + 1):
+        start = add_months(month_start(now), offset)
+        end = add_months(start, 1)
+        # Месяц может уже покрывать другой раздел, например logs_legacy из миграции
+        if any((lower is None or lower < end) and (upper is None or upper > start)
+               for _, lower, upper in partitions):
+            continue
+        name = partition_name(start)
+        cur.execute('SAVEPOINT log_partition')
+        try:
+            create_partition(cur, name, start, end)
+        except Exception as e:
+            cur.execute('ROLLBACK TO SAVEPOINT log_partition')
+            print(f"⚠️  Не удалось создать раздел {name}: {e}")
+            continue
+        cur.execute('RELEASE SAVEPOINT log_partition')
+        partitions.append((name, start, end))
+        created.append(name)
+    return created
+
+
+def create_partition(cur, name, start, end):
+    """Раздел месяца; строки месяца, уже попавшие в logs_default, переносятся в него
+
+    Пока в logs_default есть строки диапазона, CREATE ... PARTITION OF не проходит
+    проверку раздела по умолчанию — поэтому на время переноса он отключается.
+    """
+    cur.execute("SELECT to_regclass('logs_default') IS NOT NULL")
+    moving = False
+    if cur.fetchone()[0]:
+        cur.execute('SELECT EXISTS (SELECT 1 FROM logs_default WHERE timestamp >= %s AND timestamp < %s)',
+                    (start, end))
+        moving = cur.fetchone()[0]
+    if moving:
+        cur.execute('ALTER TABLE logs DETACH PARTITION logs_default')
+    cur.execute(f'CREATE TABLE {name} PARTITION OF logs FOR VALUES FROM (%s) TO (%s)', (start, end))
+    if moving:
+        cur.execute('''
+            WITH moved AS (
+                DELETE FROM logs_default WHERE timestamp >= %s AND timestamp < %s RETURNING *
+            )
+            INSERT INTO logs SELECT * FROM moved
+        ''', (start, end))
+        cur.execute('ALTER TABLE logs ATTACH PARTITION logs_default DEFAULT')
+
+
+def drop_expired_partitions(cur, cutoff):
+    """Удаляем разделы, все строки которых старше cutoff"""
+    dropped = []
+    for name, _, upper in list_partitions(cur):
+        if upper is not None and upper <= cutoff:
+            cur.execute(f'DROP TABLE {name}')
+            dropped.append(name)
+    return dropped
+
+
+def delete_expired_rows(cur, cutoff):
+    cur.execute('DELETE FROM logs WHERE timestamp < %s', (cutoff,))
+    return cur.rowcount
+
+
+def rollup_log_stats(cur, dialect, now):
+    """Пересчитываем сводку с последнего записанного часа минус ROLLUP_LOOKBACK по текущий
+
+    Возвращает число строк.
+    """
+    cur.execute('SELECT MAX(hour) FROM log_stats')
+    start = to_datetime(cur.fetchone()[0])
+    if start is not None:
+        start -= ROLLUP_LOOKBACK
+    else:
+        cur.execute('SELECT MIN(timestamp) FROM logs')
+        start = to_datetime(cur.fetchone()[0])
+        if start is None:
+            return 0
+    start = start.replace(minute=0, second=0, microsecond=0)
+    end = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    cur.execute(f'''
+        INSERT INTO log_stats (hour, action, device, browser, count)
+        SELECT {HOUR_SQL[dialect]}, COALESCE(action, ''), COALESCE(device, ''),
+               COALESCE(browser, ''), COUNT(*)
+        FROM logs
+        WHERE timestamp >= %s AND timestamp < %s
+        GROUP BY 1, 2, 3, 4
+        ON CONFLICT (hour, action, device, browser) DO UPDATE SET count = excluded.count
+    ''', (start, end))
+    return cur.rowcount
+
+
+STATS_GROUPS = ('action', 'device', 'browser', 'hour')
+
+
+def read_log_stats(cur, group='action', since=None, until=None):
+    """Суммы из сводки по одной из колонок STATS_GROUPS"""
+    if group not in STATS_GROUPS:
+        raise ValueError(f"group must be one of: {', '.join(STATS_GROUPS)}")
+    conditions = []
+    params = []
+    if since:
+        conditions.append('hour >= %s')
+        params.append(since)
+    if until:
+        conditions.append('hour < %s')
+        params.append(until)
+    query = f'SELECT {group}, SUM(count) FROM log_stats'
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += f" GROUP BY {group} ORDER BY {'1' if group == 'hour' else '2 DESC, 1'}"
+    cur.execute(query, params)
+    return cur.fetchall()
+
+
+class LogMaintenance:
+    """Фоновый поток: разделы, срок хранения и сводка журнала раз в interval секунд"""
+
+    def __init__(self, connect, retention_months=6, months_ahead=3, interval=300.0, enabled=True):
+        self.connect = connect
+        self.enabled = enabled
+        self.retention_months = retention_months
+        self.months_ahead = months_ahead
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+        self._runs = 0
+        self._last_run = None
+        self._last_error = None
+        self._created = 0
+        self._dropped = 0
+        self._deleted = 0
+
+    def run_once(self, now=None):
+        """Один проход обслуживания; возвращает, что сделано"""
+        now = now or datetime.now()
+        cutoff = add_months(month_start(now), -self.retention_months)
+        result = {'created': [], 'dropped': [], 'deleted': 0, 'rolled_up': 0, 'skipped': False}
+        conn = self.connect()
+        cur = conn.cursor()
+        postgres = conn.dialect == 'postgres'
+        locked = False
+        try:
+            if postgres:
+                cur.execute('SELECT pg_try_advisory_lock(%s)', (ADVISORY_LOCK_KEY,))
+                locked = cur.fetchone()[0]
+                conn.commit()
+                if not locked:
+                    # Проход уже выполняет другой воркер
+                    result['skipped'] = True
+                    return result
+
+            # DDL фиксируем сразу: блокировка logs не должна ждать пересчёта сводки
+            if postgres and is_partitioned(cur):
+                cur.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+                result['created'] = ensure_partitions(cur, now, self.months_ahead)
+                result['dropped'] = drop_expired_partitions(cur, cutoff)
+                # Строки вне разделов (например, с неверными часами) чистим по одной
+                cur.execute('DELETE FROM logs_default WHERE timestamp < %s', (cutoff,))
+                result['deleted'] = cur.rowcount
+            else:
+                result['deleted'] = delete_expired_rows(cur, cutoff)
+            conn.commit()
+
+            result['rolled_up'] = rollup_log_stats(cur, conn.dialect, now)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            if locked:
+                try:
+                    cur.execute('SELECT pg_advisory_unlock(%s)', (ADVISORY_LOCK_KEY,))
+                    conn.commit()
+                except Exception as e:
+                    # Соединение сломано — блокировка снимется вместе с сессией
+                    print(f"⚠️  Не удалось снять блокировку обслуживания журнала: {e}")
+            cur.close()
+            conn.close()
+
+        with self._lock:
+            self._runs += 1
+            self._last_run = now
+            self._created += len(result['created'])
+            self._dropped += len(result['dropped'])
+            self._deleted += result['deleted']
+        return result
+
+    def start(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            # После fork поток родителя в воркере не существует — запускаем свой
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='logs-maintenance', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        with self._lock:
+            thread = self._thread
+            if thread is None or self._pid != os.getpid():
+                return
+            self._stopping.set()
+        thread.join(timeout)
+        with self._lock:
+            self._thread = None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                result = self.run_once()
+                if result['created'] or result['dropped']:
+                    print(f"✅ Разделы журнала: созданы {result['created']}, удалены {result['dropped']}")
+                self._last_error = None
+            except Exception as e:
+                self._last_error = str(e)
+                print(f"❌ Ошибка обслуживания журнала: {e}")
+            self._stopping.wait(self.interval)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'running': self._thread is not None and self._pid == os.getpid(),
+                'interval': self.interval,
+                'retention_months': self.retention_months,
+                'months_ahead': self.months_ahead,
+                'runs': self._runs,
+                'last_run': self._last_run.isoformat() if self._last_run else None,
+                'last_error': self._last_error,
+                'partitions_created': self._created,
+                'partitions_dropped': self._dropped,
+                'rows_deleted': self._deleted,
+            }
+
+
+def create_maintenance(connect):
+    """Обслуживание журнала по настройкам окружения"""
+    return LogMaintenance(
+        connect,
+        retention_months=int(os.environ.get('LOGS_RETENTION_MONTHS', 6)),
+        months_ahead=int(os.environ.get('LOGS_PARTITIONS_AHEAD', 3)),
+        interval=float(os.environ.get('LOGS_MAINTENANCE_INTERVAL', 300)),
+        enabled=os.environ.get('LOGS_MAINTENANCE') != 'off',
+    )
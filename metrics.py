@@ -0,0 +1,275 @@
+"""Метрики в текстовом формате Prometheus (GET /metrics).
+
+Свой небольшой реестр вместо prometheus_client: счётчики и гистограммы
+с метками плюс сборщики, которые при каждом опросе читают stats() пула,
+очереди журнала и кэша. Метрики считаются в каждом воркере отдельно:
+при нескольких воркерах gunicorn опрашивайте каждый процесс (метка
+pid в process_start_time_seconds поможет их различить).
+
+Что считается:
+    http_requests_total, http_request_duration_seconds — по endpoint, method, status;
+    http_request_db_queries, http_request_db_seconds — запросы к базе за один HTTP-запрос;
+    db_queries_total, db_query_errors_total — все запросы к базе, включая фоновые потоки.
+Запросы к базе считает обёртка над курсором (instrument_connection).
+"""
+import os
+import threading
+import time
+
+from flask import g, has_request_context, request
+
+import profiling
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+BACKGROUND = '(background)'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def count(self, *labels):
+        with self._lock:
+            state = self._values.get(labels)
+            return state[2] if state else 0
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    le = (('le', _format_value(bound)),)
+                    lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}')
+                label_text = _format_labels(self.labelnames, labels)
+                lines.append(f'{self.name}_sum{label_text} {_format_value(total)}')
+                lines.append(f'{self.name}_count{label_text} {count}')
+        return lines
+
+
+class Registry:
+    """Метрики процесса и сборщики значений, которые читаются при опросе"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, func):
+        """func() -> [(имя, тип, описание, [(метки-словарь, значение), ...]), ...]"""
+        self._collectors.append(func)
+        return func
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for func in self._collectors:
+            try:
+                families = func()
+            except Exception as e:
+                print(f"❌ Ошибка сбора метрик {func.__name__}: {e}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    label_text = _format_labels(labels.keys(), labels.values())
+                    lines.append(f'{name}{label_text} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    'http_requests_total', 'HTTP requests by endpoint, method and status.',
+    ('endpoint', 'method', 'status'))
+http_latency = registry.histogram(
+    'http_request_duration_seconds', 'Time to build the response (without streaming the body).',
+    ('endpoint', 'method', 'status'))
+request_db_queries = registry.histogram(
+    'http_request_db_queries', 'Database queries made while handling one request.',
+    ('endpoint',), buckets=QUERY_COUNT_BUCKETS)
+request_db_seconds = registry.histogram(
+    'http_request_db_seconds', 'Time spent in database queries while handling one request.',
+    ('endpoint',))
+db_queries = registry.counter(
+    'db_queries_total', 'Database queries (execute / executemany calls).', ('endpoint',))
+db_query_errors = registry.counter(
+    'db_query_errors_total', 'Database queries that raised an error.', ('endpoint',))
+app_errors = registry.counter(
+    'app_errors_total', 'Errors reported through log_action.', ('endpoint',))
+
+_started_at = time.time()
+
+
+@registry.collector
+def process_metrics():
+    return [('process_start_time_seconds', 'gauge', 'Start time of the worker process.',
+             [({'pid': os.getpid()}, _started_at)])]
+
+
+def current_endpoint():
+    if has_request_context():
+        return request.endpoint or 'unmatched'
+    return BACKGROUND
+
+
+def _record_query(started, duration, failed, query):
+    profiling.record('execute', started, duration, query)
+    endpoint = current_endpoint()
+    db_queries.inc(endpoint)
+    if failed:
+        db_query_errors.inc(endpoint)
+    if has_request_context():
+        g.db_queries = g.get('db_queries', 0) + 1
+        g.db_seconds = g.get('db_seconds', 0.0) + duration
+
+
+class TimedCursor:
+    """Курсор, который считает свои execute / executemany"""
+
+    def __init__(self, cursor):
+        object.__setattr__(self, '_cursor', cursor)
+
+    def _timed(self, method, query, *args, **kwargs):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = method(query, *args, **kwargs)
+            failed = False
+            return result
+        finally:
+            _record_query(started, time.perf_counter() - started, failed, query)
+
+    def execute(self, query, *args, **kwargs):
+        return self._timed(self._cursor.execute, query, *args, **kwargs)
+
+    def executemany(self, query, *args, **kwargs):
+        return self._timed(self._cursor.executemany, query, *args, **kwargs)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        # itersize и другие настройки курсора должны попадать в настоящий курсор
+        setattr(self._cursor, name, value)
+
+
+class TimedConnection:
+    """Соединение из пула, курсоры которого считаются в метриках"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self._conn.cursor(*args, **kwargs))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._conn.__exit__(exc_type, exc, tb)
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self._conn, name)
+
+
+def instrument_connection(conn):
+    return TimedConnection(conn)
+
+
+def init_app(app):
+    """Хуки before/after_request: длительность и число запросов к базе"""
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+        g.db_queries = 0
+        g.db_seconds = 0.0
+
+    @app.after_request
+    def record_request(response):
+        started = g.get('metrics_started')
+        if started is not None:
+            endpoint = request.endpoint or 'unmatched'
+            status = str(response.status_code)
+            http_requests.inc(endpoint, request.method, status)
+            http_latency.observe(time.perf_counter() - started, endpoint, request.method, status)
+            request_db_queries.observe(g.get('db_queries', 0), endpoint)
+            request_db_seconds.observe(g.get('db_seconds', 0.0), endpoint)
+        return response
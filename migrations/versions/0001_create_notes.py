@@ -0,0 +1,34 @@
+"""create notes table
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # В существующих базах таблицу уже создал init_db()
+    if sa.inspect(op.get_bind()).has_table('notes'):
+        return
+    op.create_table(
+        'notes',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('content', sa.Text()),
+        sa.Column('status', sa.String(length=50), server_default='todo'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.current_timestamp()),
+    )
+
+
+def downgrade():
+    op.drop_table('notes')
@@ -0,0 +1,41 @@
+"""indexes for keyset pagination of notes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'ix_notes_created_at_id': ['created_at', 'id'],
+    'ix_notes_status_created_at_id': ['status', 'created_at', 'id'],
+}
+
+
+def upgrade():
+    # Курсор (created_at, id) не различает NULL — проставляем дату старым записям
+    op.execute('UPDATE notes SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL')
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # CONCURRENTLY не блокирует запись в таблицу, но работает только вне транзакции
+        with op.get_context().autocommit_block():
+            for name, columns in INDEXES.items():
+                op.create_index(name, 'notes', columns, if_not_exists=True,
+                                postgresql_concurrently=True)
+    else:
+        for name, columns in INDEXES.items():
+            op.create_index(name, 'notes', columns, if_not_exists=True)
+
+
+def downgrade():
+    for name in INDEXES:
+        op.drop_index(name, table_name='notes', if_exists=True)
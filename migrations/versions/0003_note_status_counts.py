@@ -0,0 +1,97 @@
+"""counter table with per-status note counts
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 09:20:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+POSTGRES_TRIGGER = '''
+CREATE OR REPLACE FUNCTION notes_status_counts_trg() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.status IS NOT DISTINCT FROM NEW.status THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE note_status_counts SET count = count - 1
+        WHERE status = COALESCE(OLD.status, '');
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO note_status_counts (status, count) VALUES (COALESCE(NEW.status, ''), 1)
+        ON CONFLICT (status) DO UPDATE SET count = note_status_counts.count + 1;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER notes_status_counts
+AFTER INSERT OR DELETE OR UPDATE OF status ON notes
+FOR EACH ROW EXECUTE FUNCTION notes_status_counts_trg();
+'''
+
+SQLITE_TRIGGERS = [
+    '''
+    CREATE TRIGGER notes_status_counts_insert AFTER INSERT ON notes
+    BEGIN
+        INSERT INTO note_status_counts (status, count) VALUES (COALESCE(NEW.status, ''), 1)
+        ON CONFLICT (status) DO UPDATE SET count = count + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER notes_status_counts_delete AFTER DELETE ON notes
+    BEGIN
+        UPDATE note_status_counts SET count = count - 1 WHERE status = COALESCE(OLD.status, '');
+    END
+    ''',
+    '''
+    CREATE TRIGGER notes_status_counts_update AFTER UPDATE OF status ON notes
+    WHEN OLD.status IS NOT NEW.status
+    BEGIN
+        UPDATE note_status_counts SET count = count - 1 WHERE status = COALESCE(OLD.status, '');
+        INSERT INTO note_status_counts (status, count) VALUES (COALESCE(NEW.status, ''), 1)
+        ON CONFLICT (status) DO UPDATE SET count = count + 1;
+    END
+    ''',
+]
+
+
+def upgrade():
+    postgres = op.get_bind().dialect.name == 'postgresql'
+    if postgres:
+        # Пока считаем исходные значения, записи в notes не должны проскочить мимо триггера
+        op.execute('LOCK TABLE notes IN SHARE ROW EXCLUSIVE MODE')
+
+    op.create_table(
+        'note_status_counts',
+        sa.Column('status', sa.String(length=50), primary_key=True),
+        sa.Column('count', sa.BigInteger(), nullable=False, server_default='0'),
+    )
+    op.execute(
+        "INSERT INTO note_status_counts (status, count) "
+        "SELECT COALESCE(status, ''), COUNT(*) FROM notes GROUP BY COALESCE(status, '')"
+    )
+
+    if postgres:
+        op.execute(POSTGRES_TRIGGER)
+    else:
+        for statement in SQLITE_TRIGGERS:
+            op.execute(statement)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP TRIGGER IF EXISTS notes_status_counts ON notes')
+        op.execute('DROP FUNCTION IF EXISTS notes_status_counts_trg()')
+    else:
+        for name in ('insert', 'delete', 'update'):
+            op.execute(f'DROP TRIGGER IF EXISTS notes_status_counts_{name}')
+    op.drop_table('note_status_counts')
@@ -0,0 +1,72 @@
+"""full-text search over note title and content
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 09:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+SQLITE_FTS = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+        title, content,
+        content='notes', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN
+        INSERT INTO notes_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+        INSERT INTO notes_fts (notes_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE OF title, content ON notes BEGIN
+        INSERT INTO notes_fts (notes_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO notes_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    ''',
+    "INSERT INTO notes_fts (notes_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # Конфигурация 'simple' без стемминга: в заметках смешаны русский и английский
+        op.execute('''
+            ALTER TABLE notes ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('simple', COALESCE(title, '')), 'A') ||
+                setweight(to_tsvector('simple', COALESCE(content, '')), 'B')
+            ) STORED
+        ''')
+        with op.get_context().autocommit_block():
+            op.create_index('ix_notes_search_vector', 'notes', ['search_vector'],
+                            postgresql_using='gin', postgresql_concurrently=True,
+                            if_not_exists=True)
+    else:
+        for statement in SQLITE_FTS:
+            op.execute(statement)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_notes_search_vector', table_name='notes', if_exists=True)
+        op.drop_column('notes', 'search_vector')
+    else:
+        for name in ('insert', 'delete', 'update'):
+            op.execute(f'DROP TRIGGER IF EXISTS notes_fts_{name}')
+        op.execute('DROP TABLE IF EXISTS notes_fts')
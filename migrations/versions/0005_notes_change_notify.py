@@ -0,0 +1,72 @@
+"""NOTIFY notes_events on every change of notes
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 09:40:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+# Payload NOTIFY ограничен 8000 байт: длинную заметку отправляем без полей,
+# слушатель дочитает её сам (флаг truncated)
+POSTGRES_TRIGGER = '''
+CREATE OR REPLACE FUNCTION notes_notify_trg() RETURNS trigger AS $$
+DECLARE
+    kind text;
+    row_id integer;
+    payload text;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        kind := 'create';
+    ELSIF TG_OP = 'DELETE' THEN
+        kind := 'delete';
+    ELSIF OLD.status IS DISTINCT FROM NEW.status THEN
+        kind := 'move';
+    ELSE
+        kind := 'update';
+    END IF;
+
+    IF TG_OP = 'DELETE' THEN
+        row_id := OLD.id;
+        payload := json_build_object('type', kind, 'id', row_id)::text;
+    ELSE
+        row_id := NEW.id;
+        payload := json_build_object(
+            'type', kind, 'id', row_id,
+            'note', json_build_object('id', NEW.id, 'title', NEW.title, 'content', NEW.content,
+                                      'status', NEW.status, 'created_at', NEW.created_at)
+        )::text;
+        IF octet_length(payload) > 7900 THEN
+            payload := json_build_object('type', kind, 'id', row_id, 'truncated', true)::text;
+        END IF;
+    END IF;
+
+    PERFORM pg_notify('notes_events', payload);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER notes_notify
+AFTER INSERT OR DELETE OR UPDATE OF title, content, status ON notes
+FOR EACH ROW EXECUTE FUNCTION notes_notify_trg();
+'''
+
+
+def upgrade():
+    # В SQLite нет LISTEN/NOTIFY — там события публикует само приложение
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(POSTGRES_TRIGGER)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP TRIGGER IF EXISTS notes_notify ON notes')
+        op.execute('DROP FUNCTION IF EXISTS notes_notify_trg()')
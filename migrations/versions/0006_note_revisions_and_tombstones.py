@@ -0,0 +1,100 @@
+"""per-note revision and updated_at, tombstones for deleted notes
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 09:50:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+# Событие NOTIFY со всеми колонками заметки, кроме служебной search_vector:
+# новые колонки (updated_at, revision) попадают в payload без правки триггера
+POSTGRES_NOTIFY = '''
+CREATE OR REPLACE FUNCTION notes_notify_trg() RETURNS trigger AS $$
+DECLARE
+    kind text;
+    row_id integer;
+    payload text;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        kind := 'create';
+    ELSIF TG_OP = 'DELETE' THEN
+        kind := 'delete';
+    ELSIF OLD.status IS DISTINCT FROM NEW.status THEN
+        kind := 'move';
+    ELSE
+        kind := 'update';
+    END IF;
+
+    IF TG_OP = 'DELETE' THEN
+        row_id := OLD.id;
+        payload := json_build_object('type', kind, 'id', row_id)::text;
+    ELSE
+        row_id := NEW.id;
+        payload := jsonb_build_object('type', kind, 'id', row_id,
+                                      'note', to_jsonb(NEW) - 'search_vector')::text;
+        IF octet_length(payload) > 7900 THEN
+            payload := json_build_object('type', kind, 'id', row_id, 'truncated', true)::text;
+        END IF;
+    END IF;
+
+    PERFORM pg_notify('notes_events', payload);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+'''
+
+
+def upgrade():
+    bind = op.get_bind()
+    postgres = bind.dialect.name == 'postgresql'
+    inspector = sa.inspect(bind)
+
+    # Существующим заметкам — текущая ревизия доски: клиент, загрузивший доску
+    # до миграции, не получит их повторно
+    current = 0
+    if inspector.has_table('board_state'):
+        current = bind.execute(sa.text('SELECT revision FROM board_state WHERE id = 1')).scalar() or 0
+
+    columns = {column['name'] for column in inspector.get_columns('notes')}
+    if 'updated_at' not in columns:
+        op.add_column('notes', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    if 'revision' not in columns:
+        # Константный DEFAULT в Postgres 11+ не переписывает таблицу
+        op.add_column('notes', sa.Column('revision', sa.BigInteger(), nullable=False,
+                                         server_default=str(int(current))))
+        if postgres:
+            op.alter_column('notes', 'revision', server_default='0')
+
+    if not inspector.has_table('note_tombstones'):
+        op.create_table(
+            'note_tombstones',
+            sa.Column('id', sa.Integer(), primary_key=True, autoincrement=False),
+            sa.Column('revision', sa.BigInteger(), nullable=False),
+            sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        )
+    op.create_index('ix_note_tombstones_revision', 'note_tombstones', ['revision'], if_not_exists=True)
+
+    if postgres:
+        op.execute(POSTGRES_NOTIFY)
+        with op.get_context().autocommit_block():
+            op.create_index('ix_notes_revision', 'notes', ['revision'], if_not_exists=True,
+                            postgresql_concurrently=True)
+    else:
+        op.create_index('ix_notes_revision', 'notes', ['revision'], if_not_exists=True)
+
+
+def downgrade():
+    # Функция notes_notify_trg из upgrade подходит и для старой схемы — её оставляем
+    op.drop_index('ix_notes_revision', table_name='notes', if_exists=True)
+    op.drop_table('note_tombstones')
+    op.drop_column('notes', 'revision')
+    op.drop_column('notes', 'updated_at')
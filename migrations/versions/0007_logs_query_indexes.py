@@ -0,0 +1,65 @@
+"""indexes for filtering and keyset pagination of the logs table
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+# /logs отдаёт записи по ключу (timestamp, id) по убыванию; фильтр по
+# равенству стоит первой колонкой, чтобы страница читалась из индекса
+INDEXES = {
+    'ix_logs_timestamp_id': ['timestamp', 'id'],
+    'ix_logs_action_timestamp_id': ['action', 'timestamp', 'id'],
+    'ix_logs_note_id_timestamp_id': ['note_id', 'timestamp', 'id'],
+    'ix_logs_ip_timestamp_id': ['ip', 'timestamp', 'id'],
+}
+
+
+def upgrade():
+    bind = op.get_bind()
+    postgres = bind.dialect.name == 'postgresql'
+
+    # Обычно таблицу уже создал init_db(); в чистой базе создаём её здесь
+    if not sa.inspect(bind).has_table('logs'):
+        op.create_table(
+            'logs',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('timestamp', sa.DateTime(), server_default=sa.func.current_timestamp()),
+            sa.Column('ip', sa.String(length=45)),
+            sa.Column('action', sa.String(length=100)),
+            sa.Column('note_id', sa.Integer()),
+            sa.Column('device', sa.String(length=50)),
+            sa.Column('browser', sa.String(length=50)),
+            sa.Column('details', sa.JSON().with_variant(postgresql.JSONB(), 'postgresql')),
+            sa.Column('endpoint', sa.String(length=100)),
+            sa.Column('method', sa.String(length=10)),
+        )
+
+    # Курсор (timestamp, id) не различает NULL — проставляем дату старым записям
+    op.execute('UPDATE logs SET timestamp = CURRENT_TIMESTAMP WHERE timestamp IS NULL')
+
+    if postgres:
+        # Журнал пишется постоянно — строим индексы без блокировки записи
+        with op.get_context().autocommit_block():
+            for name, columns in INDEXES.items():
+                op.create_index(name, 'logs', columns, if_not_exists=True,
+                                postgresql_concurrently=True)
+    else:
+        for name, columns in INDEXES.items():
+            op.create_index(name, 'logs', columns, if_not_exists=True)
+
+
+def downgrade():
+    for name in INDEXES:
+        op.drop_index(name, table_name='logs', if_exists=True)
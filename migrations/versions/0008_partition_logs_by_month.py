@@ -0,0 +1,139 @@
+"""monthly range partitions for logs, hourly log_stats rollup
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 10:10:00
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+# Индексы из 0007: на секционированной таблице они создаются у каждого раздела
+INDEXES = {
+    'ix_logs_timestamp_id': ['timestamp', 'id'],
+    'ix_logs_action_timestamp_id': ['action', 'timestamp', 'id'],
+    'ix_logs_note_id_timestamp_id': ['note_id', 'timestamp', 'id'],
+    'ix_logs_ip_timestamp_id': ['ip', 'timestamp', 'id'],
+}
+# Разделы вперёд; дальше их создаёт log_maintenance
+PARTITIONS_AHEAD = 3
+
+LOG_COLUMNS_DDL = '''
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ip VARCHAR(45),
+    action VARCHAR(100),
+    note_id INTEGER,
+    device VARCHAR(50),
+    browser VARCHAR(50),
+    details JSONB,
+    endpoint VARCHAR(100),
+    method VARCHAR(10)
+'''
+
+
+def month_start(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value, months):
+    index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def create_log_stats():
+    op.create_table(
+        'log_stats',
+        sa.Column('hour', sa.DateTime(), nullable=False),
+        sa.Column('action', sa.String(length=100), nullable=False),
+        sa.Column('device', sa.String(length=50), nullable=False),
+        sa.Column('browser', sa.String(length=50), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('hour', 'action', 'device', 'browser'),
+        if_not_exists=True,
+    )
+
+
+def upgrade():
+    bind = op.get_bind()
+    create_log_stats()
+    if bind.dialect.name != 'postgresql':
+        return
+    relkind = bind.execute(sa.text("SELECT relkind FROM pg_class WHERE oid = to_regclass('logs')")).scalar()
+    if relkind == 'p':
+        return
+
+    # Старая таблица становится разделом «всё до месяца после последней записи»:
+    # данные не копируются, а сам раздел удалится, когда истечёт срок хранения
+    op.execute('ALTER TABLE logs RENAME TO logs_legacy')
+    op.execute('ALTER TABLE logs_legacy RENAME CONSTRAINT logs_pkey TO logs_legacy_pkey')
+    for name in INDEXES:
+        op.execute(f'ALTER INDEX IF EXISTS {name} RENAME TO {name.replace("ix_logs_", "ix_logs_legacy_")}')
+
+    # Первичный ключ секционированной таблицы обязан включать ключ секционирования
+    op.execute(f'''
+        CREATE TABLE logs (
+            id INTEGER NOT NULL DEFAULT nextval('logs_id_seq'),
+            {LOG_COLUMNS_DDL},
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    ''')
+    # Иначе последовательность удалилась бы вместе с logs_legacy
+    op.execute('ALTER SEQUENCE logs_id_seq OWNED BY logs.id')
+
+    now = datetime.now()
+    latest = bind.execute(sa.text('SELECT MAX(timestamp) FROM logs_legacy')).scalar()
+    if latest is None:
+        # Журнал пуст — разделы начинаются с текущего месяца
+        first = month_start(now)
+        op.execute('DROP TABLE logs_legacy')
+    else:
+        first = add_months(month_start(max(latest, now)), 1)
+        op.execute('ALTER TABLE logs_legacy ALTER COLUMN timestamp SET NOT NULL')
+        op.execute('ALTER TABLE logs_legacy DROP CONSTRAINT logs_legacy_pkey')
+        op.execute('ALTER TABLE logs_legacy ADD CONSTRAINT logs_legacy_pkey PRIMARY KEY (id, timestamp)')
+        op.execute(f"ALTER TABLE logs ATTACH PARTITION logs_legacy FOR VALUES FROM (MINVALUE) TO ('{first.isoformat(' ')}')")
+
+    month = first
+    while month <= add_months(month_start(now), PARTITIONS_AHEAD):
+        end = add_months(month, 1)
+        op.execute(f"CREATE TABLE logs_{month:%Y_%m} PARTITION OF logs "
+                   f"FOR VALUES FROM ('{month.isoformat(' ')}') TO ('{end.isoformat(' ')}')")
+        month = end
+    op.execute('CREATE TABLE logs_default PARTITION OF logs DEFAULT')
+
+    # Подходящие индексы logs_legacy подключаются к новым, а не строятся заново
+    for name, columns in INDEXES.items():
+        op.create_index(name, 'logs', columns)
+
+
+def downgrade():
+    bind = op.get_bind()
+    op.drop_table('log_stats', if_exists=True)
+    if bind.dialect.name != 'postgresql':
+        return
+    relkind = bind.execute(sa.text("SELECT relkind FROM pg_class WHERE oid = to_regclass('logs')")).scalar()
+    if relkind != 'p':
+        return
+
+    op.execute(f'''
+        CREATE TABLE logs_plain (
+            id INTEGER NOT NULL DEFAULT nextval('logs_id_seq') PRIMARY KEY,
+            {LOG_COLUMNS_DDL.replace('TIMESTAMP NOT NULL', 'TIMESTAMP')}
+        )
+    ''')
+    op.execute('INSERT INTO logs_plain SELECT * FROM logs')
+    op.execute('ALTER SEQUENCE logs_id_seq OWNED BY logs_plain.id')
+    op.execute('DROP TABLE logs')
+    op.execute('ALTER TABLE logs_plain RENAME TO logs')
+    op.execute('ALTER TABLE logs RENAME CONSTRAINT logs_plain_pkey TO logs_pkey')
+    for name, columns in INDEXES.items():
+        op.create_index(name, 'logs', columns)
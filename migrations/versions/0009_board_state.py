@@ -0,0 +1,38 @@
+"""board_state table: schema no longer created on app import
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 10:20:00
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Раньше таблицу создавал init_db при импорте app.py — на существующих базах она уже есть
+    if not sa.inspect(op.get_bind()).has_table('board_state'):
+        op.create_table(
+            'board_state',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('revision', sa.BigInteger(), nullable=False, server_default='0'),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+        )
+    op.execute(
+        sa.text('INSERT INTO board_state (id, revision, updated_at) VALUES (1, 0, :now) '
+                'ON CONFLICT (id) DO NOTHING').bindparams(now=datetime.utcnow())
+    )
+
+
+def downgrade():
+    # Таблица могла появиться до миграции (init_db) — оставляем её
+    pass
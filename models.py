@@ -4,17 +4,51 @@ from datetime import datetime
 db = SQLAlchemy()
 
 class Note(db.Model):
+    """Таблица notes — как её создают миграции 0001 и 0006"""
+    __tablename__ = 'notes'
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
     content = db.Column(db.Text, default='')
+    status = db.Column(db.String(50), default='todo')  # <-- To Do, Doing, Complete
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    status = db.Column(db.String(20), default='todo')  # <-- To Do, Doing, Complete
+    updated_at = db.Column(db.DateTime)
+    # Ревизия доски, на которой заметка менялась последний раз
+    revision = db.Column(db.BigInteger, nullable=False, default=0)
 
     def to_dict(self):
-        return {
-            "id": self.id,
-            "title": self.title,
-            "content": self.content,
-            "created_at": self.created_at.isoformat(),
-            "status": self.status
-        }
+        note = {name: getattr(self, name) for name in NOTE_FIELDS}
+        for name in _DATETIME_FIELDS:
+            note[name] = note[name].isoformat() if note[name] else None
+        return note
+
+class BoardState(db.Model):
+    """Одна строка с версией доски (ETag, /notes/changes)"""
+    __tablename__ = 'board_state'
+
+    id = db.Column(db.Integer, primary_key=True)
+    revision = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime)
+
+class NoteTombstone(db.Model):
+    """След удалённой заметки для /notes/changes"""
+    __tablename__ = 'note_tombstones'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    revision = db.Column(db.BigInteger, nullable=False)
+    deleted_at = db.Column(db.DateTime)
+
+# Колонки заметки, которые видит клиент, в порядке SELECT/RETURNING
+NOTE_FIELDS = tuple(column.name for column in Note.__table__.columns)
+NOTE_INDEX = {name: index for index, name in enumerate(NOTE_FIELDS)}
+_DATETIME_FIELDS = tuple(column.name for column in Note.__table__.columns
+                         if isinstance(column.type, db.DateTime))
+
+def note_row(row):
+    """Строка notes -> словарь с датами как есть (datetime)
+
+    Для ответов API: app.json и fastjson кодируют datetime сами, в C, так что
+    .isoformat() на каждую колонку не нужен. Лишние колонки в конце строки
+    (например, старый статус) отбрасывает zip.
+    """
+    return dict(zip(NOTE_FIELDS, row))
@@ -0,0 +1,268 @@
+"""Профилирование отдельных запросов: где уходит время одного HTTP-запроса.
+
+Профилируется доля запросов (выборка) и запросы с заголовком
+X-Profile: <PROFILE_TOKEN>. Для них записываются интервалы
+get_db_connection, каждого cur.execute, jsonify и log_action, а ответ
+получает заголовок Server-Timing (виден во вкладке Network браузера).
+С PROFILE_CPROFILE=1 запрос дополнительно снимается cProfile.
+Если профилируемый запрос дольше PROFILE_SLOW_MS, его профиль сохраняется
+в PROFILE_DIR: <имя>.json с интервалами и <имя>.prof для pstats / snakeviz.
+Остальные запросы платят только за проверку flask.g.
+
+Переменные окружения:
+    PROFILE_SAMPLE_RATE — доля профилируемых запросов, 0..1 (0 — только по заголовку)
+    PROFILE_TOKEN       — значение заголовка X-Profile; без него заголовок не действует
+    PROFILE_CPROFILE    — 1: снимать cProfile (заметно дороже интервалов)
+    PROFILE_SLOW_MS     — порог сохранения профиля, мс (500)
+    PROFILE_DIR         — каталог профилей (logs/profiles)
+    PROFILE_KEEP        — сколько последних профилей хранить (100)
+"""
+import cProfile
+import functools
+import hmac
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import g, has_request_context, request
+
+HEADER = 'X-Profile'
+
+
+def current():
+    """Профиль текущего запроса или None"""
+    if has_request_context():
+        return g.get('profile')
+    return None
+
+
+def record(name, started, duration, detail=None):
+    """Интервал, уже измеренный вызывающим (perf_counter)"""
+    profile = current()
+    if profile is not None:
+        profile.add(name, started, duration, detail)
+
+
+@contextmanager
+def span(name, detail=None):
+    profile = current()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, started, time.perf_counter() - started, detail)
+
+
+def timed(name):
+    """Декоратор: вызов функции — интервал name"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def one_line(detail, limit=200):
+    """Подробность интервала (например, SQL) одной строкой"""
+    if detail is None:
+        return None
+    if isinstance(detail, bytes):
+        detail = detail.decode('utf-8', 'replace')
+    return re.sub(r'\s+', ' ', str(detail)).strip()[:limit]
+
+
+class RequestProfile:
+    """Интервалы одного запроса и, по желанию, cProfile"""
+
+    def __init__(self, use_cprofile=False):
+        self.started = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.profiler = cProfile.Profile() if use_cprofile else None
+
+    def start(self):
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def stop(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.duration = time.perf_counter() - self.started
+
+    def add(self, name, started, duration, detail=None):
+        # detail приводится к строке только при сохранении профиля
+        self.spans.append((name, started - self.started, duration, detail))
+
+    def summary(self):
+        """{имя: {count, total_ms}} в порядке первого появления"""
+        totals = {}
+        for name, _, duration, _ in self.spans:
+            item = totals.setdefault(name, {'count': 0, 'total_ms': 0.0})
+            item['count'] += 1
+            item['total_ms'] += duration * 1000
+        for item in totals.values():
+            item['total_ms'] = round(item['total_ms'], 3)
+        return totals
+
+    def server_timing(self):
+        parts = [f'{name};dur={item["total_ms"]};desc="{item["count"]}x"'
+                 for name, item in self.summary().items()]
+        parts.append(f'total;dur={round(self.duration * 1000, 3)}')
+        return ', '.join(parts)
+
+    def to_dict(self):
+        return {
+            'duration_ms': round(self.duration * 1000, 3),
+            'summary': self.summary(),
+            'spans': [
+                {'name': name, 'start_ms': round(offset * 1000, 3),
+                 'duration_ms': round(duration * 1000, 3), 'detail': one_line(detail)}
+                for name, offset, duration, detail in self.spans
+            ],
+        }
+
+
+class Profiler:
+    """Решает, какие запросы профилировать, и сохраняет медленные"""
+
+    def __init__(self, sample_rate=0.0, token=None, use_cprofile=False,
+                 slow_ms=500, directory='logs/profiles', keep=100):
+        self.sample_rate = sample_rate
+        self.token = token
+        self.use_cprofile = use_cprofile
+        self.slow_ms = slow_ms
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._profiled = 0
+        self._dumped = 0
+        self._last_dump = None
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0 or bool(self.token)
+
+    def should_profile(self, headers):
+        header = headers.get(HEADER)
+        if header and self.token and hmac.compare_digest(header, self.token):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def init_app(self, app):
+        """Хуки запроса и интервал jsonify"""
+        base = type(app.json)
+
+        class ProfiledJSONProvider(base):
+            def dumps(self, obj, **kwargs):
+                with span('jsonify'):
+                    return super().dumps(obj, **kwargs)
+
+        app.json = ProfiledJSONProvider(app)
+
+        @app.before_request
+        def start_profile():
+            if self.enabled and self.should_profile(request.headers):
+                g.profile = RequestProfile(self.use_cprofile)
+                g.profile.start()
+
+        @app.after_request
+        def finish_profile(response):
+            profile = g.pop('profile', None)
+            if profile is None:
+                return response
+            name = self.finish(profile, response.status_code)
+            response.headers['Server-Timing'] = profile.server_timing()
+            if name:
+                response.headers['X-Profile-Id'] = name
+            return response
+
+        @app.teardown_request
+        def abandon_profile(exc):
+            # Исключение в обработчике: after_request не выполнился, а cProfile
+            # остался бы включён в этом потоке и профилировал чужие запросы
+            profile = g.pop('profile', None)
+            if profile is not None:
+                self.finish(profile, 500)
+
+    def finish(self, profile, status):
+        """Останавливаем профиль; медленный сохраняем и возвращаем его имя"""
+        profile.stop()
+        with self._lock:
+            self._profiled += 1
+        if profile.duration * 1000 >= self.slow_ms:
+            return self.dump(profile, status)
+        return None
+
+    def dump(self, profile, status):
+        """Сохраняем профиль медленного запроса; возвращаем имя файлов"""
+        endpoint = request.endpoint or 'unmatched'
+        name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{endpoint}"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            data = {
+                'method': request.method,
+                'path': request.full_path.rstrip('?'),
+                'endpoint': endpoint,
+                'status': status,
+                **profile.to_dict(),
+            }
+            with open(os.path.join(self.directory, name + '.json'), 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            if profile.profiler is not None:
+                profile.profiler.dump_stats(os.path.join(self.directory, name + '.prof'))
+            print(f"⚠️  Медленный запрос {request.method} {request.path}: "
+                  f"{data['duration_ms']} мс, профиль {name}")
+            self._prune()
+        except Exception as e:
+            print(f"❌ Ошибка сохранения профиля: {e}")
+            return None
+        with self._lock:
+            self._dumped += 1
+            self._last_dump = name
+        return name
+
+    def _prune(self):
+        """Оставляем только keep последних профилей"""
+        names = sorted({os.path.splitext(entry)[0] for entry in os.listdir(self.directory)
+                        if entry.endswith(('.json', '.prof'))})
+        for old in names[:-self.keep] if self.keep else []:
+            for ext in ('.json', '.prof'):
+                try:
+                    os.remove(os.path.join(self.directory, old + ext))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'sample_rate': self.sample_rate,
+                'header': bool(self.token),
+                'cprofile': self.use_cprofile,
+                'slow_ms': self.slow_ms,
+                'profiled': self._profiled,
+                'dumped': self._dumped,
+                'last_dump': self._last_dump,
+            }
+
+
+def create_profiler():
+    """Профилировщик по настройкам окружения"""
+    return Profiler(
+        sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+        token=os.environ.get('PROFILE_TOKEN') or None,
+        use_cprofile=os.environ.get('PROFILE_CPROFILE') == '1',
+        slow_ms=float(os.environ.get('PROFILE_SLOW_MS', 500)),
+        directory=os.environ.get('PROFILE_DIR', 'logs/profiles'),
+        keep=int(os.environ.get('PROFILE_KEEP', 100)),
+    )
@@ -0,0 +1,172 @@
+"""Запросы к notes, собранные из моделей models.py и скомпилированные заранее.
+
+SQLAlchemy Core строит SELECT/INSERT/UPDATE/DELETE по таблицам моделей и
+компилирует их под диалект пула в строку с плейсхолдерами %s — тем же
+стилем, что у остального кода (SQLiteCursor переводит их в ?). Строка
+кэшируется по «форме» запроса: диалект, число статусов в фильтре, есть ли
+курсор, какие поля меняются. На каждый запрос остаётся только подставить
+параметры — ни компиляции, ни ORM-объектов.
+
+Выполняются запросы через пул db.py, поэтому метрики, профилирование и
+ограничения пула работают как раньше. :revision в запросах записи
+заменяет execute_write (app.py) — ревизией этой записи.
+"""
+from functools import lru_cache
+
+from sqlalchemy import bindparam, delete, insert, literal_column, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import NOTE_FIELDS, Note, NoteTombstone
+
+DIALECTS = {
+    'postgres': postgresql.psycopg2.dialect(paramstyle='format'),
+    'sqlite': sqlite.pysqlite.dialect(paramstyle='format'),
+}
+# Разных форм запросов немного; ограничение — на случай фильтра с сотней статусов
+CACHE_SIZE = 256
+
+notes = Note.__table__
+tombstones = NoteTombstone.__table__
+REVISION = literal_column(':revision')
+
+
+class CompiledQuery:
+    """Скомпилированный запрос: строка SQL и порядок именованных параметров"""
+
+    __slots__ = ('sql', 'names', 'defaults')
+
+    def __init__(self, statement, dialect):
+        compiled = statement.compile(dialect=DIALECTS[dialect])
+        self.sql = compiled.string
+        self.names = tuple(compiled.positiontup)
+        # Параметры, которые SQLAlchemy добавила сама (например, OFFSET 0 в SQLite)
+        self.defaults = {name: value for name, value in compiled.params.items() if value is not None}
+
+    def __call__(self, **values):
+        """(sql, параметры) для cur.execute"""
+        if self.defaults:
+            values = {**self.defaults, **values}
+        return self.sql, [values[name] for name in self.names]
+
+
+def note_columns(table=notes):
+    return [table.c[name] for name in NOTE_FIELDS]
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def notes_page(dialect, status_count=0, after=False, limit=False):
+    """Заметки в порядке (created_at, id) по убыванию — по нему построены индексы
+
+    Параметры: status_0..status_N, after_created_at, after_id, limit.
+    """
+    statement = select(*note_columns())
+    if status_count:
+        statement = statement.where(notes.c.status.in_(
+            [bindparam(f'status_{index}') for index in range(status_count)]))
+    if after:
+        statement = statement.where(tuple_(notes.c.created_at, notes.c.id)
+                                    < tuple_(bindparam('after_created_at'), bindparam('after_id')))
+    statement = statement.order_by(notes.c.created_at.desc(), notes.c.id.desc())
+    if limit:
+        statement = statement.limit(bindparam('limit'))
+    return CompiledQuery(statement, dialect)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def note_by_id(dialect):
+    return CompiledQuery(select(*note_columns()).where(notes.c.id == bindparam('id')), dialect)
+
+
+def _changed(columns, table, limit):
+    statement = (select(*columns)
+                 .where(table.c.revision > bindparam('since'), table.c.revision <= bindparam('until'))
+                 .order_by(table.c.revision, table.c.id))
+    if limit:
+        statement = statement.limit(bindparam('limit'))
+    return statement
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def notes_changed(dialect, limit=False):
+    """Заметки с ревизией в (since, until] — для /notes/changes"""
+    return CompiledQuery(_changed(note_columns(), notes, limit), dialect)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def tombstones_changed(dialect, limit=False):
+    """(id, revision) удалённых заметок с ревизией в (since, until]"""
+    return CompiledQuery(_changed([tombstones.c.id, tombstones.c.revision], tombstones, limit), dialect)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def insert_note(dialect):
+    fields = ('title', 'content', 'status', 'created_at', 'updated_at')
+    return CompiledQuery(
+        insert(notes)
+        .values(**{name: bindparam(name) for name in fields}, revision=REVISION)
+        .returning(*note_columns()),
+        dialect
+    )
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def update_note(dialect, fields):
+    """UPDATE полей fields (кортеж имён) по id; updated_at и revision — всегда"""
+    return CompiledQuery(
+        update(notes)
+        .where(notes.c.id == bindparam('note_id'))
+        .values(**{name: bindparam(name) for name in fields},
+                updated_at=bindparam('updated_at'), revision=REVISION)
+        .returning(*note_columns()),
+        dialect
+    )
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def update_status(dialect):
+    """Смена статуса; последней колонкой RETURNING идёт старый статус
+
+    Postgres читает его тем же запросом (FROM ... FOR UPDATE). SQLite не
+    разрешает ссылаться на FROM в RETURNING — старый статус передаётся
+    параметром old_status, прочитанным заранее.
+    """
+    if dialect == 'postgres':
+        n = notes.alias('n')
+        old = (select(notes.c.id, notes.c.status)
+               .where(notes.c.id == bindparam('note_id'))
+               .with_for_update()
+               .subquery('old'))
+        statement = (update(n)
+                     .where(n.c.id == old.c.id)
+                     .returning(*note_columns(n), old.c.status))
+    else:
+        statement = (update(notes)
+                     .where(notes.c.id == bindparam('note_id'))
+                     .returning(*note_columns(), bindparam('old_status', type_=notes.c.status.type)))
+    statement = statement.values(status=bindparam('status'), updated_at=bindparam('updated_at'),
+                                 revision=REVISION)
+    return CompiledQuery(statement, dialect)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def delete_note(dialect):
+    """Название и статус для журнала, id и revision — для следа удаления"""
+    return CompiledQuery(
+        delete(notes)
+        .where(notes.c.id == bindparam('note_id'))
+        .returning(notes.c.title, notes.c.status, notes.c.id, REVISION.label('revision')),
+        dialect
+    )
+
+
+def stats():
+    """Попадания в кэш скомпилированных запросов"""
+    builders = (notes_page, note_by_id, notes_changed, tombstones_changed, insert_note,
+                update_note, update_status, delete_note)
+    hits = misses = size = 0
+    for builder in builders:
+        info = builder.cache_info()
+        hits += info.hits
+        misses += info.misses
+        size += info.currsize
+    return {'hits': hits, 'compiled': misses, 'size': size}
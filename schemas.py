@@ -5,6 +5,7 @@ from models import Note
 ma = Marshmallow()
 
 class NoteSchema(ma.SQLAlchemySchema):
+    """Описание и проверка заметки. Ответы API собирают models.note_row и app.json (fastjson) — без схемы на каждую строку"""
     class Meta:
         model = Note
         load_instance = True  # позволяет автоматически создавать Note из JSON
@@ -12,7 +13,10 @@ class NoteSchema(ma.SQLAlchemySchema):
     id = ma.auto_field(dump_only=True)   # read-only
     title = ma.auto_field(required=True, validate=validate.Length(min=1, max=200))
     content = ma.auto_field(allow_none=True)
+    status = ma.auto_field()
     created_at = ma.auto_field(dump_only=True)
+    updated_at = ma.auto_field(dump_only=True)
+    revision = ma.auto_field(dump_only=True)
 
 # Экземпляры схем для удобства
 note_schema = NoteSchema()           # один объект
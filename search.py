@@ -0,0 +1,121 @@
+"""Полнотекстовый поиск по заметкам.
+
+Postgres: генерируемая колонка notes.search_vector (title с весом A,
+content с весом B) и GIN-индекс по ней — миграция 0004.
+SQLite: внешняя FTS5-таблица notes_fts, которую поддерживают триггеры.
+
+Каждое слово запроса ищется как префикс ("канб" найдёт «канбан»), все
+слова должны встретиться. Подсветка собирается в базе с управляющими
+символами-маркерами, а в HTML превращается уже после экранирования
+текста, поэтому пользовательский HTML из заметок не проходит в ответ.
+"""
+import re
+
+from models import NOTE_FIELDS
+
+MAX_TERMS = 8
+MARK_START = '\x02'
+MARK_STOP = '\x03'
+
+SQLITE_FTS_DDL = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+        title, content,
+        content='notes', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN
+        INSERT INTO notes_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+        INSERT INTO notes_fts (notes_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE OF title, content ON notes BEGIN
+        INSERT INTO notes_fts (notes_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO notes_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    ''',
+]
+
+# Колонки заметки в порядке NOTE_FIELDS: строку результата разбирает models.note_row
+NOTE_COLUMNS = ', '.join(NOTE_FIELDS)
+JOINED_NOTE_COLUMNS = ', '.join(f'n.{name}' for name in NOTE_FIELDS)
+
+
+def ensure_sqlite_fts(cur):
+    """FTS5-индекс для SQLite-базы; при первом создании заполняем его из notes"""
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes_fts'")
+    exists = cur.fetchone() is not None
+    for statement in SQLITE_FTS_DDL:
+        cur.execute(statement)
+    if not exists:
+        cur.execute("INSERT INTO notes_fts (notes_fts) VALUES ('rebuild')")
+
+
+def parse_terms(query):
+    """Слова запроса (буквы и цифры), не больше MAX_TERMS"""
+    return re.findall(r'\w+', query or '')[:MAX_TERMS]
+
+
+def _tsquery(terms):
+    return ' & '.join(f'{term}:*' for term in terms)
+
+
+def _fts5_query(terms):
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_notes(cur, dialect, terms, limit, offset=0, statuses=None):
+    """Страница результатов: колонки заметки, затем rank, title_hl, snippet"""
+    status_filter = ''
+    status_params = []
+    if statuses:
+        status_filter = f"AND n.status IN ({', '.join(['%s'] * len(statuses))})"
+        status_params = list(statuses)
+
+    if dialect == 'postgres':
+        # ts_headline дорогой — считаем его только для строк текущей страницы
+        headline_options = f'StartSel={MARK_START}, StopSel={MARK_STOP}'
+        cur.execute(f'''
+            SELECT {NOTE_COLUMNS}, rank,
+                   ts_headline('simple', title, q, %s),
+                   ts_headline('simple', COALESCE(content, ''), q, %s)
+            FROM (
+                SELECT {JOINED_NOTE_COLUMNS},
+                       ts_rank_cd(n.search_vector, q) AS rank, q
+                FROM notes AS n, to_tsquery('simple', %s) AS q
+                WHERE n.search_vector @@ q {status_filter}
+                ORDER BY rank DESC, n.id DESC
+                LIMIT %s OFFSET %s
+            ) AS hits
+            ORDER BY rank DESC, id DESC
+        ''', [
+            headline_options + ', HighlightAll=true',
+            headline_options + ', MaxWords=24, MinWords=8, MaxFragments=2',
+            _tsquery(terms), *status_params, limit, offset
+        ])
+    else:
+        cur.execute(f'''
+            SELECT {JOINED_NOTE_COLUMNS},
+                   -bm25(notes_fts, 10.0, 1.0) AS rank,
+                   highlight(notes_fts, 0, %s, %s),
+                   snippet(notes_fts, 1, %s, %s, '…', 24)
+            FROM notes_fts
+            JOIN notes AS n ON n.id = notes_fts.rowid
+            WHERE notes_fts MATCH %s {status_filter}
+            ORDER BY bm25(notes_fts, 10.0, 1.0), n.id DESC
+            LIMIT %s OFFSET %s
+        ''', [MARK_START, MARK_STOP, MARK_START, MARK_STOP,
+              _fts5_query(terms), *status_params, limit, offset])
+    return cur.fetchall()
+
+
+def render_highlight(text, escape):
+    """Экранируем текст и заменяем маркеры на <mark>"""
+    return escape(text or '').replace(MARK_START, '<mark>').replace(MARK_STOP, '</mark>')
@@ -4,13 +4,42 @@ document.addEventListener('DOMContentLoaded', () => {
   // Для Render: фронтенд и бэкенд на одном домене, используем относительные пути
   const API_BASE = ''; // Пустая строка - запросы идут на тот же домен
   const API_URL = '/notes'; // Относительный путь к API
+  const PAGE_SIZE = 500; // сервер всё равно ограничит размер страницы
+  const COLUMN_IDS = ['todo','doing','complete'];
+  // Виртуализация колонок: в DOM только карточки в видимой области и запасе вокруг неё
+  const ESTIMATED_CARD_HEIGHT = 84; // высота карточки с отступом до первого замера
+  const CARD_GAP = 10;              // margin-bottom у .note
+  const OVERSCAN_PX = 400;
+  // Очередь записи: изменения копятся FLUSH_DELAY_MS и уходят одним POST /notes/batch
+  const FLUSH_DELAY_MS = 150;
+  const BATCH_LIMIT = 500; // операций в одном пакете (сервер принимает до NOTES_BATCH_MAX)
+  const STREAM_RETRY_MS = 30000; // после 503 от /notes/stream (у воркера нет мест для SSE)
 
   // ---------- STATE ----------
-  let notes = [];
+  const notesById = new Map(); // id (строкой) -> заметка
+  // Колонка: порядок id как в /notes (created_at, id по убыванию), замеренные высоты
+  // карточек и их смещения (префиксные суммы высот)
+  const columns = {};
+  const mountedCards = new Map(); // id -> { el, column }
+  const pendingColumns = new Set();
+  let renderFrame = null;
+  let draggingId = null; // карточку, которую тащат, не убираем из DOM до dragend
+  // Оптимистичные изменения: на экране — последнее известное состояние сервера
+  // (confirmedNotes) с наложенными отправленными (inflightWrites) и ещё не
+  // отправленными (pendingWrites) записями. Записи слиты по заметке.
+  const confirmedNotes = new Map(); // id -> заметка, как её вернул сервер
+  const pendingWrites = new Map();  // id -> { create?, fields?, status?, delete? }
+  const inflightWrites = new Map();
+  const createdIds = new Map();     // временный id (tmp-N) -> id от сервера
+  let tempSeq = 0;
+  let flushTimer = null;
+  let flushing = false;
   let currentEditId = null;
   let columnsInitialized = false;
-  let dropInProgress = false;
   let lastLoadToken = 0;
+  let eventSource = null;
+  let boardRevision = null; // ревизия доски, до которой notesById актуален
+  let streamBroken = false;
 
   // ---------- DOM refs ----------
   const createBtn = document.getElementById('create-note-btn');
@@ -27,7 +56,9 @@ document.addEventListener('DOMContentLoaded', () => {
   setupCreateButton();
   setupModalButtons();
   setupColumns();
+  loadSummary();
   loadNotes(); 
+  connectStream();
 
   // ---------- Global Drag Protection ----------
   function setupGlobalDragHandlers() {
@@ -57,69 +88,28 @@ document.addEventListener('DOMContentLoaded', () => {
   }
 
   function setupModalButtons() {
-    modalSaveBtn.addEventListener('click', async (e) => {
+    modalSaveBtn.addEventListener('click', (e) => {
       e.preventDefault();
       const title = modalTitleEl.value.trim();
       const content = modalContentEl.value.trim();
       if (!title) { modalTitleEl.focus(); return; }
 
-      try {
-        if (currentEditId) {
-          // update existing note
-          const res = await fetch(`${API_URL}/${currentEditId}`, {
-            method: 'PATCH',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ title, content })
-          });
-          if (!res.ok) {
-            const txt = await res.text();
-            throw new Error(`Update failed (${res.status}) ${txt}`);
-          }
-        } else {
-          // create new note
-          const res = await fetch(API_URL, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ 
-              title, 
-              content, 
-              status: 'todo',
-              created_at: new Date().toISOString()
-            })
-          });
-          if (!res.ok) {
-            const txt = await res.text();
-            throw new Error(`Create failed (${res.status}) ${txt}`);
-          }
-        }
-        await loadNotes();
-        modal.hide();
-      } catch (err) {
-        console.error(err);
-        alert(err.message || 'Save failed');
+      if (currentEditId) {
+        queueWrite(currentEditId, { fields: { title, content } });
+      } else {
+        queueCreate({ title, content, status: 'todo', created_at: new Date().toISOString() });
       }
+      modal.hide();
     });
 
     // Delete note
-    modalDeleteBtn.addEventListener('click', async (e) => {
+    modalDeleteBtn.addEventListener('click', (e) => {
       e.preventDefault();
       if (!currentEditId) return;
       if (!confirm('Delete this note?')) return;
-      try {
-        const res = await fetch(`${API_URL}/${currentEditId}`, { 
-          method: 'DELETE' 
-        });
-        if (!res.ok) {
-          const txt = await res.text();
-          throw new Error(`Delete failed (${res.status}) ${txt}`);
-        }
-        currentEditId = null;
-        modal.hide();
-        await loadNotes();
-      } catch (err) {
-        console.error(err);
-        alert(err.message || 'Delete failed');
-      }
+      queueWrite(currentEditId, { delete: true });
+      currentEditId = null;
+      modal.hide();
     });
 
     // Click on note -> open edit modal (delegation)
@@ -128,7 +118,7 @@ document.addEventListener('DOMContentLoaded', () => {
       if (!noteEl) return;
       const id = noteEl.dataset.id || noteEl.id?.replace?.('note-', '');
       if (!id) return;
-      const note = notes.find(n => String(n.id) === String(id));
+      const note = notesById.get(String(id));
       if (!note) return;
       currentEditId = note.id;
       modalLabel.textContent = 'Edit Note';
@@ -144,7 +134,53 @@ document.addEventListener('DOMContentLoaded', () => {
     if (columnsInitialized) return;
     columnsInitialized = true;
 
+    COLUMN_IDS.forEach(id => {
+      const col = document.getElementById(id);
+      if (!col) return;
+      const body = document.createElement('div');
+      body.className = 'col-body';
+      const empty = document.createElement('div');
+      empty.className = 'empty-state';
+      empty.textContent = 'No notes yet — drag here or click New note';
+      col.append(body, empty);
+      columns[id] = { el: col, body, empty, order: [], heights: new Map(), offsets: null };
+    });
+
     document.querySelectorAll('.column').forEach(col => {
+      col.addEventListener('scroll', () => scheduleRender(col.id), { passive: true });
+
+      // Карточки без своих обработчиков: события ловит колонка
+      col.addEventListener('dragstart', (e) => {
+        const card = e.target.closest && e.target.closest('.note');
+        if (!card) return;
+        draggingId = card.dataset.id;
+        try {
+          e.dataTransfer.effectAllowed = 'move';
+          e.dataTransfer.setData('text/plain', draggingId);
+        } catch (err) {
+          console.warn('dragstart setData failed', err);
+        }
+        card.classList.add('dragging');
+      });
+
+      col.addEventListener('dragend', (e) => {
+        const card = e.target.closest && e.target.closest('.note');
+        if (card) card.classList.remove('dragging');
+        draggingId = null;
+        COLUMN_IDS.forEach(scheduleRender);
+      });
+
+      // Double-click quick delete
+      col.addEventListener('dblclick', (e) => {
+        const card = e.target.closest && e.target.closest('.note');
+        if (!card) return;
+        e.preventDefault();
+        e.stopPropagation();
+
+        if (!confirm('Delete this note?')) return;
+        queueWrite(card.dataset.id, { delete: true });
+      });
+
       col.addEventListener('dragover', (e) => {
         e.preventDefault();
         e.stopPropagation();
@@ -164,217 +200,538 @@ document.addEventListener('DOMContentLoaded', () => {
         }
       });
 
-      col.addEventListener('drop', async (e) => {
+      col.addEventListener('drop', (e) => {
         e.preventDefault();
         e.stopPropagation();
         col.classList.remove('droppable-hover');
 
-        if (dropInProgress) {
-          console.warn('drop skipped — operation in progress');
+        const rawId = e.dataTransfer.getData('text/plain');
+        let realElem = document.elementFromPoint(e.clientX, e.clientY);
+        if (realElem && realElem.closest) realElem = realElem.closest('.column');
+        const targetCol = realElem || col;
+
+        if (!rawId || !targetCol) {
+          console.warn('drop: missing id or target column');
           return;
         }
-        dropInProgress = true;
-
-        try {
-          const rawId = e.dataTransfer.getData('text/plain');
-          let realElem = document.elementFromPoint(e.clientX, e.clientY);
-          if (realElem && realElem.closest) realElem = realElem.closest('.column');
-          const targetCol = realElem || col;
-
-          console.log('drop received id=', rawId, 'target col=', targetCol && targetCol.id);
-
-          if (!rawId || !targetCol) {
-            console.warn('drop: missing id or target column');
-            return;
-          }
-          const id = String(rawId);
-
-          const noteIndex = notes.findIndex(n => String(n.id) === id);
-          if (noteIndex === -1) {
-            console.warn('Note not found in state:', id);
-            return;
-          }
-
-          const oldStatus = notes[noteIndex].status;
-          const newStatus = targetCol.id;
-          
-          if (oldStatus === newStatus) {
-            console.log('Status unchanged, skipping update');
-            return;
-          }
-
-          notes[noteIndex].status = newStatus;
-          
-          const el = document.querySelector(`.note[data-id='${id}']`) || document.getElementById(`note-${id}`);
-          if (el && targetCol) {
-            targetCol.appendChild(el);
-            ensureEmptyStates();
-            updateCounts();
-          }
-
-          const res = await fetch(`${API_URL}/${id}/status`, {
-            method: 'PATCH',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ status: newStatus })
-          });
-            
-          if (!res.ok) {
-            const text = await res.text();
-            throw new Error(`Status update failed (${res.status}) ${text}`);
-          }
-
-          console.log('Status updated successfully');
-          
-        } catch (err) {
-          console.error('Drop error:', err);
-          // Восстанавливаем состояние при ошибке
-          await loadNotes();
-          alert(err.message || 'Move failed');
-        } finally {
-          dropInProgress = false;
+        const note = notesById.get(String(rawId));
+        if (!note) {
+          console.warn('Note not found in state:', rawId);
+          return;
         }
+        if (note.status === targetCol.id) return;
+
+        // Карточка переезжает сразу; несколько переносов подряд уйдут одной операцией
+        queueWrite(rawId, { status: targetCol.id });
       });
     });
+
+    window.addEventListener('resize', () => COLUMN_IDS.forEach(scheduleRender));
   }
 
   // ---------- Core: load / render ----------
+  // Счётчики в шапке приходят маленьким ответом раньше полного списка
+  async function loadSummary() {
+    try {
+      const res = await fetch(`${API_URL}/summary`);
+      if (!res.ok) return;
+      const data = await res.json();
+      // Если список уже загружен, счётчики посчитаны по нему
+      if (notesById.size) return;
+      ['todo','doing','complete'].forEach(id => {
+        const el = document.getElementById(`count-${id}`);
+        if (el && data.counts) el.textContent = data.counts[id] || 0;
+      });
+    } catch (err) {
+      console.warn('Load summary error:', err);
+    }
+  }
+
+  // После первой загрузки доска догружает только изменения
   async function loadNotes() {
+    if (boardRevision === null) return loadAllNotes();
+    return syncChanges();
+  }
+
+  async function syncChanges() {
     const token = ++lastLoadToken;
     try {
-      const res = await fetch(`${API_URL}?page=1&per_page=1000`);
-      if (!res.ok) {
-        const txt = await res.text();
-        throw new Error(`Failed to load notes (${res.status}) ${txt}`);
-      }
-      const data = await res.json();
-      
-      // Игнорируем устаревшие ответы
-      if (token !== lastLoadToken) {
-        console.warn('stale loadNotes response ignored');
-        return;
+      let hasMore = true;
+      while (hasMore) {
+        const res = await fetch(`${API_URL}/changes?since=${boardRevision}`);
+        if (!res.ok) {
+          const txt = await res.text();
+          throw new Error(`Failed to load changes (${res.status}) ${txt}`);
+        }
+        const data = await res.json();
+        if (token !== lastLoadToken) return;
+
+        if (data.reset) {
+          // Сервер не знает нашей ревизии — перечитываем доску целиком
+          boardRevision = null;
+          return loadAllNotes();
+        }
+        (data.notes || []).forEach(applyServerNote);
+        (data.deleted || []).forEach(applyServerDelete);
+        boardRevision = data.revision;
+        hasMore = data.has_more;
       }
-      
-      notes = Array.isArray(data) ? data : (data.notes || []);
-      renderAllNotes();
+    } catch (err) {
+      console.error('Sync changes error:', err);
+    }
+  }
+
+  async function loadAllNotes() {
+    const token = ++lastLoadToken;
+    try {
+      const loaded = [];
+      let cursor = null;
+      let revision = null;
+
+      // Идём по страницам, пока сервер отдаёт next_cursor
+      do {
+        const url = `${API_URL}?limit=${PAGE_SIZE}` + (cursor ? `&cursor=${encodeURIComponent(cursor)}` : '');
+        const res = await fetch(url);
+        if (!res.ok) {
+          const txt = await res.text();
+          throw new Error(`Failed to load notes (${res.status}) ${txt}`);
+        }
+        const data = await res.json();
+
+        // Игнорируем устаревшие ответы
+        if (token !== lastLoadToken) {
+          console.warn('stale loadNotes response ignored');
+          return;
+        }
+
+        if (Array.isArray(data)) {
+          loaded.push(...data);
+          cursor = null;
+        } else {
+          loaded.push(...(data.notes || []));
+          cursor = data.next_cursor;
+          // Ревизия первой страницы: изменения во время листания придут дельтой
+          if (revision === null && data.revision !== undefined) revision = data.revision;
+        }
+      } while (cursor);
+
+      replaceConfirmedNotes(loaded);
+      boardRevision = revision;
     } catch (err) {
       console.error('Load notes error:', err);
       alert(err.message || 'Failed to load notes');
     }
   }
 
-  function renderAllNotes() {
-    ['todo','doing','complete'].forEach(id => {
-      const col = document.getElementById(id);
-      if (!col) return;
-      
-      // Сохраняем заголовок, удаляем остальное
-      Array.from(col.children).forEach(child => {
-        if (!child.classList || !child.classList.contains('col-header')) {
-          child.remove();
-        }
-      });
+  // ---------- Live updates ----------
+  // Изменения с сервера (в том числе из других вкладок) приходят по одной заметке
+  function connectStream() {
+    if (!window.EventSource) return;
+    eventSource = new EventSource(`${API_URL}/stream`);
+
+    eventSource.addEventListener('note', (e) => {
+      const event = JSON.parse(e.data);
+      if (event.type === 'delete') {
+        applyServerDelete(event.id);
+      } else if (event.note) {
+        applyServerNote(event.note);
+      }
     });
 
-    // Добавляем заметки
-    notes.forEach(note => addNoteToColumn(note));
+    // Сервер потерял часть событий — перечитываем доску целиком
+    eventSource.addEventListener('resync', () => loadNotes());
+
+    eventSource.addEventListener('open', () => {
+      // Пока соединения не было, изменения могли пройти мимо
+      if (streamBroken) loadNotes();
+      streamBroken = false;
+    });
 
-    ensureEmptyStates();
-    updateCounts();
+    eventSource.addEventListener('error', () => {
+      streamBroken = true; // EventSource переподключится сам
+      // Кроме ответа не 200 (503 — заняты места SSE): тогда переподключаемся сами
+      if (eventSource.readyState === EventSource.CLOSED) {
+        setTimeout(connectStream, STREAM_RETRY_MS);
+      }
+    });
   }
 
-  function addNoteToColumn(note) {
-    const col = document.getElementById(note.status || 'todo');
-    if (!col) return;
+  // ---------- Store ----------
+  function columnOf(note) {
+    return columns[note.status] ? note.status : 'todo';
+  }
 
-    // Проверяем, не находится ли заметка уже в правильной колонке
-    const existing = document.querySelector(`.note[data-id='${note.id}']`);
-    if (existing) {
-      const currentCol = existing.closest('.column');
-      if (currentCol && currentCol.id === note.status) {
-        return; // Заметка уже в правильной колонке - пропускаем
-      }
-      existing.remove(); // Удаляем только если нужно переместить
+  // Порядок как у /notes: новые сверху, при равном created_at — больший id
+  function compareNotes(a, b) {
+    const ca = a.created_at || '';
+    const cb = b.created_at || '';
+    if (ca !== cb) return ca < cb ? 1 : -1;
+    // Временные заметки (tmp-N) ещё без id — считаем их самыми новыми
+    const ia = Number(a.id) || Infinity;
+    const ib = Number(b.id) || Infinity;
+    return ia === ib ? 0 : (ia < ib ? 1 : -1);
+  }
+
+  function insertIntoOrder(column, id) {
+    const order = columns[column].order;
+    const note = notesById.get(id);
+    let lo = 0;
+    let hi = order.length;
+    while (lo < hi) {
+      const mid = (lo + hi) >> 1;
+      if (compareNotes(notesById.get(order[mid]), note) < 0) lo = mid + 1;
+      else hi = mid;
     }
+    order.splice(lo, 0, id);
+    columns[column].offsets = null;
+    scheduleRender(column);
+  }
 
-    const wrapper = document.createElement('div');
-    wrapper.className = 'note';
-    wrapper.id = `note-${note.id}`;
-    wrapper.dataset.id = String(note.id);
-    wrapper.draggable = true;
-    wrapper.innerHTML = `
-      <div class="note-title"><strong>${escapeHtml(note.title)}</strong></div>
-      <div class="note-content"><small style="color:#cbd5e1">${escapeHtml(note.content || '')}</small></div>
-    `;
+  function removeFromOrder(column, id) {
+    const col = columns[column];
+    const index = col.order.indexOf(id);
+    if (index !== -1) col.order.splice(index, 1);
+    col.offsets = null;
+    scheduleRender(column);
+  }
 
-    // Drag handlers
-    wrapper.addEventListener('dragstart', (e) => {
-      try {
-        e.dataTransfer.effectAllowed = 'move';
-        e.dataTransfer.setData('text/plain', String(note.id));
-      } catch (err) {
-        console.warn('dragstart setData failed', err);
-      }
-      wrapper.classList.add('dragging');
+  // Полная замена доски (первая загрузка или resync)
+  function setAllNotes(list) {
+    notesById.clear();
+    list.forEach(note => notesById.set(String(note.id), note));
+    COLUMN_IDS.forEach(id => {
+      if (!columns[id]) return;
+      columns[id].order = [];
+      columns[id].offsets = null;
     });
-    
-    wrapper.addEventListener('dragend', () => {
-      wrapper.classList.remove('dragging');
+    notesById.forEach((note, id) => {
+      if (columns[columnOf(note)]) columns[columnOf(note)].order.push(id);
     });
-
-    // Double-click quick delete
-    wrapper.addEventListener('dblclick', async (e) => {
-      e.preventDefault();
-      e.stopPropagation();
-      
-      if (!confirm('Delete this note?')) return;
-      try {
-        const res = await fetch(`${API_URL}/${note.id}`, { 
-          method: 'DELETE' 
-        });
-        if (!res.ok) {
-          const txt = await res.text();
-          throw new Error(`Delete failed (${res.status}) ${txt}`);
-        }
-        await loadNotes();
-      } catch (err) {
-        console.error(err);
-        alert(err.message || 'Delete failed');
-      }
+    COLUMN_IDS.forEach(id => {
+      if (!columns[id]) return;
+      columns[id].order.sort((a, b) => compareNotes(notesById.get(a), notesById.get(b)));
+      scheduleRender(id);
     });
+  }
+
+  // Вставка или обновление одной заметки: трогаем только её карточку
+  function upsertNote(note) {
+    const id = String(note.id);
+    const previous = notesById.get(id);
+    // Устаревшая версия (например, событие пришло позже ответа на сохранение)
+    if (previous && note.revision != null && previous.revision > note.revision) return;
+    const next = previous ? { ...previous, ...note } : note;
+    notesById.set(id, next);
+    if (!columns[columnOf(next)]) return;
+
+    if (!previous) {
+      insertIntoOrder(columnOf(next), id);
+    } else if (columnOf(previous) !== columnOf(next) || previous.created_at !== next.created_at) {
+      removeFromOrder(columnOf(previous), id);
+      insertIntoOrder(columnOf(next), id);
+    } else if (mountedCards.has(id)) {
+      // Новый объект заметки — при отрисовке карточка обновит текст
+      scheduleRender(columnOf(next));
+    }
+  }
 
-    col.appendChild(wrapper);
+  function removeNote(id) {
+    id = String(id);
+    const note = notesById.get(id);
+    if (!note) return;
+    notesById.delete(id);
+    const column = columnOf(note);
+    if (!columns[column]) return;
+    removeFromOrder(column, id);
+    columns[column].heights.delete(id);
+  }
 
-    // Удаляем пустое состояние если присутствует
-    const empt = col.querySelector('.empty-state');
-    if (empt) empt.remove();
+  // ---------- Write queue ----------
+  function isTempId(id) {
+    return String(id).startsWith('tmp-');
   }
 
-  function ensureEmptyStates() {
-    ['todo','doing','complete'].forEach(id => {
-      const col = document.getElementById(id);
-      if (!col) return;
-      const hasNote = !!col.querySelector('.note');
-      const existingEmpty = col.querySelector('.empty-state');
-      if (!hasNote) {
-        if (!existingEmpty) {
-          const empty = document.createElement('div');
-          empty.className = 'empty-state';
-          empty.textContent = 'No notes yet — drag here or click New note';
-          col.appendChild(empty);
+  // Временный id созданной заметки, если сервер уже выдал настоящий
+  function resolveId(id) {
+    id = String(id);
+    return createdIds.get(id) || id;
+  }
+
+  function applyWrite(note, write) {
+    if (!write) return note;
+    if (write.delete) return null;
+    if (write.create) note = { id: write.id, ...write.create, updated_at: null, revision: null };
+    if (!note) return null;
+    return { ...note, ...write.fields, ...(write.status ? { status: write.status } : {}) };
+  }
+
+  // Что показывать: сервер + отправленные записи + ещё не отправленные
+  function localNote(id) {
+    const confirmed = confirmedNotes.get(id) || null;
+    return applyWrite(applyWrite(confirmed, inflightWrites.get(id)), pendingWrites.get(id));
+  }
+
+  function renderLocal(id) {
+    const note = localNote(id);
+    if (note) upsertNote(note);
+    else removeNote(id);
+  }
+
+  // Изменение заметки: сразу на экране, на сервер — со следующим пакетом
+  function queueWrite(id, change) {
+    id = resolveId(id);
+    const write = pendingWrites.get(id) || {};
+    if (change.delete) {
+      // Заметка, которую ещё не отправляли создавать, просто исчезает
+      if (write.create) pendingWrites.delete(id);
+      else pendingWrites.set(id, { delete: true });
+    } else {
+      if (write.delete) return;
+      if (change.fields) write.fields = { ...write.fields, ...change.fields };
+      if (change.status) write.status = change.status; // переносы подряд: побеждает последний
+      pendingWrites.set(id, write);
+    }
+    renderLocal(id);
+    scheduleFlush();
+  }
+
+  function queueCreate(data) {
+    const id = `tmp-${++tempSeq}`;
+    pendingWrites.set(id, { id, create: data });
+    renderLocal(id);
+    scheduleFlush();
+  }
+
+  function scheduleFlush() {
+    // Пока пакет в пути, новые изменения копятся и уходят следующим
+    if (flushTimer !== null || flushing) return;
+    flushTimer = setTimeout(flushWrites, FLUSH_DELAY_MS);
+  }
+
+  function writeOperations(id, write) {
+    if (write.create) {
+      return [{ op: 'create', ...write.create, ...write.fields, ...(write.status ? { status: write.status } : {}) }];
+    }
+    if (write.delete) return [{ op: 'delete', id: Number(id) }];
+    const ops = [];
+    if (write.fields) ops.push({ op: 'update', id: Number(id), ...write.fields });
+    if (write.status) ops.push({ op: 'status', id: Number(id), status: write.status });
+    return ops;
+  }
+
+  async function flushWrites() {
+    flushTimer = null;
+    const operations = [];
+    const owners = []; // id заметки для каждой операции пакета
+    for (const [id, write] of pendingWrites) {
+      // Изменения заметки, которую сервер ещё не создал, ждут её id
+      if (isTempId(id) && !write.create) continue;
+      const ops = writeOperations(id, write);
+      if (operations.length + ops.length > BATCH_LIMIT) break;
+      ops.forEach(op => {
+        operations.push(op);
+        owners.push(id);
+      });
+      inflightWrites.set(id, write);
+      pendingWrites.delete(id);
+    }
+    if (!operations.length) return;
+
+    flushing = true;
+    const errors = [];
+    try {
+      const res = await fetch(`${API_URL}/batch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ operations })
+      });
+      if (!res.ok) {
+        const txt = await res.text();
+        throw new Error(`Save failed (${res.status}) ${txt}`);
+      }
+      const data = await res.json();
+      data.results.forEach((result, index) => {
+        const id = owners[index];
+        if (result.status === 'ok') {
+          if (result.op === 'create') resolveCreated(id, result.note);
+          else if (result.op === 'delete') confirmedNotes.delete(id);
+          else applyServerNote(result.note);
+        } else if (result.status === 'not_found') {
+          // Заметку удалили в другом окне — изменения ей больше не нужны
+          confirmedNotes.delete(id);
+          pendingWrites.delete(id);
+        } else {
+          errors.push(result.error);
         }
-      } else {
-        if (existingEmpty) existingEmpty.remove();
+      });
+    } catch (err) {
+      console.error('Batch error:', err);
+      errors.push(err.message);
+    } finally {
+      // Всё, что сервер не подтвердил, откатывается к его состоянию
+      const settled = Array.from(inflightWrites.keys());
+      inflightWrites.clear();
+      settled.forEach(id => {
+        if (isTempId(id) && !createdIds.has(id)) pendingWrites.delete(id);
+        renderLocal(resolveId(id));
+      });
+      flushing = false;
+      if (pendingWrites.size) scheduleFlush();
+    }
+    if (errors.length) alert(errors.join('\n') || 'Save failed');
+  }
+
+  // Сервер создал заметку: временная карточка меняется на настоящую
+  function resolveCreated(tempId, note) {
+    const id = String(note.id);
+    createdIds.set(tempId, id);
+    const write = pendingWrites.get(tempId);
+    if (write) {
+      pendingWrites.delete(tempId);
+      pendingWrites.set(id, write);
+    }
+    if (currentEditId === tempId) currentEditId = id;
+    removeNote(tempId);
+    applyServerNote(note);
+  }
+
+  // Заметка от сервера (ответ, SSE, /notes/changes): свои неподтверждённые изменения остаются поверх
+  function applyServerNote(note) {
+    const id = String(note.id);
+    const known = confirmedNotes.get(id);
+    if (known && note.revision != null && known.revision > note.revision) return;
+    confirmedNotes.set(id, note);
+    renderLocal(id);
+  }
+
+  function applyServerDelete(id) {
+    id = String(id);
+    confirmedNotes.delete(id);
+    pendingWrites.delete(id);
+    renderLocal(id);
+  }
+
+  // Полная загрузка доски: неподтверждённые изменения накладываются заново
+  function replaceConfirmedNotes(list) {
+    confirmedNotes.clear();
+    list.forEach(note => confirmedNotes.set(String(note.id), note));
+    const ids = new Set([...confirmedNotes.keys(), ...inflightWrites.keys(), ...pendingWrites.keys()]);
+    setAllNotes(Array.from(ids, localNote).filter(Boolean));
+  }
+
+  // ---------- Render ----------
+  function scheduleRender(column) {
+    if (!columns[column]) return;
+    pendingColumns.add(column);
+    if (renderFrame === null) renderFrame = requestAnimationFrame(flushRender);
+  }
+
+  function flushRender() {
+    renderFrame = null;
+    const batch = Array.from(pendingColumns);
+    pendingColumns.clear();
+    batch.forEach(renderColumn);
+  }
+
+  // offsets[i] — верх i-й карточки в теле колонки, последний элемент — полная высота
+  function columnOffsets(col) {
+    if (!col.offsets) {
+      const offsets = new Array(col.order.length + 1);
+      offsets[0] = 0;
+      for (let i = 0; i < col.order.length; i++) {
+        offsets[i + 1] = offsets[i] + (col.heights.get(col.order[i]) || ESTIMATED_CARD_HEIGHT);
       }
-    });
+      col.offsets = offsets;
+    }
+    return col.offsets;
   }
 
-  function updateCounts() {
-    ['todo','doing','complete'].forEach(id => {
-      const el = document.getElementById(`count-${id}`);
-      if (el) {
-        el.textContent = notes.filter(n => n.status === id).length;
+  // Первый индекс, у которого offsets[index] > value
+  function upperBound(offsets, value) {
+    let lo = 0;
+    let hi = offsets.length;
+    while (lo < hi) {
+      const mid = (lo + hi) >> 1;
+      if (offsets[mid] <= value) lo = mid + 1;
+      else hi = mid;
+    }
+    return lo;
+  }
+
+  function renderColumn(column) {
+    const col = columns[column];
+    const offsets = columnOffsets(col);
+    const total = offsets[offsets.length - 1];
+    const top = col.el.scrollTop - col.body.offsetTop;
+    const first = Math.max(0, upperBound(offsets, top - OVERSCAN_PX) - 1);
+    let last = first;
+    while (last < col.order.length && offsets[last] < top + col.el.clientHeight + OVERSCAN_PX) last++;
+    const visible = col.order.slice(first, last);
+    const keep = new Set(visible);
+
+    // Карточки этой колонки вне окна уходят из DOM
+    mountedCards.forEach((card, id) => {
+      if (card.column === column && !keep.has(id) && id !== draggingId) {
+        card.el.remove();
+        mountedCards.delete(id);
       }
     });
+
+    col.body.style.paddingTop = `${offsets[first]}px`;
+    col.body.style.paddingBottom = `${total - offsets[last]}px`;
+
+    // Ключевая сверка: существующие карточки переиспользуются и переставляются
+    let prev = null;
+    visible.forEach(id => {
+      const note = notesById.get(id);
+      let card = mountedCards.get(id);
+      if (!card) {
+        card = { el: createCard(id), column };
+        mountedCards.set(id, card);
+      }
+      card.column = column;
+      if (card.el.note !== note) {
+        renderNoteBody(card.el, note);
+        card.el.note = note;
+      }
+      const expected = prev ? prev.nextSibling : col.body.firstChild;
+      if (card.el !== expected) col.body.insertBefore(card.el, expected);
+      prev = card.el;
+    });
+
+    col.empty.style.display = col.order.length ? 'none' : '';
+    const count = document.getElementById(`count-${column}`);
+    if (count) count.textContent = col.order.length;
+
+    // Замер реальных высот; если оценка ошиблась, окно пересчитается в следующем кадре
+    let changed = false;
+    visible.forEach(id => {
+      const height = mountedCards.get(id).el.offsetHeight + CARD_GAP;
+      if (col.heights.get(id) !== height) {
+        col.heights.set(id, height);
+        changed = true;
+      }
+    });
+    if (changed) {
+      col.offsets = null;
+      scheduleRender(column);
+    }
+  }
+
+  function createCard(id) {
+    const wrapper = document.createElement('div');
+    wrapper.className = 'note';
+    wrapper.id = `note-${id}`;
+    wrapper.dataset.id = id;
+    wrapper.draggable = true;
+    return wrapper;
+  }
+
+  function renderNoteBody(wrapper, note) {
+    wrapper.innerHTML = `
+      <div class="note-title"><strong>${escapeHtml(note.title)}</strong></div>
+      <div class="note-content"><small style="color:#cbd5e1">${escapeHtml(note.content || '')}</small></div>
+    `;
   }
 
   function escapeHtml(s = '') {
@@ -389,7 +746,8 @@ document.addEventListener('DOMContentLoaded', () => {
   // Debug helpers
   window.kanban = {
     reload: loadNotes,
-    notes: () => notes.slice(),
+    revision: () => boardRevision,
+    notes: () => Array.from(notesById.values()),
     apiBase: API_BASE
   };
 });
\ No newline at end of file
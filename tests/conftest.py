@@ -0,0 +1,34 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Тесты работают с SQLite в памяти, как в .env.test
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+# Лог тестов — во временный файл, а не в logs/app.log из репозитория
+os.environ.setdefault('LOG_FILE', os.path.join(tempfile.mkdtemp(prefix='notes-tests-'), 'app.log'))
+os.environ.setdefault('LOG_STDOUT', 'off')
+
+
+@pytest.fixture(scope='session', autouse=True)
+def schema():
+    """Таблицы создаются явным шагом (как flask init-db), импорт app базу не трогает"""
+    from app import init_db
+    init_db()
+
+
+@pytest.fixture
+def client():
+    """Тестовый клиент с пустой таблицей notes"""
+    from app import app, get_db_connection, note_cache
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute('DELETE FROM notes')
+    conn.commit()
+    conn.close()
+    # Таблицу очистили в обход API — сбрасываем кэш ответов
+    note_cache.backend.clear()
+    return app.test_client()
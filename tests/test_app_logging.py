@@ -0,0 +1,95 @@
+import json
+import logging
+import os
+
+from app_logging import AppLogging, JSONLineFormatter, SharedFileHandler
+
+
+def make_logging(path, max_bytes=0, backup_count=0, queue_size=100):
+    handler = SharedFileHandler(str(path), max_bytes, backup_count)
+    handler.setFormatter(JSONLineFormatter())
+    app_logging = AppLogging([handler], queue_size)
+    logger = logging.getLogger(f'test-app-logging-{path}')
+    app_logging.install(logger)
+    return app_logging, logger
+
+
+def read_lines(path):
+    return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+
+
+def test_records_written_as_json_lines(tmp_path):
+    """Запись уходит в файл через очередь; события log_action — со своими полями"""
+    path = tmp_path / 'app.log'
+    app_logging, logger = make_logging(path)
+    app_logging.start()
+    logger.info('plain %s', 'message')
+    logger.info('GET_NOTE', extra={'event': {'action': 'GET_NOTE', 'note_id': 7, 'ip': '10.0.0.1'}})
+    app_logging.stop()
+
+    plain, event = read_lines(path)
+    assert plain['message'] == 'plain message' and plain['level'] == 'INFO' and plain['ip'] == '-'
+    assert event == {'action': 'GET_NOTE', 'note_id': 7, 'ip': '10.0.0.1', 'level': 'INFO'}
+
+
+def test_exception_reaches_file(tmp_path):
+    """logger.exception: трасса проходит через очередь и пишется полем exception"""
+    path = tmp_path / 'app.log'
+    app_logging, logger = make_logging(path)
+    app_logging.start()
+    try:
+        raise ValueError('broken note')
+    except ValueError:
+        logger.exception('update failed')
+    app_logging.stop()
+
+    line, = read_lines(path)
+    assert line['message'] == 'update failed' and line['level'] == 'ERROR'
+    assert 'Traceback' in line['exception'] and 'ValueError: broken note' in line['exception']
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    """Поток-писатель не запущен: лишние записи отбрасываются и считаются"""
+    app_logging, logger = make_logging(tmp_path / 'app.log', queue_size=2)
+    for n in range(5):
+        logger.info('record %s', n)
+    stats = app_logging.stats()
+    assert stats['queued'] == 2 and stats['dropped'] == 3
+    app_logging.stop()
+
+
+def test_reopens_file_rotated_by_another_process(tmp_path):
+    """Второй процесс (здесь — второй обработчик) ротировал файл — первый пишет в новый"""
+    path = tmp_path / 'app.log'
+    first = SharedFileHandler(str(path), max_bytes=200, backup_count=3)
+    second = SharedFileHandler(str(path), max_bytes=200, backup_count=3)
+    for handler in (first, second):
+        handler.setFormatter(JSONLineFormatter())
+
+    def emit(handler, n):
+        handler.handle(logging.LogRecord('app', logging.INFO, __file__, 1, f'line {n}', None, None))
+
+    emit(first, 0)
+    for n in range(1, 6):
+        emit(second, n)
+    emit(first, 6)
+    first.close()
+    second.close()
+
+    assert os.path.exists(f'{path}.1')
+    # Ротация одна на двоих, запись первого обработчика — в текущем файле
+    assert read_lines(path)[-1]['message'] == 'line 6'
+    rotated = [entry['message'] for name in os.listdir(tmp_path) if name.startswith('app.log.')
+               and not name.endswith('.lock') for entry in read_lines(tmp_path / name)]
+    current = [entry['message'] for entry in read_lines(path)]
+    assert sorted(rotated + current) == [f'line {n}' for n in range(7)]
+
+
+def test_app_logger_uses_queue(client):
+    """На app.logger только очередь; счётчики — в /audit/stats"""
+    from app import app
+    from app_logging import DroppingQueueHandler
+
+    assert [type(handler) for handler in app.logger.handlers] == [DroppingQueueHandler]
+    stats = client.get('/audit/stats').get_json()['log_queue']
+    assert stats['running'] and stats['dropped'] == 0
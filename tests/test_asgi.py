@@ -0,0 +1,173 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get('DATABASE_URL', '').startswith('postgres'),
+    reason='ASGI-режим работает только с Postgres'
+)
+
+
+async def call(app, method, path, body=None, query='', headers=()):
+    """Один HTTP-запрос к ASGI-приложению: (статус, заголовки, тело)"""
+    payload = json.dumps(body).encode('utf-8') if body is not None else b''
+    messages = [{'type': 'http.request', 'body': payload, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http', 'method': method, 'path': path,
+        'query_string': query.encode('latin-1'),
+        'headers': [(name.lower().encode(), value.encode()) for name, value in headers],
+        'client': ('127.0.0.1', 50000),
+    }
+    await app(scope, receive, send)
+    start, response_body = sent
+    response_headers = {name.decode(): value.decode() for name, value in start['headers']}
+    return start['status'], response_headers, response_body['body']
+
+
+def run(scenario):
+    """Свежее ASGI-приложение на один цикл событий: lifespan, сценарий, закрытие пула"""
+    from asgi import NotesASGI
+
+    async def main():
+        app = NotesASGI()
+        try:
+            return await scenario(app)
+        finally:
+            if app.pool is not None:
+                await app.pool.close()
+
+    return asyncio.run(main())
+
+
+def test_same_json_contract_as_flask(client):
+    """Заметка, созданная через ASGI, читается Flask-приложением так же, и наоборот"""
+    async def scenario(app):
+        status, headers, body = await call(app, 'POST', '/notes',
+                                           {'title': 'Async', 'content': 'c', 'status': 'doing'})
+        assert status == 201
+        assert headers['access-control-allow-origin'] == '*'
+        created = json.loads(body)
+
+        status, headers, body = await call(app, 'GET', f"/notes/{created['id']}")
+        assert status == 200
+        return created, headers['etag'], body
+
+    created, etag, body = run(scenario)
+    flask_response = client.get(f"/notes/{created['id']}")
+    assert flask_response.get_json() == created
+    # Тот же JSON-провайдер и та же ревизия доски — совпадают и тело, и ETag
+    assert flask_response.get_data() == body
+    assert flask_response.headers['ETag'] == etag
+
+
+def test_pages_and_conditional_get(client):
+    for index in range(3):
+        client.post('/notes', json={'title': f'n{index}', 'created_at': f'2026-10-0{index + 1}T00:00:00'})
+
+    async def scenario(app):
+        status, headers, body = await call(app, 'GET', '/notes', query='limit=2')
+        first = json.loads(body)
+        assert status == 200
+        assert [note['title'] for note in first['notes']] == ['n2', 'n1']
+
+        status, _, body = await call(app, 'GET', '/notes', query=f"limit=2&cursor={first['next_cursor']}")
+        assert [note['title'] for note in json.loads(body)['notes']] == ['n0']
+
+        status, _, body = await call(app, 'GET', '/notes', query='limit=2',
+                                     headers=[('If-None-Match', headers['etag'])])
+        assert status == 304 and body == b''
+        return first
+
+    first = run(scenario)
+    assert client.get('/notes', query_string={'limit': 2}).get_json() == first
+
+
+def test_updates_and_errors(client):
+    note = client.post('/notes', json={'title': 'old', 'status': 'todo'}).get_json()
+
+    async def scenario(app):
+        status, _, body = await call(app, 'PATCH', f"/notes/{note['id']}", {'title': 'new'})
+        assert status == 200 and json.loads(body)['title'] == 'new'
+
+        status, _, body = await call(app, 'PATCH', f"/notes/{note['id']}/status", {'status': 'complete'})
+        assert status == 200 and json.loads(body)['status'] == 'complete'
+
+        assert (await call(app, 'DELETE', f"/notes/{note['id']}"))[0] == 204
+        assert (await call(app, 'GET', f"/notes/{note['id']}"))[0] == 404
+        assert (await call(app, 'PATCH', '/notes/999999', {'title': 'x'}))[0] == 404
+        assert (await call(app, 'GET', '/notes', query='cursor=broken'))[0] == 400
+        assert (await call(app, 'PUT', '/notes'))[0] == 405
+        assert (await call(app, 'GET', '/nothing'))[0] == 404
+
+    run(scenario)
+    changes = client.get('/notes/changes', query_string={'since': note['revision']}).get_json()
+    assert note['id'] in changes['deleted']
+
+
+def test_concurrent_requests_share_pool(client):
+    """Запросов больше, чем соединений: ждут свободное, а не падают"""
+    from async_db import AsyncPool
+    from db import postgres_params
+
+    async def scenario(app):
+        responses = await asyncio.gather(*[
+            call(app, 'POST', '/notes', {'title': f'c{index}'}) for index in range(20)
+        ])
+        assert {status for status, _, _ in responses} == {201}
+        stats = app.pool.stats()
+        assert stats['size'] <= 3 and stats['acquired'] == 20
+
+    app_factory = lambda: AsyncPool(postgres_params(os.environ['DATABASE_URL']), min_size=1, max_size=3)
+    from asgi import NotesASGI
+
+    async def main():
+        app = NotesASGI(create_pool=app_factory)
+        try:
+            await scenario(app)
+        finally:
+            await app.pool.close()
+
+    asyncio.run(main())
+    assert len(client.get('/notes').get_json()['notes']) == 20
+
+
+def test_shutdown_flushes_audit_off_the_event_loop(monkeypatch):
+    """lifespan.shutdown дописывает журнал в пуле потоков, цикл событий не ждёт"""
+    import threading
+
+    import asgi
+
+    flushed = []
+
+    class Writer:
+        def flush(self):
+            flushed.append(threading.get_ident())
+
+    monkeypatch.setattr(asgi, 'audit_writer', Writer())
+
+    async def scenario(app):
+        messages = [{'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        await app({'type': 'lifespan'}, receive, send)
+        return sent, threading.get_ident()
+
+    sent, loop_thread = run(scenario)
+    assert sent == [{'type': 'lifespan.shutdown.complete'}]
+    assert flushed and flushed[0] != loop_thread
@@ -0,0 +1,87 @@
+import sys
+import os
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audit import AuditLogWriter
+
+
+class RecordingConnection:
+    dialect = 'sqlite'
+
+    def __init__(self, sink, gate=None):
+        self.sink = sink
+        self.gate = gate
+
+    def cursor(self):
+        return self
+
+    def executemany(self, query, rows):
+        if self.gate is not None:
+            self.gate.wait()
+        self.sink.append(list(rows))
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def make_row(n):
+    return (None, '127.0.0.1', f'ACTION_{n}', n, 'Desktop', 'Chrome', None, 'test', 'GET')
+
+
+def test_events_are_written_in_batches():
+    """Тест что события пишутся пачками фоновым потоком"""
+    batches = []
+    writer = AuditLogWriter(lambda: RecordingConnection(batches), batch_size=10, flush_interval=10)
+    for n in range(25):
+        assert writer.enqueue(make_row(n))
+
+    assert writer.flush(timeout=2)
+    assert sum(len(b) for b in batches) == 25
+    assert max(len(b) for b in batches) <= 10
+    stats = writer.stats()
+    assert stats['queued'] == 25
+    assert stats['flushed'] == 25
+    assert stats['dropped'] == 0
+    writer.stop()
+
+
+def test_drop_policies():
+    """Тест поведения при переполнении очереди"""
+    gate = threading.Event()
+    batches = []
+
+    for policy in ('drop_newest', 'drop_oldest', 'block'):
+        writer = AuditLogWriter(lambda: RecordingConnection(batches, gate), max_queue=3,
+                                batch_size=100, flush_interval=10, drop_policy=policy,
+                                block_timeout=0.01)
+        results = [writer.enqueue(make_row(n)) for n in range(5)]
+        stats = writer.stats()
+        assert stats['depth'] == 3
+        assert stats['dropped'] == 2
+        if policy == 'drop_oldest':
+            assert all(results)
+            assert writer._queue[0][2] == 'ACTION_2'
+        else:
+            assert results == [True, True, True, False, False]
+        gate.set()
+        writer.stop()
+        gate.clear()
+
+
+def test_stop_flushes_queue():
+    """Тест что при остановке воркера очередь дописывается"""
+    batches = []
+    writer = AuditLogWriter(lambda: RecordingConnection(batches), batch_size=100, flush_interval=60)
+    for n in range(7):
+        writer.enqueue(make_row(n))
+    writer.stop(timeout=2)
+    assert sum(len(b) for b in batches) == 7
+    assert not writer.enqueue(make_row(8))
@@ -0,0 +1,40 @@
+def test_batch_operations(client):
+    """Тест пакетного создания, изменения и удаления заметок"""
+    existing = client.post('/notes', json={'title': 'Existing'}).get_json()
+
+    response = client.post('/notes/batch', json={'operations': [
+        {'op': 'create', 'title': 'A'},
+        {'op': 'create', 'title': 'B', 'status': 'doing'},
+        {'op': 'status', 'id': existing['id'], 'status': 'complete'},
+        {'op': 'update', 'id': existing['id'], 'title': 'Renamed'},
+        {'op': 'delete', 'id': 999999},
+        {'op': 'move', 'id': 1},
+        {'op': 'status', 'id': 'x', 'status': 'todo'},
+    ]})
+    assert response.status_code == 200
+    data = response.get_json()
+    statuses = [result['status'] for result in data['results']]
+    assert statuses == ['ok', 'ok', 'ok', 'ok', 'not_found', 'error', 'error']
+    assert data['applied'] == 4
+    assert data['failed'] == 3
+    assert data['results'][1]['note']['status'] == 'doing'
+    assert data['results'][3]['note']['title'] == 'Renamed'
+    assert data['results'][3]['note']['status'] == 'complete'
+
+    note = client.get(f"/notes/{existing['id']}").get_json()
+    assert (note['title'], note['status']) == ('Renamed', 'complete')
+    assert client.get('/notes/summary').get_json()['counts'] == {'todo': 1, 'doing': 1, 'complete': 1}
+
+    ids = [result['id'] for result in data['results'][:2]]
+    response = client.post('/notes/batch', json=[{'op': 'delete', 'id': note_id} for note_id in ids])
+    assert response.get_json()['applied'] == 2
+    assert client.get('/notes/summary').get_json()['total'] == 1
+
+
+def test_batch_limits(client, monkeypatch):
+    """Тест проверки тела и ограничения размера пакета"""
+    import app
+    assert client.post('/notes/batch', json={'operations': 'nope'}).status_code == 400
+    monkeypatch.setattr(app, 'BATCH_MAX_OPERATIONS', 2)
+    response = client.post('/notes/batch', json=[{'op': 'create', 'title': str(n)} for n in range(3)])
+    assert response.status_code == 413
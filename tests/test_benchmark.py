@@ -0,0 +1,31 @@
+from benchmark import parse_mix, percentile, run_benchmark, summarize
+
+import pytest
+
+
+def test_parse_mix():
+    assert parse_mix('list=3,search') == {'list': 3.0, 'search': 1.0}
+    with pytest.raises(ValueError):
+        parse_mix('list=1,unknown=2')
+
+
+def test_percentiles():
+    values = list(range(1, 101))
+    assert percentile(values, 0.50) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([7], 0.95) == 7
+    assert summarize([], 0, 1.0)['p50_ms'] is None
+
+
+def test_short_run_reports_every_operation(client):
+    """Короткий прогон против приложения в процессе: все операции без ошибок
+
+    Один клиент: общая SQLite в памяти не умеет ждать блокировку таблицы.
+    """
+    report = run_benchmark(notes=30, concurrency=1, duration=0.5, warmup=0, seed=1)
+    assert set(report['endpoints']) == {'list', 'create', 'move', 'delete', 'search'}
+    assert report['total']['errors'] == 0
+    assert report['total']['requests'] > 0
+    for stats in report['endpoints'].values():
+        if stats['requests']:
+            assert stats['p50_ms'] <= stats['p95_ms'] <= stats['p99_ms'] <= stats['max_ms']
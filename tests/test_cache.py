@@ -0,0 +1,133 @@
+import fnmatch
+import time
+
+import pytest
+
+from cache import LRUCache, NoteCache, RedisCache
+
+
+class LocalRedis:
+    """Локальная замена redis.Redis: только команды, которые использует RedisCache"""
+
+    def __init__(self):
+        self.data = {}
+
+    def _alive(self, key):
+        item = self.data.get(key)
+        if item and item[1] is not None and time.monotonic() >= item[1]:
+            del self.data[key]
+            return None
+        return item
+
+    def get(self, key):
+        item = self._alive(key)
+        return None if item is None else str(item[0]).encode('utf-8')
+
+    def set(self, key, value, px=None):
+        self.data[key] = (value, time.monotonic() + px / 1000 if px else None)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def incr(self, key):
+        item = self._alive(key)
+        value = int(item[0]) + 1 if item else 1
+        self.data[key] = (value, item[1] if item else None)
+        return value
+
+    def pexpire(self, key, ms):
+        if key in self.data:
+            self.data[key] = (self.data[key][0], time.monotonic() + ms / 1000)
+
+    def scan_iter(self, match):
+        return [key for key in self.data if fnmatch.fnmatch(key, match)]
+
+
+def test_lru_eviction_and_stats():
+    """Тест вытеснения по числу записей и по объёму"""
+    cache = LRUCache(max_entries=2, ttl=60)
+    cache.set('a', '1')
+    cache.set('b', '2')
+    assert cache.get('a') == '1'       # a становится свежее b
+    cache.set('c', '3')
+    assert cache.get('b') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (1, 1, 1)
+
+    small = LRUCache(max_entries=None, ttl=60, max_bytes=10)
+    small.set('x', 'x' * 6)
+    small.set('y', 'y' * 6)
+    assert small.get('x') is None and small.get('y') == 'y' * 6
+    assert small.stats()['bytes'] == 6
+
+
+@pytest.mark.parametrize('backend', [lambda: LRUCache(ttl=60), lambda: RedisCache(LocalRedis(), ttl=60)])
+def test_stale_fill_is_never_served(backend):
+    """Тест что ответ, прочитанный до записи и положенный после неё, не отдаётся"""
+    cache = NoteCache(backend())
+    key = cache.note_key(1)             # читатель взял ключ и пошёл в базу
+    cache.invalidate_notes([1])         # тем временем заметку изменили
+    cache.set(key, 'old')               # читатель кладёт устаревший ответ
+    assert cache.get(cache.note_key(1)) is None
+
+    list_key = cache.list_key('/notes?')
+    cache.set(list_key, 'page')
+    assert cache.get(cache.list_key('/notes?')) == 'page'
+    cache.invalidate_notes([2])         # любая запись сбрасывает страницы
+    assert cache.get(cache.list_key('/notes?')) is None
+
+
+@pytest.mark.parametrize('backend', ['memory', 'redis'])
+def test_api_responses_are_cached_and_invalidated(client, monkeypatch, backend):
+    """Тест кэша GET /notes и GET /notes/<id> и сброса при записи"""
+    import app
+    store = LRUCache(ttl=60) if backend == 'memory' else RedisCache(LocalRedis(), ttl=60)
+    monkeypatch.setattr(app, 'note_cache', NoteCache(store))
+
+    note = client.post('/notes', json={'title': 'Cached'}).get_json()
+    first = client.get(f"/notes/{note['id']}")
+    second = client.get(f"/notes/{note['id']}")
+    assert second.get_json() == first.get_json()
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert client.get(f"/notes/{note['id']}", headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    assert store.stats()['hits'] == 2
+
+    client.patch(f"/notes/{note['id']}", json={'title': 'Renamed'})
+    assert client.get(f"/notes/{note['id']}").get_json()['title'] == 'Renamed'
+
+    assert [n['title'] for n in client.get('/notes').get_json()['notes']] == ['Renamed']
+    hits = store.stats()['hits']
+    client.get('/notes')
+    assert store.stats()['hits'] == hits + 1
+
+    client.patch(f"/notes/{note['id']}/status", json={'status': 'doing'})
+    assert client.get('/notes').get_json()['notes'][0]['status'] == 'doing'
+    assert client.get('/notes/summary').get_json()['counts']['doing'] == 1
+
+    client.delete(f"/notes/{note['id']}")
+    assert client.get('/notes').get_json()['notes'] == []
+    assert client.get('/notes/summary').get_json()['total'] == 0
+    assert client.get(f"/notes/{note['id']}").status_code == 404
+
+
+def test_write_through_another_worker_is_not_served_stale(client, monkeypatch):
+    """Запись через другой воркер не сбрасывает наш кэш в памяти — выручает ревизия доски"""
+    import app
+    monkeypatch.setattr(app, 'note_cache', NoteCache(LRUCache(ttl=60)))
+
+    note = client.post('/notes', json={'title': 'Before'}).get_json()
+    cached = client.get(f"/notes/{note['id']}")
+    client.get('/notes')
+    client.get('/notes/summary')
+
+    # Другой воркер: пишет в ту же базу, но поколения сбрасывает в своём кэше
+    monkeypatch.setattr(app, 'invalidate_cache', lambda *args, **kwargs: None)
+    client.patch(f"/notes/{note['id']}", json={'title': 'After'})
+    client.patch(f"/notes/{note['id']}/status", json={'status': 'complete'})
+
+    fresh = client.get(f"/notes/{note['id']}")
+    assert fresh.get_json()['title'] == 'After'
+    assert fresh.headers['ETag'] != cached.headers['ETag']
+    assert client.get('/notes').get_json()['notes'][0]['title'] == 'After'
+    assert client.get('/notes/summary').get_json()['counts']['complete'] == 1
@@ -0,0 +1,48 @@
+def test_changes_since_revision(client):
+    """Тест что /notes/changes отдаёт только изменённые заметки и удаления"""
+    kept = client.post('/notes', json={'title': 'Kept'}).get_json()
+    moved = client.post('/notes', json={'title': 'Moved'}).get_json()
+    doomed = client.post('/notes', json={'title': 'Doomed'}).get_json()
+    assert kept['revision'] < moved['revision'] < doomed['revision']
+    assert kept['updated_at'] is not None
+
+    since = client.get('/notes').get_json()['revision']
+    assert since == doomed['revision']
+    assert client.get(f'/notes/changes?since={since}').get_json() == {
+        'notes': [], 'deleted': [], 'revision': since, 'has_more': False
+    }
+
+    client.patch(f"/notes/{moved['id']}/status", json={'status': 'doing'})
+    client.delete(f"/notes/{doomed['id']}")
+    created = client.post('/notes', json={'title': 'New'}).get_json()
+
+    data = client.get(f'/notes/changes?since={since}').get_json()
+    assert [(note['id'], note['status']) for note in data['notes']] == [(moved['id'], 'doing'), (created['id'], 'todo')]
+    assert data['deleted'] == [doomed['id']]
+    assert data['revision'] == created['revision']
+    assert not data['has_more']
+
+    # Ревизия из будущего — база пересоздана, клиенту нужна полная загрузка
+    assert client.get(f"/notes/changes?since={data['revision'] + 100}").get_json()['reset'] is True
+    assert client.get('/notes/changes').status_code == 400
+
+
+def test_changes_pages_keep_batch_revision_whole(client):
+    """Тест что страница не разрывает ревизию пакета"""
+    since = client.get('/notes').get_json()['revision']
+    client.post('/notes', json={'title': 'Single'})
+    client.post('/notes/batch', json={'operations': [{'op': 'create', 'title': f'B{n}'} for n in range(4)]})
+    client.post('/notes', json={'title': 'Last'})
+
+    seen = []
+    pages = 0
+    while True:
+        data = client.get(f'/notes/changes?since={since}&limit=2').get_json()
+        seen.append([note['title'] for note in data['notes']])
+        since = data['revision']
+        pages += 1
+        if not data['has_more']:
+            break
+
+    assert seen == [['Single'], ['B0', 'B1', 'B2', 'B3'], ['Last']]
+    assert pages == 3
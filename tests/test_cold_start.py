@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Бюджет холодного старта воркера: свежий интерпретатор, import app и create_app()
+COLD_START_BUDGET = float(os.environ.get('COLD_START_BUDGET', 3.0))
+
+SCRIPT = '''
+import sys, time
+started = time.perf_counter()
+import app
+app.create_app()
+elapsed = time.perf_counter() - started
+import db
+print(elapsed, db._pool is None, 'alembic' in sys.modules)
+'''
+
+
+def test_cold_start_does_not_touch_database(tmp_path):
+    """Импорт не подключается к базе: недоступный Postgres не задерживает старт"""
+    env = {
+        **os.environ,
+        # Немаршрутизируемый адрес: любое подключение висело бы DB_CONNECT_TIMEOUT
+        'DATABASE_URL': 'postgresql://nobody@10.255.255.1:5432/notes_app',
+        'DB_CONNECT_TIMEOUT': '10',
+        'LOG_FILE': str(tmp_path / 'app.log'),
+        'LOG_STDOUT': 'off',
+    }
+    result = subprocess.run([sys.executable, '-c', SCRIPT], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    elapsed, no_pool, alembic_loaded = result.stdout.split()[-3:]
+    assert no_pool == 'True'
+    assert alembic_loaded == 'False'
+    assert float(elapsed) < COLD_START_BUDGET
+
+
+def test_cli_commands(client):
+    """Схема — явной командой; flask db подгружает Flask-Migrate по требованию"""
+    from app import app
+
+    runner = app.test_cli_runner()
+    assert runner.invoke(args=['init-db']).exit_code == 0
+    result = runner.invoke(args=['db', '--help'])
+    assert result.exit_code == 0
+    assert 'upgrade' in result.output
+    assert 'migrate' in app.extensions
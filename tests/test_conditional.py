@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta, timezone
+
+
+def test_notes_etag_and_304(client):
+    """Тест ETag и ответа 304 для списка заметок"""
+    first = client.get('/notes')
+    etag = first.headers['ETag']
+    assert first.status_code == 200
+    assert 'no-cache' in first.headers['Cache-Control']
+
+    cached = client.get('/notes', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+
+    # Другие параметры — другой вариант ответа
+    other = client.get('/notes?status=doing')
+    assert other.headers['ETag'] != etag
+
+    client.post('/notes', json={'title': 'New'})
+    changed = client.get('/notes', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert len(changed.get_json()['notes']) == 1
+
+
+def test_if_modified_since(client):
+    """Тест If-Modified-Since по времени последнего изменения доски"""
+    client.post('/notes', json={'title': 'New'})
+    response = client.get('/notes')
+    last_modified = response.headers['Last-Modified']
+
+    assert client.get('/notes', headers={'If-Modified-Since': last_modified}).status_code == 304
+
+    past = (datetime.now(timezone.utc) - timedelta(days=1)).strftime('%a, %d %b %Y %H:%M:%S GMT')
+    assert client.get('/notes', headers={'If-Modified-Since': past}).status_code == 200
+
+
+def test_single_note_conditional(client):
+    """Тест GET /notes/<id> с ETag"""
+    note = client.post('/notes', json={'title': 'One'}).get_json()
+
+    response = client.get(f"/notes/{note['id']}")
+    assert response.get_json()['title'] == 'One'
+    etag = response.headers['ETag']
+    assert client.get(f"/notes/{note['id']}", headers={'If-None-Match': etag}).status_code == 304
+
+    client.patch(f"/notes/{note['id']}", json={'title': 'Two'})
+    response = client.get(f"/notes/{note['id']}", headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['title'] == 'Two'
+
+    client.delete(f"/notes/{note['id']}")
+    assert client.get(f"/notes/{note['id']}").status_code == 404
@@ -0,0 +1,134 @@
+import sys
+import os
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import ConnectionPool, PoolTimeout, SQLiteCursor
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, params=None):
+        if self.conn.broken:
+            raise RuntimeError('connection lost')
+
+    def fetchone(self):
+        return (1,)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.broken = False
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        if self.broken:
+            raise RuntimeError('connection lost')
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def factory():
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    options = {'minconn': 0, 'maxconn': 2, 'timeout': 0.2}
+    options.update(kwargs)
+    return ConnectionPool(factory, dialect='sqlite', **options), created
+
+
+def test_connection_is_reused():
+    """Тест что close() возвращает соединение в пул"""
+    pool, created = make_pool()
+    conn = pool.acquire()
+    conn.close()
+    conn = pool.acquire()
+    conn.close()
+
+    assert len(created) == 1
+    stats = pool.stats()
+    assert stats['checkouts'] == 2
+    assert stats['in_use'] == 0
+    assert stats['idle'] == 1
+
+
+def test_pool_timeout_when_exhausted():
+    """Тест ожидания и таймаута при исчерпании пула"""
+    pool, _ = make_pool(maxconn=1)
+    conn = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire(timeout=0.05)
+    assert pool.stats()['timeouts'] == 1
+
+    # Освобождение соединения будит ожидающий поток
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(pool.acquire(timeout=2)))
+    waiter.start()
+    conn.close()
+    waiter.join()
+    assert result and pool.stats()['in_use'] == 1
+
+
+def test_broken_connection_is_replaced():
+    """Тест что сломанное соединение не возвращается в пул"""
+    pool, created = make_pool(ping_after=0)
+    conn = pool.acquire()
+    created[0].broken = True
+    conn.close()
+
+    conn = pool.acquire()
+    assert len(created) == 2
+    assert created[0].closed
+    assert pool.stats()['discarded'] == 1
+    conn.close()
+
+
+def test_stale_connection_is_recycled():
+    """Тест переоткрытия соединений старше recycle"""
+    pool, created = make_pool(recycle=0.01)
+    pool.acquire().close()
+    import time
+    time.sleep(0.02)
+    pool.acquire().close()
+    assert len(created) == 2
+    assert created[0].closed
+
+
+def test_sqlite_placeholders():
+    """Тест перевода плейсхолдеров psycopg2 в стиль SQLite"""
+    assert SQLiteCursor._translate('SELECT * FROM notes WHERE id = %s') == 'SELECT * FROM notes WHERE id = ?'
+    assert SQLiteCursor._translate("SELECT '100%%'") == "SELECT '100%'"
+
+
+def test_handler_error_releases_connection(client, monkeypatch):
+    """Ошибка в обработчике: соединение вернулось в пул ещё до обработки ошибки"""
+    import app
+    from db import get_pool
+
+    note = client.post('/notes', json={'title': 'Pool'}).get_json()
+    in_use = []
+    monkeypatch.setattr(app, 'note_to_dict', lambda row: 1 / 0)
+    monkeypatch.setattr(app, 'log_action', lambda *args, **kwargs: in_use.append(get_pool().stats()['in_use']))
+
+    assert client.patch(f"/notes/{note['id']}", json={'title': 'x'}).status_code == 500
+    assert client.get('/notes').status_code == 500
+    assert in_use and set(in_use) == {0}
@@ -0,0 +1,87 @@
+import json
+
+from events import Broadcaster, notify_timestamp
+
+
+def read_event(chunks):
+    """Следующий кадр SSE, пропуская служебные ping"""
+    for chunk in chunks:
+        text = chunk.decode('utf-8')
+        if text.startswith('event:'):
+            name, data = text.strip().split('\n')
+            return name[len('event: '):], json.loads(data[len('data: '):])
+    raise AssertionError('stream ended')
+
+
+def test_broadcaster_resync_on_overflow():
+    """Тест что отставший подписчик получает resync вместо потерянных событий"""
+    broadcaster = Broadcaster(max_queue=2)
+    slow = broadcaster.subscribe()
+    fast = broadcaster.subscribe()
+
+    broadcaster.publish({'type': 'create', 'id': 1})
+    assert fast.get(timeout=1) == {'type': 'create', 'id': 1}
+    for n in range(2, 5):
+        broadcaster.publish({'type': 'create', 'id': n})
+
+    assert slow.get(timeout=1) == {'type': 'resync'}
+    assert slow.get(timeout=0.01) is None
+    broadcaster.unsubscribe(slow)
+    assert broadcaster.stats()['subscribers'] == 1
+
+
+def test_notify_timestamp_short_fraction():
+    """Дробь микросекунд без хвостовых нулей (как отдаёт to_jsonb) разбирается"""
+    assert notify_timestamp('2026-10-18T07:15:19.34159') == '2026-10-18T07:15:19.341590'
+    assert notify_timestamp('2026-10-18T07:15:19.3') == '2026-10-18T07:15:19.300000'
+    assert notify_timestamp('2026-10-18T07:15:19') == '2026-10-18T07:15:19'
+    assert notify_timestamp('2026-10-18T07:15:19.341597+00:00') == '2026-10-18T07:15:19.341597+00:00'
+
+
+def test_stream_pushes_note_deltas(client, monkeypatch):
+    """Тест что /notes/stream отдаёт create, move, update и delete по одной заметке"""
+    import app as app_module
+    monkeypatch.setattr(app_module, 'EVENTS_HEARTBEAT', 0.2)
+
+    response = client.get('/notes/stream')
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    assert next(chunks) == b'retry: 3000\n\n'  # подписка оформлена
+
+    note = client.post('/notes', json={'title': 'Live'}).get_json()
+    assert read_event(chunks) == ('note', {'type': 'create', 'id': note['id'], 'note': note})
+
+    client.patch(f"/notes/{note['id']}/status", json={'status': 'doing'})
+    name, event = read_event(chunks)
+    assert (event['type'], event['note']['status']) == ('move', 'doing')
+
+    client.patch(f"/notes/{note['id']}", json={'title': 'Renamed'})
+    name, event = read_event(chunks)
+    assert (event['type'], event['note']['title']) == ('update', 'Renamed')
+
+    client.delete(f"/notes/{note['id']}")
+    assert read_event(chunks) == ('note', {'type': 'delete', 'id': note['id']})
+
+    response.close()
+    assert app_module.note_events.stats()['subscribers'] == 0
+
+
+def test_stream_rejects_subscribers_over_limit(client, monkeypatch):
+    """Сверх EVENTS_MAX_SUBSCRIBERS /notes/stream отвечает 503 и не занимает поток"""
+    import app as app_module
+    broadcaster = app_module.note_events.broadcaster
+    monkeypatch.setattr(broadcaster, 'max_subscribers', 1)
+
+    first = client.get('/notes/stream')
+    assert first.status_code == 200
+    rejected = client.get('/notes/stream')
+    assert rejected.status_code == 503
+    assert rejected.headers['Retry-After'] == str(app_module.EVENTS_RETRY_AFTER)
+    assert app_module.note_events.stats()['rejected'] >= 1
+
+    # Поток закрыли, не прочитав ни кадра, — место освободилось
+    first.close()
+    assert app_module.note_events.stats()['subscribers'] == 0
+    second = client.get('/notes/stream')
+    assert second.status_code == 200
+    second.close()
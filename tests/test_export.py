@@ -0,0 +1,30 @@
+import json
+
+
+def test_export_ndjson(client, monkeypatch):
+    """Тест потоковой выгрузки в NDJSON"""
+    import app
+    # Маленькие куски, чтобы ответ точно пришёл в несколько приёмов
+    monkeypatch.setattr(app, 'STREAM_CHUNK_BYTES', 64)
+    for n in range(5):
+        client.post('/notes', json={'title': f'Note {n}', 'status': 'doing' if n % 2 else 'todo'})
+
+    response = client.get('/notes/export')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [note['title'] for note in lines] == [f'Note {n}' for n in reversed(range(5))]
+
+    response = client.get('/notes/export?status=doing')
+    assert len(response.get_data(as_text=True).splitlines()) == 2
+
+
+def test_stream_mode_returns_json_array(client):
+    """Тест режима ?stream=1 у GET /notes"""
+    assert client.get('/notes?stream=1').get_json() == []
+
+    client.post('/notes', json={'title': 'Only note'})
+    data = client.get('/notes?stream=1').get_json()
+    assert [note['title'] for note in data] == ['Only note']
+
+    assert client.get('/notes/export?format=xml').status_code == 400
@@ -0,0 +1,34 @@
+import json
+from datetime import datetime
+
+import pytest
+
+import fastjson
+from models import NOTE_FIELDS, note_row
+
+ROW = (1, 'Заметка', 'c', 'todo', datetime(2026, 10, 18, 12, 0, 0, 123456), None, 3)
+
+BACKENDS = ['json'] + (['orjson'] if fastjson.orjson is not None else [])
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_row_encodes_like_isoformat_dict(backend):
+    """Строка курсора без .isoformat() даёт тот же JSON, что и готовый словарь"""
+    encoded = fastjson.dumps({'notes': [note_row(ROW)]}, backend=backend)
+    assert json.loads(encoded) == {'notes': [{**note_row(ROW), 'created_at': ROW[4].isoformat()}]}
+    assert '"2026-10-18T12:00:00.123456"' in encoded
+    assert 'Заметка' in encoded
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_provider_backends_agree(client, backend, monkeypatch):
+    from app import app
+    monkeypatch.setattr(app.json, 'backend', backend)
+    created = client.post('/notes', json={'title': 'a', 'created_at': '2026-10-18T12:00:00'}).get_json()
+    assert created['created_at'] == '2026-10-18T12:00:00'
+    assert set(created) == set(NOTE_FIELDS)
+
+    body = client.get('/notes').get_json()
+    assert body['notes'] == [created]
+    # Нестандартные аргументы dumps обрабатывает json
+    assert app.json.dumps({'b': 1, 'a': 2}, indent=4).startswith('{\n    "a"')
@@ -0,0 +1,159 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from audit import insert_log_rows
+from log_maintenance import LogMaintenance, add_months, ensure_partitions, is_partitioned, month_start
+
+NOW = datetime(2026, 10, 18, 15, 30)
+
+
+def make_row(timestamp, action='GET_ALL_NOTES', device='Desktop', browser='Chrome'):
+    return (timestamp, '127.0.0.1', action, None, device, browser, None, 'test', 'GET')
+
+
+@pytest.fixture
+def journal(client):
+    """Пустые logs и log_stats"""
+    from app import audit_writer, get_db_connection
+    audit_writer.flush()
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute('DELETE FROM logs')
+    cur.execute('DELETE FROM log_stats')
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def insert_rows(conn, rows):
+    cur = conn.cursor()
+    insert_log_rows(cur, conn.dialect, rows)
+    conn.commit()
+
+
+def read_stats(conn):
+    cur = conn.cursor()
+    cur.execute('SELECT hour, action, device, browser, count FROM log_stats ORDER BY hour, action')
+    return [(row[0].isoformat() if hasattr(row[0], 'isoformat') else row[0], *row[1:])
+            for row in cur.fetchall()]
+
+
+def test_month_arithmetic():
+    assert add_months(datetime(2026, 12, 5), 1) == datetime(2027, 1, 1)
+    assert add_months(datetime(2026, 1, 31), -1) == datetime(2025, 12, 1)
+    assert month_start(NOW) == datetime(2026, 10, 1)
+
+
+def test_rollup_counts_by_hour(journal):
+    """Сводка по часам; повторный проход пересчитывает последний час, а не удваивает"""
+    from app import log_maintenance
+    insert_rows(journal, [
+        make_row(NOW.replace(hour=13, minute=5)),
+        make_row(NOW.replace(hour=13, minute=55)),
+        make_row(NOW.replace(hour=14, minute=1), action='DELETE_NOTE', device=None),
+        make_row(NOW.replace(minute=10)),
+    ])
+    log_maintenance.run_once(now=NOW)
+    assert read_stats(journal) == [
+        ('2026-10-18T13:00:00', 'GET_ALL_NOTES', 'Desktop', 'Chrome', 2),
+        ('2026-10-18T14:00:00', 'DELETE_NOTE', '', 'Chrome', 1),
+        ('2026-10-18T15:00:00', 'GET_ALL_NOTES', 'Desktop', 'Chrome', 1),
+    ]
+
+    insert_rows(journal, [make_row(NOW.replace(minute=20))])
+    log_maintenance.run_once(now=NOW)
+    assert read_stats(journal)[-1][-1] == 2
+    assert len(read_stats(journal)) == 3
+
+
+def test_rollup_recounts_late_rows(journal):
+    """Строка прошлого часа, дописанная после прохода, попадает в сводку"""
+    from app import log_maintenance
+    insert_rows(journal, [make_row(NOW.replace(hour=14, minute=10)), make_row(NOW.replace(minute=10))])
+    log_maintenance.run_once(now=NOW)
+
+    insert_rows(journal, [make_row(NOW.replace(hour=14, minute=50))])
+    log_maintenance.run_once(now=NOW)
+    assert read_stats(journal) == [
+        ('2026-10-18T14:00:00', 'GET_ALL_NOTES', 'Desktop', 'Chrome', 2),
+        ('2026-10-18T15:00:00', 'GET_ALL_NOTES', 'Desktop', 'Chrome', 1),
+    ]
+
+
+def test_retention_removes_old_rows(journal):
+    from app import get_db_connection, log_maintenance
+    insert_rows(journal, [
+        make_row(NOW - timedelta(days=400)),
+        make_row(NOW - timedelta(days=10)),
+    ])
+    log_maintenance.run_once(now=NOW)
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute('SELECT COUNT(*) FROM logs')
+    assert cur.fetchone()[0] == 1
+    conn.close()
+
+
+def test_log_stats_endpoint(journal, client):
+    from app import log_maintenance
+    insert_rows(journal, [make_row(NOW), make_row(NOW), make_row(NOW, action='CREATE_NOTE')])
+    log_maintenance.run_once(now=NOW)
+
+    response = client.get('/logs/stats', query_string={'password': 'admin123'})
+    assert response.status_code == 200
+    assert response.get_json()['stats'] == [
+        {'action': 'GET_ALL_NOTES', 'count': 2},
+        {'action': 'CREATE_NOTE', 'count': 1},
+    ]
+
+    response = client.get('/logs/stats', query_string={'password': 'admin123', 'group': 'hour'})
+    assert response.get_json()['stats'] == [{'hour': '2026-10-18T15:00:00', 'count': 3}]
+
+    assert client.get('/logs/stats').status_code == 401
+    assert client.get('/logs/stats', query_string={'password': 'admin123', 'group': 'ip'}).status_code == 400
+
+
+def test_future_partitions_are_created(journal):
+    """Postgres после миграции 0008: строки попадают в раздел своего месяца"""
+    if journal.dialect != 'postgres':
+        pytest.skip('секционирование есть только в Postgres')
+    cur = journal.cursor()
+    if not is_partitioned(cur):
+        pytest.skip('миграция 0008 не применена')
+    future = datetime(2031, 1, 15)
+    try:
+        assert ensure_partitions(cur, future, 1) == ['logs_2031_01', 'logs_2031_02']
+        assert ensure_partitions(cur, future, 1) == []
+        cur.execute("INSERT INTO logs (timestamp, action) VALUES (%s, 'X') RETURNING tableoid::regclass::text",
+                    (future,))
+        assert cur.fetchone()[0] == 'logs_2031_01'
+    finally:
+        journal.rollback()
+
+
+def test_missed_month_moves_rows_from_default(journal):
+    """Проход пропустил начало месяца: строки из logs_default переезжают в новый раздел"""
+    from app import get_db_connection
+    if journal.dialect != 'postgres':
+        pytest.skip('секционирование есть только в Postgres')
+    cur = journal.cursor()
+    if not is_partitioned(cur):
+        pytest.skip('миграция 0008 не применена')
+
+    month = datetime(2032, 3, 10)
+    insert_rows(journal, [make_row(month), make_row(month + timedelta(days=5))])
+    # Долгий срок хранения: проход не трогает разделы других тестов
+    maintenance = LogMaintenance(get_db_connection, retention_months=1200, months_ahead=0)
+    try:
+        result = maintenance.run_once(now=month)
+        assert result['created'] == ['logs_2032_03']
+        cur.execute('SELECT tableoid::regclass::text, COUNT(*) FROM logs WHERE timestamp >= %s GROUP BY 1',
+                    (month_start(month),))
+        assert cur.fetchall() == [('logs_2032_03', 2)]
+        cur.execute("SELECT COUNT(*) FROM pg_inherits WHERE inhrelid = 'logs_default'::regclass")
+        assert cur.fetchone()[0] == 1
+    finally:
+        journal.rollback()
+        cur.execute('DROP TABLE IF EXISTS logs_2032_03')
+        journal.commit()
@@ -0,0 +1,89 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from audit import insert_log_rows, tail_lines
+
+START = datetime(2026, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def logs(client):
+    """Таблица logs с 30 записями: каждая третья — DELETE_NOTE с note_id"""
+    from app import audit_writer, get_db_connection
+    audit_writer.flush()
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute('DELETE FROM logs')
+    rows = []
+    for n in range(30):
+        action = 'DELETE_NOTE' if n % 3 == 0 else 'GET_ALL_NOTES'
+        rows.append((START + timedelta(minutes=n), f'10.0.0.{n % 2}', action,
+                     n if action == 'DELETE_NOTE' else None, 'Desktop', 'Chrome',
+                     json.dumps({'n': n}), 'test', 'GET'))
+    insert_log_rows(cur, conn.dialect, rows)
+    conn.commit()
+    conn.close()
+    return client
+
+
+def get_logs(client, **params):
+    response = client.get('/logs', query_string={'password': 'admin123', **params})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+def test_requires_password(client):
+    assert client.get('/logs').status_code == 401
+
+
+def test_keyset_pages_cover_all_rows(logs):
+    """Страницы по курсору без пропусков и повторов, новые сверху"""
+    seen = []
+    cursor = None
+    while True:
+        params = {'limit': 7}
+        if cursor:
+            params['cursor'] = cursor
+        page = get_logs(logs, **params)
+        seen.extend(entry['details']['n'] for entry in page['logs'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert seen == list(range(29, -1, -1))
+
+
+def test_filters(logs):
+    page = get_logs(logs, action='DELETE_NOTE')
+    assert [entry['note_id'] for entry in page['logs']] == list(range(27, -1, -3))
+
+    page = get_logs(logs, note_id=9)
+    assert [entry['details'] for entry in page['logs']] == [{'n': 9}]
+
+    page = get_logs(logs, ip='10.0.0.1', since=(START + timedelta(minutes=10)).isoformat(),
+                    until=(START + timedelta(minutes=15)).isoformat())
+    assert [entry['details']['n'] for entry in page['logs']] == [13, 11]
+    assert page['logs'][0]['timestamp'] == (START + timedelta(minutes=13)).isoformat()
+
+
+def test_invalid_parameters(logs):
+    for params in ({'cursor': 'garbage'}, {'limit': 'x'}, {'note_id': 'x'}, {'since': 'yesterday'}):
+        response = logs.get('/logs', query_string={'password': 'admin123', **params})
+        assert response.status_code == 400
+
+
+def test_tail_lines(tmp_path):
+    """Хвост файла читается блоками с конца, в том числе через границы блоков"""
+    path = tmp_path / 'app.log'
+    path.write_text(''.join(f'line {n}\n' for n in range(1000)), encoding='utf-8')
+    assert tail_lines(path, 3, block_size=16) == ['line 997\n', 'line 998\n', 'line 999\n']
+    assert len(tail_lines(path, 5000, block_size=64)) == 1000
+    assert tail_lines(path, 0) == []
+
+
+def test_file_source(client):
+    response = client.get('/logs', query_string={'password': 'admin123', 'source': 'file', 'lines': 5})
+    assert response.status_code == 200
+    assert response.get_json()['source'] == 'file'
+    assert len(response.get_json()['logs']) <= 5
@@ -0,0 +1,79 @@
+import re
+
+from metrics import Counter, Histogram, Registry, db_queries, http_requests, request_db_queries
+
+
+def sample(text, name, **labels):
+    """Значение строки name{labels} из вывода /metrics"""
+    for line in text.splitlines():
+        if line.startswith('#'):
+            continue
+        match = re.match(r'([a-z_]+)(\{(.*)\})? (\S+)$', line)
+        if not match or match.group(1) != name:
+            continue
+        found = dict(re.findall(r'(\w+)="([^"]*)"', match.group(3) or ''))
+        if all(found.get(key) == str(value) for key, value in labels.items()):
+            return float(match.group(4))
+    return None
+
+
+def test_histogram_exposition():
+    """Корзины накопительные, есть +Inf, _sum и _count"""
+    registry = Registry()
+    histogram = registry.histogram('latency_seconds', 'Latency.', ('endpoint',), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, 'a')
+    text = registry.render()
+
+    assert '# TYPE latency_seconds histogram' in text
+    assert sample(text, 'latency_seconds_bucket', endpoint='a', le='0.1') == 1
+    assert sample(text, 'latency_seconds_bucket', endpoint='a', le='1') == 2
+    assert sample(text, 'latency_seconds_bucket', endpoint='a', le='+Inf') == 3
+    assert sample(text, 'latency_seconds_sum', endpoint='a') == 5.55
+    assert sample(text, 'latency_seconds_count', endpoint='a') == 3
+
+
+def test_label_values_are_escaped():
+    counter = Counter('errors_total', 'Errors.', ('endpoint',))
+    counter.inc('a"b\\c')
+    assert 'errors_total{endpoint="a\\"b\\\\c"} 1' in counter.render()
+
+
+def test_failing_collector_does_not_break_scrape():
+    """Ошибка одного сборщика не ломает остальной вывод"""
+    registry = Registry()
+    registry.counter('ok_total', 'Ok.').inc()
+
+    @registry.collector
+    def broken():
+        raise RuntimeError('boom')
+
+    assert 'ok_total 1' in registry.render()
+
+
+def test_request_and_db_metrics(client):
+    """Запрос считается по endpoint и статусу вместе с его запросами к базе"""
+    before = http_requests.value('create_note', 'POST', '201')
+    observed = request_db_queries.count('create_note')
+    queries = db_queries.value('create_note')
+
+    response = client.post('/notes', json={'title': 'Метрики'})
+    assert response.status_code == 201
+
+    assert http_requests.value('create_note', 'POST', '201') == before + 1
+    assert request_db_queries.count('create_note') == observed + 1
+    assert db_queries.value('create_note') > queries
+
+
+def test_metrics_endpoint(client):
+    client.get('/notes/999999')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+
+    assert sample(text, 'http_requests_total', endpoint='get_note', method='GET', status='404') >= 1
+    assert sample(text, 'http_request_duration_seconds_count', endpoint='get_note', status='404') >= 1
+    assert sample(text, 'audit_queue_depth') is not None
+    assert sample(text, 'audit_records_total', result='failed') is not None
+    assert sample(text, 'db_pool_connections', state='in_use') is not None
@@ -0,0 +1,64 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Схема из миграций (DATETIME в SQLite), а не из init_db (TIMESTAMP), как у остальных тестов
+SCRIPT = '''
+import json
+import app
+
+client = app.app.test_client()
+for n in range(4):
+    client.post('/notes', json={'title': f'note {n}'})
+first = client.get('/notes?limit=1')
+pages = [first.get_json()]
+while pages[-1]['next_cursor']:
+    pages.append(client.get(f"/notes?limit=1&cursor={pages[-1]['next_cursor']}").get_json())
+
+app.audit_writer.flush()
+logs = client.get('/logs?password=admin123&limit=2')
+log_page = logs.get_json()
+next_logs = client.get(f"/logs?password=admin123&limit=2&cursor={log_page['next_cursor']}")
+print(json.dumps({
+    'status': first.status_code,
+    'titles': [note['title'] for page in pages for note in page['notes']],
+    'created_at': pages[0]['notes'][0]['created_at'],
+    'latest': client.get('/notes/summary').get_json()['latest_created_at'],
+    'logs_status': [logs.status_code, next_logs.status_code],
+    'log_timestamp': log_page['logs'][0]['timestamp'],
+    'log_actions': [entry['action'] for entry in log_page['logs'] + next_logs.get_json()['logs']],
+}))
+'''
+
+
+def run(args, env):
+    result = subprocess.run([sys.executable, *args], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def test_sqlite_schema_from_migrations(tmp_path):
+    """flask db upgrade на SQLite: даты колонок DATETIME (notes, logs) читаются как datetime"""
+    env = {
+        **os.environ,
+        'DATABASE_URL': f"sqlite:///{tmp_path / 'notes.db'}",
+        'LOG_FILE': str(tmp_path / 'app.log'),
+        'LOG_STDOUT': 'off',
+        'PYTHONPATH': ROOT,
+    }
+    run(['-m', 'flask', '--app', 'app', 'db', 'upgrade'], env)
+    result = json.loads(run(['-c', SCRIPT], env).splitlines()[-1])
+
+    assert result['status'] == 200
+    assert result['titles'] == [f'note {n}' for n in (3, 2, 1, 0)]
+    # Тот же ISO-формат, что и у сводки
+    assert 'T' in result['created_at'] and result['created_at'] == result['latest']
+
+    assert result['logs_status'] == [200, 200]
+    assert 'T' in result['log_timestamp']
+    # Вторая страница журнала продолжает первую по курсору из timestamp
+    assert result['log_actions'] == ['GET_ALL_NOTES'] * 4
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+import json
+
+from models import NOTE_FIELDS, Note, note_row
+
+
+def test_fast_path_matches_schema():
+    """Ответ без Marshmallow совпадает с тем, что отдала бы NoteSchema"""
+    from app import app
+    from schemas import note_schema
+    note = Note(id=1, title='t', content='c', status='doing',
+                created_at=datetime(2026, 10, 18, 12, 0), updated_at=None, revision=7)
+    row = tuple(getattr(note, name) for name in NOTE_FIELDS)
+    assert json.loads(app.json.dumps(note_row(row))) == note_schema.dump(note) == note.to_dict()
+    # Лишняя колонка в конце строки (старый статус из RETURNING) не попадает в ответ
+    assert note_row(row + ('todo',)) == note_row(row)
+
+
+def test_queries_compiled_once():
+    import queries
+    before = queries.stats()
+    first = queries.notes_page('sqlite', 2, True, True)
+    assert queries.notes_page('sqlite', 2, True, True) is first
+    assert queries.stats()['hits'] > before['hits']
+
+    sql, params = first(status_0='todo', status_1='doing', after_created_at='x', after_id=5, limit=10)
+    assert sql.count('%s') == len(params)
+    assert params[:5] == ['todo', 'doing', 'x', 5, 10]
+
+
+def test_db_stats_reports_compiled_queries(client):
+    client.post('/notes', json={'title': 'n'})
+    client.get('/notes')
+    stats = client.get('/db/stats').get_json()['compiled_queries']
+    assert stats['size'] >= 2 and stats['hits'] >= 0
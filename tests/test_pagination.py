@@ -0,0 +1,61 @@
+import pytest
+
+
+def create_notes(client, count, status='todo'):
+    ids = []
+    for n in range(count):
+        response = client.post('/notes', json={
+            'title': f'Note {n}',
+            'status': status,
+            'created_at': f'2025-01-01T10:00:{n:02d}Z'
+        })
+        assert response.status_code == 201
+        ids.append(response.get_json()['id'])
+    return ids
+
+
+def test_keyset_pages_cover_all_notes(client):
+    """Тест что курсоры проходят все заметки без повторов, новые сверху"""
+    ids = create_notes(client, 7)
+
+    seen = []
+    cursor = None
+    while True:
+        url = '/notes?limit=3' + (f'&cursor={cursor}' if cursor else '')
+        data = client.get(url).get_json()
+        assert len(data['notes']) <= 3
+        seen.extend(note['id'] for note in data['notes'])
+        cursor = data['next_cursor']
+        if not cursor:
+            break
+
+    assert seen == list(reversed(ids))
+
+
+def test_status_filter(client):
+    """Тест фильтра по статусу"""
+    create_notes(client, 2, status='todo')
+    doing = create_notes(client, 3, status='doing')
+
+    data = client.get('/notes?status=doing').get_json()
+    assert [note['id'] for note in data['notes']] == list(reversed(doing))
+    assert data['next_cursor'] is None
+
+
+def test_page_size_is_capped(client, monkeypatch):
+    """Тест серверного ограничения размера страницы"""
+    import app
+    monkeypatch.setattr(app, 'MAX_PAGE_SIZE', 2)
+    create_notes(client, 3)
+
+    data = client.get('/notes?per_page=1000').get_json()
+    assert data['limit'] == 2
+    assert len(data['notes']) == 2
+    assert data['next_cursor']
+
+
+@pytest.mark.parametrize('query', ['cursor=garbage', 'limit=0', 'limit=abc'])
+def test_invalid_page_params(client, query):
+    """Тест ошибок в параметрах страницы"""
+    response = client.get(f'/notes?{query}')
+    assert response.status_code == 400
@@ -0,0 +1,93 @@
+import json
+import os
+
+import pytest
+
+from profiling import RequestProfile, one_line
+
+
+@pytest.fixture
+def profiled(client, tmp_path, monkeypatch):
+    """Профилировщик по заголовку; профили пишутся в tmp_path"""
+    from app import profiler
+    monkeypatch.setattr(profiler, 'token', 'secret')
+    monkeypatch.setattr(profiler, 'use_cprofile', True)
+    monkeypatch.setattr(profiler, 'slow_ms', 0)
+    monkeypatch.setattr(profiler, 'directory', str(tmp_path))
+    monkeypatch.setattr(profiler, 'keep', 2)
+    monkeypatch.setattr(profiler, '_profiled', 0)
+    monkeypatch.setattr(profiler, '_dumped', 0)
+    return profiler
+
+
+def test_request_without_header_is_not_profiled(client, profiled):
+    response = client.get('/notes')
+    assert 'Server-Timing' not in response.headers
+    assert profiled.stats()['profiled'] == 0
+
+
+def test_wrong_token_is_ignored(client, profiled):
+    response = client.get('/notes', headers={'X-Profile': 'guess'})
+    assert 'Server-Timing' not in response.headers
+
+
+def test_spans_and_dump(client, profiled, tmp_path):
+    """Интервалы соединения, запросов, сериализации и журнала; профиль сохранён"""
+    client.post('/notes', json={'title': 'Профиль'})
+    response = client.get('/notes', headers={'X-Profile': 'secret'})
+    assert response.status_code == 200
+
+    timing = response.headers['Server-Timing']
+    for name in ('get_db_connection', 'execute', 'jsonify', 'log_action', 'total'):
+        assert name in timing
+
+    name = response.headers['X-Profile-Id']
+    assert os.path.exists(tmp_path / f'{name}.prof')
+    with open(tmp_path / f'{name}.json', encoding='utf-8') as f:
+        data = json.load(f)
+    assert data['endpoint'] == 'get_notes'
+    assert data['summary']['execute']['count'] >= 1
+    assert any(span['detail'] and 'notes' in span['detail'] for span in data['spans'])
+
+
+def test_old_profiles_are_pruned(client, profiled, tmp_path):
+    for _ in range(4):
+        client.get('/notes/summary', headers={'X-Profile': 'secret'})
+    assert len(list(tmp_path.glob('*.json'))) == 2
+    assert profiled.stats()['dumped'] == 4
+
+
+def test_failed_request_stops_profiler(client, profiled, tmp_path, monkeypatch):
+    """Необработанное исключение: after_request не выполнился, но cProfile выключен"""
+    import sys
+    from app import app
+
+    def broken():
+        raise RuntimeError('broken view')
+
+    monkeypatch.setitem(app.view_functions, 'get_db_stats', broken)
+    monkeypatch.setitem(app.config, 'PROPAGATE_EXCEPTIONS', True)
+    with pytest.raises(RuntimeError):
+        client.get('/db/stats', headers={'X-Profile': 'secret'})
+
+    assert sys.getprofile() is None
+    assert profiled.stats()['profiled'] == 1
+    with open(next(tmp_path.glob('*.json')), encoding='utf-8') as f:
+        assert json.load(f)['status'] == 500
+
+
+def test_disabled_profiler_skips_requests(client):
+    from app import profiler
+    assert not profiler.enabled
+    response = client.get('/notes', headers={'X-Profile': ''})
+    assert 'Server-Timing' not in response.headers
+
+
+def test_profile_summary():
+    profile = RequestProfile()
+    profile.add('execute', profile.started, 0.002, b'SELECT 1\n  FROM notes')
+    profile.add('execute', profile.started, 0.001)
+    profile.stop()
+    assert profile.summary()['execute'] == {'count': 2, 'total_ms': 3.0}
+    assert profile.to_dict()['spans'][0]['detail'] == 'SELECT 1 FROM notes'
+    assert one_line(None) is None
@@ -0,0 +1,42 @@
+import logging
+
+from flask import g
+
+
+def test_client_info_computed_once_per_request(client):
+    """IP и User-Agent разбираются один раз за запрос и лежат в g"""
+    from app import app, get_client_ip, get_user_agent_info
+
+    headers = {'X-Forwarded-For': '10.0.0.1, 10.0.0.2', 'User-Agent': 'Mozilla/5.0 (iPhone) Mobile Safari'}
+    with app.test_request_context('/notes', headers=headers):
+        assert get_client_ip() == '10.0.0.1'
+        assert g.client_ip == '10.0.0.1'
+        info = get_user_agent_info()
+        assert info == {'device': 'Mobile', 'browser': 'Safari', 'user_agent': headers['User-Agent']}
+        assert get_user_agent_info() is info
+
+    with app.test_request_context('/notes', environ_base={'REMOTE_ADDR': '10.0.0.9'}):
+        assert get_client_ip() == '10.0.0.9'
+
+
+def test_user_agent_parses_are_cached(client):
+    """Повторная строка User-Agent берётся из LRU, счётчики — в /audit/stats"""
+    from app import parse_user_agent
+
+    agent = 'Mozilla/5.0 (X11; Linux x86_64) Firefox/131.0 test-cache'
+    first = parse_user_agent(agent)
+    before = parse_user_agent.cache_info().hits
+    assert parse_user_agent(agent) is first
+    assert parse_user_agent.cache_info().hits == before + 1
+
+    stats = client.get('/audit/stats').get_json()['user_agents']
+    assert stats['size'] >= 1 and stats['max_size'] > 0
+
+
+def test_log_filter_outside_request():
+    """Запись в app.logger вне запроса не падает на фильтре IP"""
+    from app import IPLogFilter
+
+    record = logging.LogRecord('app', logging.INFO, __file__, 1, 'background', None, None)
+    assert IPLogFilter().filter(record)
+    assert record.ip == '-'
@@ -0,0 +1,111 @@
+"""Регрессионный замер: сколько обращений к базе делает каждый эндпоинт.
+
+Считаются execute, commit и rollback открытой транзакции на «сырых»
+соединениях пула. Запуск с таблицей по эндпоинтам:
+    python -m pytest tests/test_roundtrips.py -s
+Для Postgres задайте DATABASE_URL.
+"""
+import pytest
+
+# Ожидаемое число обращений: для Postgres это сетевые round-trip'ы
+EXPECTED = {
+    'postgres': {
+        'create': 2,   # INSERT + ревизия одним запросом, COMMIT
+        'update': 2,
+        'status': 2,
+        'delete': 2,
+    },
+    'sqlite': {
+        'create': 3,   # локально: INSERT, ревизия, COMMIT
+        'update': 3,
+        'status': 4,   # + SELECT старого статуса
+        'delete': 4,   # + след удаления в note_tombstones
+    },
+}
+
+
+class CountingCursor:
+    def __init__(self, cursor, counter):
+        self._cursor = cursor
+        self._counter = counter
+
+    def execute(self, *args, **kwargs):
+        self._counter['count'] += 1
+        return self._cursor.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        self._counter['count'] += 1
+        return self._cursor.executemany(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class CountingConnection:
+    def __init__(self, raw, counter):
+        self._raw = raw
+        self._counter = counter
+
+    def _in_transaction(self):
+        if hasattr(self._raw, 'get_transaction_status'):
+            return self._raw.get_transaction_status() != 0
+        return self._raw.in_transaction
+
+    def cursor(self, *args, **kwargs):
+        return CountingCursor(self._raw.cursor(*args, **kwargs), self._counter)
+
+    def commit(self):
+        self._counter['count'] += 1
+        return self._raw.commit()
+
+    def rollback(self):
+        # Откат без открытой транзакции драйвер на сервер не отправляет
+        if self._in_transaction():
+            self._counter['count'] += 1
+        return self._raw.rollback()
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+@pytest.fixture
+def roundtrips(client, monkeypatch):
+    """Подменяем пул на такой же, но со счётчиком обращений"""
+    import db
+    base = db.get_pool()
+    counter = {'count': 0}
+    pool = db.ConnectionPool(lambda: CountingConnection(base.factory(), counter),
+                             dialect=base.dialect, minconn=0, ping_after=None)
+    monkeypatch.setattr(db, '_pool', pool)
+
+    def measure(call):
+        counter['count'] = 0
+        call()
+        return counter['count']
+
+    yield base.dialect, measure
+    pool.close()
+
+
+def test_write_endpoint_roundtrips(client, roundtrips):
+    """Число обращений к базе у create / update / status / delete"""
+    dialect, measure = roundtrips
+    created = {}
+
+    def create():
+        created.update(client.post('/notes', json={'title': 'Bench'}).get_json())
+
+    measured = {'create': measure(create)}
+    note_id = created['id']
+    measured['update'] = measure(lambda: client.patch(f'/notes/{note_id}', json={'title': 'Renamed'}))
+    measured['status'] = measure(lambda: client.patch(f'/notes/{note_id}/status', json={'status': 'doing'}))
+    measured['delete'] = measure(lambda: client.delete(f'/notes/{note_id}'))
+
+    print(f"\nОбращения к базе ({dialect}):")
+    for endpoint, count in measured.items():
+        print(f"  {endpoint:<8} {count}")
+
+    assert measured == EXPECTED[dialect]
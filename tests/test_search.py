@@ -0,0 +1,47 @@
+def test_search_ranks_and_highlights(client):
+    """Тест поиска: префиксы, ранжирование и подсветка"""
+    client.post('/notes', json={'title': 'Kanban board', 'content': 'Columns for work'})
+    client.post('/notes', json={'title': 'Groceries', 'content': 'Buy milk for the kanban party'})
+    client.post('/notes', json={'title': 'Unrelated', 'content': 'Nothing here'})
+
+    data = client.get('/notes/search?q=kanb').get_json()
+    titles = [item['title'] for item in data['results']]
+    # Совпадение в заголовке весит больше, чем в тексте
+    assert titles == ['Kanban board', 'Groceries']
+    assert data['results'][0]['highlight']['title'] == '<mark>Kanban</mark> board'
+    assert '<mark>kanban</mark>' in data['results'][1]['highlight']['content']
+    assert data['next_offset'] is None
+
+    assert client.get('/notes/search?q=kanban milk').get_json()['results'][0]['title'] == 'Groceries'
+
+
+def test_search_escapes_html_and_paginates(client):
+    """Тест экранирования HTML в подсветке и страниц результатов"""
+    client.post('/notes', json={'title': '<b>alpha</b>', 'content': ''})
+    for n in range(3):
+        client.post('/notes', json={'title': f'alpha {n}'})
+
+    data = client.get('/notes/search?q=alpha&limit=2').get_json()
+    assert len(data['results']) == 2
+    assert data['next_offset'] == 2
+    rest = client.get('/notes/search?q=alpha&limit=2&offset=2').get_json()
+    assert rest['next_offset'] is None
+
+    highlights = [item['highlight']['title'] for item in data['results'] + rest['results']]
+    assert '&lt;b&gt;<mark>alpha</mark>&lt;/b&gt;' in highlights
+
+    # Обновление и удаление поддерживают индекс в актуальном состоянии
+    note_id = data['results'][0]['id']
+    client.patch(f'/notes/{note_id}', json={'title': 'beta'})
+    assert [item['id'] for item in client.get('/notes/search?q=beta').get_json()['results']] == [note_id]
+    client.delete(f'/notes/{note_id}')
+    assert client.get('/notes/search?q=beta').get_json()['results'] == []
+
+    assert client.get('/notes/search?q=').status_code == 400
+
+
+def test_search_rows_match_note_fields(client):
+    """Колонки заметки в результатах поиска идут в порядке NOTE_FIELDS"""
+    note = client.post('/notes', json={'title': 'Fields check', 'content': 'body', 'status': 'doing'}).get_json()
+    result = client.get('/notes/search?q=fields').get_json()['results'][0]
+    assert {name: result[name] for name in note} == note
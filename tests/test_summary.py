@@ -0,0 +1,45 @@
+def test_summary_counts_and_invalidation(client):
+    """Тест сводки по статусам и сброса кэша при изменениях"""
+    data = client.get('/notes/summary').get_json()
+    assert data['counts'] == {'todo': 0, 'doing': 0, 'complete': 0}
+    assert data['latest_created_at'] is None
+
+    first = client.post('/notes', json={'title': 'A', 'created_at': '2025-01-01T10:00:00Z'}).get_json()
+    client.post('/notes', json={'title': 'B', 'status': 'doing', 'created_at': '2025-02-01T10:00:00Z'})
+    data = client.get('/notes/summary').get_json()
+    assert data['counts'] == {'todo': 1, 'doing': 1, 'complete': 0}
+    assert data['total'] == 2
+    assert data['latest_created_at'].startswith('2025-02-01T10:00:00')
+
+    client.patch(f"/notes/{first['id']}/status", json={'status': 'complete'})
+    assert client.get('/notes/summary').get_json()['counts']['complete'] == 1
+
+    client.delete(f"/notes/{first['id']}")
+    assert client.get('/notes/summary').get_json()['total'] == 1
+
+
+def test_summary_validators_on_cache_hit(client):
+    """Сводка из кэша отдаёт те же ETag и Last-Modified и отвечает 304"""
+    client.post('/notes', json={'title': 'A'})
+    miss = client.get('/notes/summary')
+    hit = client.get('/notes/summary')
+    assert miss.headers['ETag'] and hit.headers['ETag'] == miss.headers['ETag']
+    assert hit.headers['Last-Modified'] == miss.headers['Last-Modified']
+    assert hit.get_json() == miss.get_json()
+    assert client.get('/notes/summary', headers={'If-None-Match': miss.headers['ETag']}).status_code == 304
+
+    client.post('/notes', json={'title': 'B'})
+    changed = client.get('/notes/summary', headers={'If-None-Match': miss.headers['ETag']})
+    assert changed.status_code == 200 and changed.get_json()['total'] == 2
+
+
+def test_ttl_cache_expiry():
+    """Тест устаревания записей TTLCache"""
+    import time
+    from cache import TTLCache
+
+    cache = TTLCache(ttl=0.01)
+    cache.set('key', 'value')
+    assert cache.get('key') == 'value'
+    time.sleep(0.02)
+    assert cache.get('key') is None